@@ -0,0 +1,132 @@
+"""
+Platform fact tables (PlatformDailyFact, DeckDailyUsage).
+
+Days are server-local dates. build_daily_facts recomputes a day exactly from
+the source tables with a handful of indexed range queries; the Celery beat
+runs it for today every few minutes and for yesterday after midnight, and
+backfill_daily_facts covers history. The first task run after deploy
+finds no earlier facts and builds every day since history_start() once.
+Between rebuilds the additive counters are bumped in the transaction that
+changes them: started sessions, finished sessions (once, behind the
+rollup_recorded claim), new users and new decks. Active users only move on
+rebuilds, so they can trail by up to one refresh interval; so can an
+increment that lands while today is being rebuilt.
+"""
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Count, DurationField, ExpressionWrapper, F, FloatField, Min, Q, Sum
+from django.utils import timezone
+
+from decks.models import Deck, QuizSession
+from users.models import CustomUser
+from .models import DeckDailyUsage, PlatformDailyFact
+from .utils import increment_row
+
+COMPLETION_FIELDS = ("sessions_completed", "scored_sessions", "accuracy_sum", "seconds_studied")
+
+
+def day_bounds(day):
+    """[start, end) of a server-local date as aware datetimes."""
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    return start, start + timedelta(days=1)
+
+
+def _completion_aggregates():
+    scored = Q(total_answered__gt=0)
+    return {
+        "sessions_completed": Count("id"),
+        "answered": Sum("total_answered"),
+        "correct": Sum("correct_count"),
+        "scored_sessions": Count("id", filter=scored),
+        "accuracy_sum": Sum(
+            ExpressionWrapper(F("correct_count") * 1.0 / F("total_answered"), output_field=FloatField()),
+            filter=scored,
+        ),
+        "seconds_studied": Sum(
+            ExpressionWrapper(F("finished_at") - F("started_at"), output_field=DurationField())
+        ),
+    }
+
+
+def _clean(values):
+    """Aggregate results as column values: None -> 0, durations -> whole seconds."""
+    cleaned = {}
+    for field, value in values.items():
+        if isinstance(value, timedelta):
+            value = max(0, int(value.total_seconds()))
+        cleaned[field] = value or 0
+    return cleaned
+
+
+def history_start():
+    """Local date of the earliest user, deck or session, or None on an empty site."""
+    firsts = [
+        CustomUser.objects.aggregate(first=Min("date_joined"))["first"],
+        Deck.objects.aggregate(first=Min("created_at"))["first"],
+        QuizSession.objects.aggregate(first=Min("started_at"))["first"],
+    ]
+    firsts = [moment for moment in firsts if moment]
+    return timezone.localdate(min(firsts)) if firsts else None
+
+
+def build_daily_facts(day):
+    """Recompute PlatformDailyFact and DeckDailyUsage for one date from the source tables."""
+    start, end = day_bounds(day)
+    started = QuizSession.objects.filter(started_at__gte=start, started_at__lt=end)
+    completed = QuizSession.objects.filter(finished_at__gte=start, finished_at__lt=end)
+
+    platform = _clean({
+        "new_users": CustomUser.objects.filter(date_joined__gte=start, date_joined__lt=end).count(),
+        "new_decks": Deck.objects.filter(created_at__gte=start, created_at__lt=end).count(),
+        **started.aggregate(sessions_started=Count("id"), active_users=Count("user", distinct=True)),
+        **completed.aggregate(**_completion_aggregates()),
+    })
+
+    usage = {}
+    for row in started.values("deck_id").annotate(sessions_started=Count("id")):
+        usage[row["deck_id"]] = {"sessions_started": row["sessions_started"]}
+    completion = {field: agg for field, agg in _completion_aggregates().items() if field in COMPLETION_FIELDS}
+    for row in completed.values("deck_id").annotate(**completion):
+        deck_id = row.pop("deck_id")
+        usage.setdefault(deck_id, {}).update(_clean(row))
+
+    with transaction.atomic():
+        PlatformDailyFact.objects.update_or_create(date=day, defaults=platform)
+        DeckDailyUsage.objects.filter(date=day).delete()
+        DeckDailyUsage.objects.bulk_create(
+            [DeckDailyUsage(deck_id=deck_id, date=day, **values) for deck_id, values in usage.items()],
+            batch_size=1000,
+        )
+    return platform
+
+
+def add_started_session(session):
+    day = timezone.localdate(session.started_at)
+    increment_row(PlatformDailyFact, {"date": day}, {"sessions_started": 1})
+    increment_row(DeckDailyUsage, {"deck_id": session.deck_id, "date": day}, {"sessions_started": 1})
+
+
+def add_finished_session(session):
+    """Count a finished session in its day's facts. Call at most once per session."""
+    scored = session.total_answered > 0
+    seconds = (session.finished_at - session.started_at).total_seconds() if session.started_at else 0
+    deltas = {
+        "sessions_completed": 1,
+        "scored_sessions": int(scored),
+        "accuracy_sum": session.correct_count / session.total_answered if scored else 0.0,
+        "seconds_studied": max(0, int(seconds)),
+    }
+    day = timezone.localdate(session.finished_at)
+    increment_row(PlatformDailyFact, {"date": day}, {
+        **deltas, "answered": session.total_answered, "correct": session.correct_count,
+    })
+    increment_row(DeckDailyUsage, {"deck_id": session.deck_id, "date": day}, deltas)
+
+
+def add_new_user(user):
+    increment_row(PlatformDailyFact, {"date": timezone.localdate(user.date_joined)}, {"new_users": 1})
+
+
+def add_new_deck(deck):
+    increment_row(PlatformDailyFact, {"date": timezone.localdate(deck.created_at)}, {"new_decks": 1})
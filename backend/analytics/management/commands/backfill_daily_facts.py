@@ -0,0 +1,62 @@
+"""
+Rebuild PlatformDailyFact / DeckDailyUsage for a range of days from the
+source tables. Each day is rebuilt in its own transaction, so the command can
+be re-run or interrupted safely. The fact-refresh task builds the whole
+history by itself on its first run; --all does the same on demand.
+"""
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from analytics.facts import build_daily_facts, history_start
+
+
+class Command(BaseCommand):
+    help = "Rebuild the daily platform fact tables for a range of days."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=90, help="Days back from today (ignored with --start).")
+        parser.add_argument("--start", help="First day, YYYY-MM-DD.")
+        parser.add_argument("--end", help="Last day, YYYY-MM-DD (default today).")
+        parser.add_argument("--all", action="store_true",
+                            help="Start at the earliest user, deck or session (ignores --days and --start).")
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        end = self.parse_day(options["end"], "--end") if options["end"] else today
+        if options["all"]:
+            start = history_start() or end
+        elif options["start"]:
+            start = self.parse_day(options["start"], "--start")
+        elif options["days"] >= 0:
+            start = end - timedelta(days=options["days"])
+        else:
+            raise CommandError("--days must not be negative.")
+        if start > end:
+            raise CommandError("--start must not be after --end.")
+
+        started = time.perf_counter()
+        day = start
+        while day <= end:
+            facts = build_daily_facts(day)
+            if options["verbosity"] >= 2:
+                self.stdout.write(
+                    f"  {day}: {facts['sessions_started']} started, {facts['sessions_completed']} completed"
+                )
+            day += timedelta(days=1)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {(end - start).days + 1} days ({start} to {end}) in {time.perf_counter() - started:.2f}s."
+        ))
+
+    def parse_day(self, value, option):
+        try:
+            day = parse_date(value)
+        except ValueError:
+            day = None
+        if day is None:
+            raise CommandError(f"{option} must be a date (YYYY-MM-DD).")
+        return day
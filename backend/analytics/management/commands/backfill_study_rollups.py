@@ -0,0 +1,49 @@
+"""
+Add finished quiz sessions that are not yet counted in UserDailyStudy.
+
+Safe to run while the site is live and to re-run: each chunk locks its
+sessions and marks them rollup_recorded in the same transaction that adds
+them, the same flag live finishes claim. --rebuild starts the rollups over
+from the session history.
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from analytics.models import UserDailyStudy
+from analytics.rollups import backfill_chunk
+from decks.models import QuizSession
+
+
+class Command(BaseCommand):
+    help = "Roll finished quiz sessions up into per-user daily study rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=2000, help="Sessions per transaction.")
+        parser.add_argument("--rebuild", action="store_true",
+                            help="Delete all rollups and recount every finished session.")
+
+    def handle(self, *args, **options):
+        chunk_size = options["chunk_size"]
+        if chunk_size < 1:
+            raise CommandError("--chunk-size must be positive.")
+
+        if options["rebuild"]:
+            with transaction.atomic():
+                UserDailyStudy.objects.all().delete()
+                QuizSession.objects.filter(rollup_recorded=True).update(rollup_recorded=False)
+
+        started = time.perf_counter()
+        total, last_pk = 0, 0
+        while True:
+            recorded, last_pk = backfill_chunk(last_pk, chunk_size)
+            if last_pk is None:
+                break
+            total += recorded
+            if options["verbosity"] >= 2:
+                self.stdout.write(f"  {total} sessions (up to id {last_pk})")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Recorded {total} sessions in {time.perf_counter() - started:.2f}s."
+        ))
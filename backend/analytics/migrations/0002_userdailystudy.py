@@ -0,0 +1,35 @@
+# Generated by Django 5.2.7 on 2026-10-17 02:54
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0001_initial'),
+        ('decks', '0009_quizsession_rollup_recorded_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserDailyStudy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('sessions', models.PositiveIntegerField(default=0)),
+                ('answered', models.PositiveIntegerField(default=0)),
+                ('correct', models.PositiveIntegerField(default=0)),
+                ('seconds', models.PositiveIntegerField(default=0)),
+                ('perfect_quizzes', models.PositiveIntegerField(default=0)),
+                ('deck', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_study', to='decks.deck')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_study', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'date'], name='analytics_u_user_id_bd7a15_idx'), models.Index(fields=['date'], name='analytics_u_date_2ba54e_idx')],
+                'unique_together': {('user', 'deck', 'date')},
+            },
+        ),
+    ]
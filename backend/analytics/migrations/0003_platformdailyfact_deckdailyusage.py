@@ -0,0 +1,53 @@
+# Generated by Django 5.2.7 on 2026-10-17 02:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0002_userdailystudy'),
+        ('decks', '0009_quizsession_rollup_recorded_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlatformDailyFact',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('new_users', models.PositiveIntegerField(default=0)),
+                ('active_users', models.PositiveIntegerField(default=0)),
+                ('new_decks', models.PositiveIntegerField(default=0)),
+                ('sessions_started', models.PositiveIntegerField(default=0)),
+                ('sessions_completed', models.PositiveIntegerField(default=0)),
+                ('answered', models.PositiveIntegerField(default=0)),
+                ('correct', models.PositiveIntegerField(default=0)),
+                ('scored_sessions', models.PositiveIntegerField(default=0)),
+                ('accuracy_sum', models.FloatField(default=0.0)),
+                ('seconds_studied', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='DeckDailyUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('sessions_started', models.PositiveIntegerField(default=0)),
+                ('sessions_completed', models.PositiveIntegerField(default=0)),
+                ('scored_sessions', models.PositiveIntegerField(default=0)),
+                ('accuracy_sum', models.FloatField(default=0.0)),
+                ('seconds_studied', models.PositiveIntegerField(default=0)),
+                ('deck', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_usage', to='decks.deck')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date'], name='analytics_d_date_ab3110_idx')],
+                'unique_together': {('deck', 'date')},
+            },
+        ),
+    ]
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.db import models
 
 class AnalyticsSnapshot(models.Model):
@@ -12,3 +13,74 @@ class AnalyticsSnapshot(models.Model):
 
     def __str__(self):
         return f"{self.name} @ {self.snapshot_date}"
+
+
+class UserDailyStudy(models.Model):
+    """
+    Finished quiz sessions of one user on one deck, rolled up per day of the
+    user's local calendar. Maintained by analytics.rollups.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="daily_study")
+    deck = models.ForeignKey("decks.Deck", on_delete=models.CASCADE, related_name="daily_study")
+    date = models.DateField()
+
+    sessions = models.PositiveIntegerField(default=0)
+    answered = models.PositiveIntegerField(default=0)
+    correct = models.PositiveIntegerField(default=0)
+    seconds = models.PositiveIntegerField(default=0)
+    perfect_quizzes = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ("user", "deck", "date")
+        indexes = [models.Index(fields=["user", "date"]), models.Index(fields=["date"])]
+
+    def __str__(self):
+        return f"{self.user_id}/{self.deck_id} @ {self.date}: {self.sessions} sessions"
+
+
+class PlatformDailyFact(models.Model):
+    """
+    Site-wide activity for one server-local day. Rebuilt exactly by
+    analytics.facts.build_daily_facts and bumped incrementally in between.
+    """
+    date = models.DateField(unique=True)
+
+    new_users = models.PositiveIntegerField(default=0)
+    active_users = models.PositiveIntegerField(default=0)  # distinct users who started a session
+    new_decks = models.PositiveIntegerField(default=0)
+
+    sessions_started = models.PositiveIntegerField(default=0)
+    # Completion metrics are dated by finished_at
+    sessions_completed = models.PositiveIntegerField(default=0)
+    answered = models.PositiveIntegerField(default=0)
+    correct = models.PositiveIntegerField(default=0)
+    scored_sessions = models.PositiveIntegerField(default=0)  # completed with at least one answer
+    accuracy_sum = models.FloatField(default=0.0)  # sum of per-session accuracy over scored_sessions
+    seconds_studied = models.PositiveIntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["-date"]
+
+    def __str__(self):
+        return f"platform @ {self.date}"
+
+
+class DeckDailyUsage(models.Model):
+    """Quiz usage of one deck on one server-local day (same rules as PlatformDailyFact)."""
+    deck = models.ForeignKey("decks.Deck", on_delete=models.CASCADE, related_name="daily_usage")
+    date = models.DateField()
+
+    sessions_started = models.PositiveIntegerField(default=0)
+    sessions_completed = models.PositiveIntegerField(default=0)
+    scored_sessions = models.PositiveIntegerField(default=0)
+    accuracy_sum = models.FloatField(default=0.0)
+    seconds_studied = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ("deck", "date")
+        indexes = [models.Index(fields=["date"])]
+
+    def __str__(self):
+        return f"deck {self.deck_id} @ {self.date}"
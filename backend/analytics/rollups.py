@@ -0,0 +1,99 @@
+"""
+Per-user daily study rollups (UserDailyStudy).
+
+A finished quiz session is added to the row for its user, deck and the local
+date (in the user's timezone) it was started on, in the transaction that
+finishes it. QuizSession.rollup_recorded is claimed with a conditional
+UPDATE first, so a session is counted exactly once however many times its
+finish is saved. backfill_study_rollups adds sessions finished before the
+rollups existed.
+"""
+from collections import Counter, defaultdict
+
+import pytz
+from django.db import transaction
+from django.utils import timezone
+
+from decks.models import QuizSession
+from users.models import CustomUser
+from .models import UserDailyStudy
+from .utils import increment_row
+
+ROLLUP_FIELDS = ("sessions", "answered", "correct", "seconds", "perfect_quizzes")
+
+
+def get_user_timezone(tz_name):
+    try:
+        return pytz.timezone(tz_name) if tz_name else pytz.UTC
+    except pytz.UnknownTimeZoneError:
+        return pytz.UTC
+
+
+def local_date(moment, tz_name):
+    """The calendar date of an aware datetime in the named timezone (UTC if unknown)."""
+    return timezone.localtime(moment, get_user_timezone(tz_name)).date()
+
+
+def session_totals(session):
+    """A finished session's contribution to its rollup row."""
+    seconds = (session.finished_at - session.started_at).total_seconds() if session.started_at else 0
+    return Counter(
+        sessions=1,
+        answered=session.total_answered,
+        correct=session.correct_count,
+        seconds=max(0, int(seconds)),
+        perfect_quizzes=int(0 < session.total_answered == session.correct_count),
+    )
+
+
+def add_to_rollups(deltas):
+    """Add {(user_id, deck_id, date): Counter of ROLLUP_FIELDS} to the rollup rows."""
+    for (user_id, deck_id, date), delta in deltas.items():
+        increment_row(
+            UserDailyStudy,
+            {"user_id": user_id, "deck_id": deck_id, "date": date},
+            {field: delta[field] for field in ROLLUP_FIELDS},
+        )
+
+
+def record_session(session):
+    """Count a finished session in its day's rollup; False if it was already counted."""
+    if not session.finished_at:
+        return False
+    # Joins the caller's transaction (the finish write) without a savepoint
+    with transaction.atomic(savepoint=False):
+        claimed = QuizSession.objects.filter(pk=session.pk, rollup_recorded=False).update(rollup_recorded=True)
+        if not claimed:
+            return False
+        tz_name = CustomUser.objects.filter(pk=session.user_id).values_list("timezone", flat=True).first()
+        key = (session.user_id, session.deck_id, local_date(session.started_at, tz_name))
+        add_to_rollups({key: session_totals(session)})
+    session.rollup_recorded = True
+    return True
+
+
+def backfill_chunk(after_pk, size):
+    """
+    Record up to `size` unrecorded finished sessions with pk > after_pk.
+    Returns (sessions recorded, last pk seen or None when done).
+    """
+    with transaction.atomic():
+        sessions = list(
+            QuizSession.objects.select_for_update()
+            .filter(pk__gt=after_pk, finished_at__isnull=False, rollup_recorded=False)
+            .order_by("pk")
+            .only("pk", "user_id", "deck_id", "started_at", "finished_at", "total_answered", "correct_count")[:size]
+        )
+        if not sessions:
+            return 0, None
+
+        timezones = dict(
+            CustomUser.objects.filter(pk__in={s.user_id for s in sessions}).values_list("pk", "timezone")
+        )
+        deltas = defaultdict(Counter)
+        for session in sessions:
+            key = (session.user_id, session.deck_id, local_date(session.started_at, timezones.get(session.user_id)))
+            deltas[key].update(session_totals(session))
+        add_to_rollups(deltas)
+        QuizSession.objects.filter(pk__in=[s.pk for s in sessions]).update(rollup_recorded=True)
+    return len(sessions), sessions[-1].pk
@@ -1,43 +1,35 @@
 
 from datetime import timedelta
 import logging
+import time
 from typing import Dict, Any
 
 from django.utils import timezone
 from django.core.cache import cache
 from django.conf import settings
-from django.db.models import (
-    Count, Avg, Sum, FloatField, ExpressionWrapper, F, DurationField, Q
-)
-from django.db.models.functions import TruncDate
+from django.db.models import Count, Sum, Q
 from django.db import transaction
 
+from utils.caching import bump_version, get_version
 from users.models import CustomUser
-from decks.models import Deck, QuizSession
+from decks.models import Deck
 from achievements.models import Achievements
-from .models import AnalyticsSnapshot
+from .facts import day_bounds
+from .models import AnalyticsSnapshot, DeckDailyUsage, PlatformDailyFact, UserDailyStudy
+from .rollups import ROLLUP_FIELDS, local_date
 from .utils import build_chart 
 
 logger = logging.getLogger(__name__)
 
 # Cache TTLs (seconds)
 USER_ANALYTICS_TTL = getattr(settings, "USER_ANALYTICS_TTL", 60 * 5)     
+# How long an expired user entry may still be served while it is refreshed
+USER_ANALYTICS_STALE_TTL = getattr(settings, "USER_ANALYTICS_STALE_TTL", 60 * 60 * 24)
+USER_ANALYTICS_REFRESH_LOCK_TTL = getattr(settings, "USER_ANALYTICS_REFRESH_LOCK_TTL", 60)
 ADMIN_ANALYTICS_TTL = getattr(settings, "ADMIN_ANALYTICS_TTL", 60 * 5)   
 
 # ---------- Helpers ----------
 
-def _annotate_duration(qs):
-    """Annotate queryset with DurationField 'duration' when finished_at exists."""
-    return qs.exclude(finished_at__isnull=True).annotate(
-        duration=ExpressionWrapper(F('finished_at') - F('started_at'), output_field=DurationField())
-    )
-
-
-def _safe_avg_accuracy_agg(expr):
-
-    return Avg(ExpressionWrapper(expr, output_field=FloatField()))
-
-
 def _aggregate_deck_counts_for_user(user):
     agg = Deck.objects.filter(owner=user).aggregate(
         total=Count('id'),
@@ -49,67 +41,56 @@ def _aggregate_deck_counts_for_user(user):
 # ---------- Core analytics functions ----------
 
 def compute_user_analytics(user: CustomUser, days: int = 7) -> Dict[str, Any]:
-    """Compute raw analytics for a single user."""
+    """
+    Compute analytics for a single user from the UserDailyStudy rollups:
+    one grouped query for the all-time per-deck totals and one date-range
+    query for the charts. Dates are the user's local calendar days.
+
+    Only finished sessions are counted, and accuracy is pooled (correct over
+    answered) rather than averaged per session; see analytics/README.md.
+    """
     if not user or not getattr(user, "id", None):
         return {}
 
-    today = timezone.now().date()
+    today = local_date(timezone.now(), user.timezone)
     start_date = today - timedelta(days=days)
 
     # Deck stats
     total_decks, public_decks = _aggregate_deck_counts_for_user(user)
 
-    # Sessions
-    sessions = QuizSession.objects.filter(user=user).exclude(started_at__isnull=True)
-    total_sessions = sessions.count()
-
-    # Accuracy
-    accuracy_qs = sessions.filter(total_answered__gt=0)
-    avg_accuracy = accuracy_qs.aggregate(
-        avg=_safe_avg_accuracy_agg(F('correct_count') * 1.0 / F('total_answered'))
-    ).get('avg') or 0.0
-
-    perfect_quizzes = sessions.filter(
-        correct_count=F('total_answered'), total_answered__gt=0
-    ).count()
-
-    # Durations
-    sessions_d = _annotate_duration(sessions)
-    avg_duration = sessions_d.aggregate(avg_duration=Avg('duration')).get('avg_duration')
-    avg_minutes = round(avg_duration.total_seconds() / 60, 1) if avg_duration else 0.0
-
-    # Study time per day
-    study_time_per_day_qs = (
-        sessions_d.filter(started_at__date__gte=start_date)
-        .annotate(date=TruncDate('started_at'))
+    rollup_sums = {field: Sum(field) for field in ROLLUP_FIELDS}
+    rollups = UserDailyStudy.objects.filter(user=user)
+
+    # All-time totals, per deck
+    per_deck = list(
+        rollups.values('deck_id', 'deck__title').annotate(**rollup_sums).order_by('-sessions', 'deck_id')
+    )
+    totals = {field: sum(row[field] for row in per_deck) for field in ROLLUP_FIELDS}
+
+    study_per_deck_chart = [
+        {
+            "deck_id": row['deck_id'],
+            "deck": row['deck__title'],
+            "sessions": row['sessions'],
+            "minutes": round(row['seconds'] / 60, 1),
+            "accuracy": round(row['correct'] / row['answered'], 2),
+        }
+        for row in per_deck
+        if row['answered']
+    ]
+
+    # Daily charts over the window
+    daily = list(
+        rollups.filter(date__gte=start_date)
         .values('date')
-        .annotate(total_time=Sum('duration'))
+        .annotate(sessions=Sum('sessions'), seconds=Sum('seconds'))
         .order_by('date')
     )
-    minutes_studied_chart = build_chart(study_time_per_day_qs, label_field='date', value_field='total_time')
-
-    # Deck-level stats
-    deck_activity_qs = (
-        sessions_d.filter(total_answered__gt=0)
-        .values('deck__id', 'deck__title')
-        .annotate(
-            session_count=Count('id'),
-            total_time=Sum('duration'),
-            avg_accuracy=_safe_avg_accuracy_agg(F('correct_count') * 1.0 / F('total_answered'))
-        )
-        .order_by('-session_count')
+    activity_chart = build_chart(daily, label_field='date', value_field='sessions')
+    minutes_studied_chart = build_chart(
+        [{"date": row['date'], "minutes": round(row['seconds'] / 60, 1)} for row in daily],
+        label_field='date', value_field='minutes',
     )
-    study_per_deck_chart = []
-    for entry in deck_activity_qs:
-        total_time = entry.get('total_time')
-        minutes = round(total_time.total_seconds() / 60, 1) if total_time else 0
-        study_per_deck_chart.append({
-            "deck_id": entry.get('deck__id'),
-            "deck": entry.get('deck__title'),
-            "sessions": entry.get('session_count') or 0,
-            "minutes": minutes,
-            "accuracy": round(entry.get('avg_accuracy') or 0, 2),
-        })
 
     # Achievements
     achievements_obj = Achievements.objects.filter(user=user).only(
@@ -122,23 +103,14 @@ def compute_user_analytics(user: CustomUser, days: int = 7) -> Dict[str, Any]:
         "badges": getattr(achievements_obj, 'badges', []) or [],
     }
 
-    # Daily activity chart
-    recent_activity_qs = (
-        sessions.filter(started_at__date__gte=start_date)
-        .annotate(date=TruncDate('started_at'))
-        .values('date')
-        .annotate(count=Count('id'))
-        .order_by('date')
-    )
-    activity_chart = build_chart(recent_activity_qs, label_field='date', value_field='count')
-
+    total_sessions = totals['sessions']
     data = {
         "decks": {"total": total_decks, "public": public_decks},
         "quizzes": {
             "total_sessions": total_sessions,
-            "average_accuracy": round(avg_accuracy or 0, 2),
-            "perfect_quizzes": perfect_quizzes,
-            "average_time_spent_minutes": avg_minutes,
+            "average_accuracy": round(totals['correct'] / totals['answered'], 2) if totals['answered'] else 0.0,
+            "perfect_quizzes": totals['perfect_quizzes'],
+            "average_time_spent_minutes": round(totals['seconds'] / total_sessions / 60, 1) if total_sessions else 0.0,
         },
         "streak": streak_data,
         "charts": {
@@ -152,29 +124,91 @@ def compute_user_analytics(user: CustomUser, days: int = 7) -> Dict[str, Any]:
     return data
 
 
-def get_user_analytics(user: CustomUser, days: int = 7, use_cache: bool = True) -> Dict[str, Any]:
-    """Retrieve (and cache) user analytics."""
-    cache_key = f"analytics:user:{user.id}:days:{days}"
-    if use_cache:
-        cached = cache.get(cache_key)
-        if cached is not None:
-            return cached
+def _user_analytics_key(user_id: int, days: int) -> str:
+    # The per-user version covers every window, so one bump invalidates them all
+    return f"analytics:user:{user_id}:{get_version('analytics', user_id, scope='user')}:days:{days}"
+
+
+def _refresh_lock_key(user_id: int, days: int) -> str:
+    return f"analytics:user:{user_id}:days:{days}:refreshing"
 
+
+def cache_user_analytics(user: CustomUser, days: int = 7) -> Dict[str, Any]:
+    """Compute user analytics and store them, fresh for USER_ANALYTICS_TTL."""
+    # Key taken before computing: an invalidation meanwhile leaves this entry behind
+    cache_key = _user_analytics_key(user.id, days)
     data = compute_user_analytics(user, days=days)
-    if use_cache:
-        cache.set(cache_key, data, USER_ANALYTICS_TTL)
+    entry = {"data": data, "fresh_until": time.time() + USER_ANALYTICS_TTL}
+    cache.set(cache_key, entry, USER_ANALYTICS_TTL + USER_ANALYTICS_STALE_TTL)
     return data
 
 
+def schedule_user_analytics_refresh(user_id: int, days: int = 7):
+    """Queue a background recompute of one window unless one is already pending."""
+    lock_key = _refresh_lock_key(user_id, days)
+    if not cache.add(lock_key, True, USER_ANALYTICS_REFRESH_LOCK_TTL):
+        return
+    from .tasks import refresh_user_analytics_task
+    try:
+        refresh_user_analytics_task.delay(user_id, days)
+    except Exception:
+        cache.delete(lock_key)
+        logger.exception("Could not queue analytics refresh for user_id=%s days=%s", user_id, days)
+
+
+def refresh_user_analytics(user_id: int, days: int = 7) -> bool:
+    """Recompute one cached window and release its refresh lock; False if the user is gone."""
+    try:
+        user = CustomUser.objects.filter(pk=user_id).first()
+        if user is None:
+            return False
+        cache_user_analytics(user, days=days)
+        return True
+    finally:
+        cache.delete(_refresh_lock_key(user_id, days))
+
+
+def get_user_analytics(user: CustomUser, days: int = 7, use_cache: bool = True) -> Dict[str, Any]:
+    """
+    Retrieve (and cache) user analytics. An expired entry is still returned
+    while a Celery task recomputes it; only a missing entry (first request,
+    or after clear_user_cache) is computed in the request.
+    """
+    if not use_cache:
+        return compute_user_analytics(user, days=days)
+
+    entry = cache.get(_user_analytics_key(user.id, days))
+    if entry is None:
+        return cache_user_analytics(user, days=days)
+    if entry["fresh_until"] <= time.time():
+        schedule_user_analytics_refresh(user.id, days)
+    return entry["data"]
+
+
 # ---------- Admin / Global analytics ----------
 
-def compute_admin_analytics(days: int = 7, top_n_decks: int = 10) -> Dict[str, Any]:
-    today = timezone.now().date()
-    start_date = today - timedelta(days=days)
+def admin_date_range(days: int = 7, start=None, end=None):
+    """(start, end) server-local dates: end defaults to today, start to `days` before end."""
+    end = end or timezone.localdate()
+    start = start or end - timedelta(days=days)
+    return start, end
+
 
-    total_users = CustomUser.objects.count()
-    active_today = CustomUser.objects.filter(last_login__date=today).count()
-    new_this_week = CustomUser.objects.filter(date_joined__gte=start_date).count()
+def compute_admin_analytics(days: int = 7, top_n_decks: int = 10, start=None, end=None) -> Dict[str, Any]:
+    """
+    Compute site-wide analytics for any date range from the daily fact
+    tables: one user and one deck aggregate for the current totals, then
+    the PlatformDailyFact rows of the range, their all-time sums and the
+    range's top decks from DeckDailyUsage.
+    """
+    start_date, end_date = admin_date_range(days, start, end)
+    today = timezone.localdate()
+
+    user_agg = CustomUser.objects.aggregate(
+        total=Count('id'),
+        active_today=Count('id', filter=Q(last_login__date=today)),
+        new_this_week=Count('id', filter=Q(date_joined__gte=day_bounds(today - timedelta(days=7))[0])),
+    )
 
     deck_agg = Deck.objects.aggregate(
         total=Count('id'),
@@ -186,65 +220,83 @@ def compute_admin_analytics(days: int = 7, top_n_decks: int = 10) -> Dict[str, A
     public_decks = deck_agg.get('public') or 0
     archived = deck_agg.get('archived') or 0
 
-    sessions = QuizSession.objects.exclude(started_at__isnull=True)
-    total_sessions = sessions.count()
-
-    avg_accuracy = sessions.filter(total_answered__gt=0).aggregate(
-        avg=_safe_avg_accuracy_agg(F('correct_count') * 1.0 / F('total_answered'))
-    ).get('avg') or 0.0
+    all_time = PlatformDailyFact.objects.aggregate(
+        sessions=Sum('sessions_started'),
+        scored=Sum('scored_sessions'),
+        accuracy_sum=Sum('accuracy_sum'),
+    )
+    total_sessions = all_time.get('sessions') or 0
+    avg_accuracy = (all_time['accuracy_sum'] or 0) / all_time['scored'] if all_time.get('scored') else 0.0
 
-    sessions_d = _annotate_duration(sessions)
-    study_time_chart_qs = (
-        sessions_d.filter(started_at__date__gte=start_date)
-        .annotate(date=TruncDate('started_at'))
-        .values('date')
-        .annotate(total_time=Sum('duration'))
+    daily = list(
+        PlatformDailyFact.objects.filter(date__range=(start_date, end_date))
         .order_by('date')
+        .values('date', 'new_users', 'active_users', 'sessions_started', 'sessions_completed', 'seconds_studied')
     )
-    time_studied_chart = build_chart(study_time_chart_qs, label_field='date', value_field='total_time')
+    time_studied_chart = build_chart(
+        [{"date": row['date'], "minutes": round(row['seconds_studied'] / 60, 1)} for row in daily],
+        label_field='date', value_field='minutes',
+    )
+    sessions_chart = build_chart(daily, label_field='date', value_field='sessions_started')
+    active_users_chart = build_chart(daily, label_field='date', value_field='active_users')
 
     deck_activity_qs = (
-        sessions_d.filter(total_answered__gt=0)
-        .values('deck__id', 'deck__title')
+        DeckDailyUsage.objects.filter(date__range=(start_date, end_date), scored_sessions__gt=0)
+        .values('deck_id', 'deck__title')
         .annotate(
-            total_sessions=Count('id'),
-            total_time=Sum('duration'),
-            avg_accuracy=Avg(
-                ExpressionWrapper(F('correct_count') * 1.0 / F('total_answered'), output_field=FloatField()),
-                filter=Q(total_answered__gt=0)
-            )
+            sessions=Sum('scored_sessions'),
+            seconds=Sum('seconds_studied'),
+            accuracy_sum=Sum('accuracy_sum'),
         )
-        .order_by('-total_sessions')[:top_n_decks]
+        .order_by('-sessions', 'deck_id')[:top_n_decks]
     )
-    study_per_deck_chart = []
-    for entry in deck_activity_qs:
-        total_time = entry.get('total_time')
-        minutes = round(total_time.total_seconds() / 60, 1) if total_time else 0
-        study_per_deck_chart.append({
-            "deck_id": entry.get('deck__id'),
-            "deck": entry.get('deck__title'),
-            "sessions": entry.get('total_sessions') or 0,
-            "minutes": minutes,
-            "accuracy": round(entry.get('avg_accuracy') or 0, 2),
-        })
+    study_per_deck_chart = [
+        {
+            "deck_id": entry['deck_id'],
+            "deck": entry['deck__title'],
+            "sessions": entry['sessions'],
+            "minutes": round(entry['seconds'] / 60, 1),
+            "accuracy": round(entry['accuracy_sum'] / entry['sessions'], 2),
+        }
+        for entry in deck_activity_qs
+    ]
 
     payload = {
-        "users": {"total": total_users, "active_today": active_today, "new_this_week": new_this_week},
+        "range": {"start": start_date.isoformat(), "end": end_date.isoformat()},
+        "users": {
+            "total": user_agg.get('total') or 0,
+            "active_today": user_agg.get('active_today') or 0,
+            "new_this_week": user_agg.get('new_this_week') or 0,
+            "new_in_range": sum(row['new_users'] for row in daily),
+        },
         "decks": {"total": total_decks, "public": public_decks, "archived": archived},
-        "quizzes": {"total_sessions": total_sessions, "average_accuracy": round(avg_accuracy or 0, 2)},
-        "charts": {"time_studied_per_day": time_studied_chart, "study_per_deck": study_per_deck_chart},
+        "quizzes": {
+            "total_sessions": total_sessions,
+            "sessions_in_range": sum(row['sessions_started'] for row in daily),
+            "completed_in_range": sum(row['sessions_completed'] for row in daily),
+            "average_accuracy": round(avg_accuracy, 2),
+        },
+        "charts": {
+            "time_studied_per_day": time_studied_chart,
+            "sessions_per_day": sessions_chart,
+            "active_users_per_day": active_users_chart,
+            "study_per_deck": study_per_deck_chart,
+        },
     }
 
-    logger.debug("Computed admin analytics for days=%s top_n_decks=%s", days, top_n_decks)
+    logger.debug("Computed admin analytics for %s..%s top_n_decks=%s", start_date, end_date, top_n_decks)
     return payload
 
 
-def get_admin_analytics(days: int = 7, top_n_decks: int = 10, use_cache: bool = True, use_snapshot: bool = True) -> Dict[str, Any]:
-    """Return admin analytics (cached or from snapshot)."""
-    today = timezone.now().date()
-    cache_key = f"analytics:admin:days:{days}:top:{top_n_decks}"
+def get_admin_analytics(days: int = 7, top_n_decks: int = 10, use_cache: bool = True, use_snapshot: bool = True,
+                        start=None, end=None) -> Dict[str, Any]:
+    """Return admin analytics (cached or from snapshot). The snapshot only covers the default range."""
+    today = timezone.localdate()
+    custom_range = start is not None or end is not None
+    start_date, end_date = admin_date_range(days, start, end)
+    cache_key = f"analytics:admin:{start_date}:{end_date}:top:{top_n_decks}"
 
-    if use_snapshot:
+    if use_snapshot and not custom_range:
         snap = AnalyticsSnapshot.objects.filter(name="admin_metrics", snapshot_date=today).first()
         if snap:
             logger.debug("Returning admin analytics from snapshot for %s", today)
@@ -255,7 +307,7 @@ def get_admin_analytics(days: int = 7, top_n_decks: int = 10, use_cache: bool =
         if cached is not None:
             return cached
 
-    payload = compute_admin_analytics(days=days, top_n_decks=top_n_decks)
+    payload = compute_admin_analytics(top_n_decks=top_n_decks, start=start_date, end=end_date)
     if use_cache:
         cache.set(cache_key, payload, ADMIN_ANALYTICS_TTL)
     return payload
@@ -265,8 +317,9 @@ def get_admin_analytics(days: int = 7, top_n_decks: int = 10, use_cache: bool =
 
 def generate_admin_snapshot(days: int = 7, top_n_decks: int = 10):
     """Generate and save daily admin analytics snapshot."""
-    today = timezone.now().date()
-    payload = compute_admin_analytics(days=days, top_n_decks=top_n_decks)
+    today = timezone.localdate()
+    start_date, end_date = admin_date_range(days)
+    payload = compute_admin_analytics(top_n_decks=top_n_decks, start=start_date, end=end_date)
     try:
         with transaction.atomic():
             AnalyticsSnapshot.objects.update_or_create(
@@ -275,13 +328,17 @@ def generate_admin_snapshot(days: int = 7, top_n_decks: int = 10):
                 defaults={"payload": payload},
             )
         logger.info("Saved admin analytics snapshot for %s", today)
-        cache_key = f"analytics:admin:days:{days}:top:{top_n_decks}"
+        cache_key = f"analytics:admin:{start_date}:{end_date}:top:{top_n_decks}"
         cache.set(cache_key, payload, ADMIN_ANALYTICS_TTL)
     except Exception as e:
         logger.exception("Failed to save admin analytics snapshot: %s", e)
         raise
 
 
-def clear_user_cache(user_id: int, days: int = 7):
-    cache_key = f"analytics:user:{user_id}:days:{days}"
-    cache.delete(cache_key)
+def clear_user_cache(user_id: int):
+    """
+    Invalidate every cached analytics window of a user, and warm the default
+    window in the background once the current transaction commits.
+    """
+    bump_version("analytics", user_id, scope="user")
+    transaction.on_commit(lambda: schedule_user_analytics_refresh(user_id))
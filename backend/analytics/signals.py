@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from achievements.models import Achievements
+from decks.models import Deck, QuizSession
+from decks.signals import quiz_session_finished
+from .facts import add_finished_session, add_new_deck, add_new_user, add_started_session
+from .rollups import record_session
+from .services import clear_user_cache
+
+
+@receiver(post_save, sender=QuizSession)
+def count_started_session(sender, instance, created, **kwargs):
+    if created:
+        add_started_session(instance)
+
+
+@receiver(quiz_session_finished)
+def count_finished_session(sender, session, **kwargs):
+    # record_session claims the session, so facts are bumped once too
+    if record_session(session):
+        add_finished_session(session)
+        clear_user_cache(session.user_id)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def count_new_user(sender, instance, created, **kwargs):
+    if created:
+        add_new_user(instance)
+
+
+@receiver(post_save, sender=Deck)
+def count_new_deck(sender, instance, created, **kwargs):
+    if created:
+        add_new_deck(instance)
+        clear_user_cache(instance.owner_id)
+
+
+@receiver(post_delete, sender=Deck)
+def forget_deleted_deck(sender, instance, **kwargs):
+    clear_user_cache(instance.owner_id)
+
+
+@receiver(post_save, sender=Achievements)
+def refresh_streaks(sender, instance, **kwargs):
+    clear_user_cache(instance.user_id)
@@ -1,8 +1,9 @@
 # analytics/tasks.py
 from django.utils import timezone
 from celery import shared_task
-from .models import AnalyticsSnapshot
-from .services import get_admin_analytics
+from .models import AnalyticsSnapshot, PlatformDailyFact
+from .facts import build_daily_facts, history_start
+from .services import get_admin_analytics, refresh_user_analytics
 from datetime import timedelta, datetime
 
 def serialize_for_json(obj):
@@ -53,3 +54,29 @@ def capture_daily_admin_metrics_task():
         "recorded": True,
     }
 
+
+
+@shared_task
+def build_daily_facts_task(days=0):
+    """
+    Rebuild the platform fact tables for today and the `days` days before it.
+    Runs every few minutes for today, and after midnight with days=1 to
+    finalize yesterday. With no facts before today (first run after deploy)
+    the whole history is built.
+    """
+    today = timezone.localdate()
+    start = today - timedelta(days=days)
+    if not PlatformDailyFact.objects.filter(date__lt=today).exists():
+        start = min(start, history_start() or start)
+    day = start
+    while day <= today:
+        build_daily_facts(day)
+        day += timedelta(days=1)
+    return {"status": "ok", "days": (today - start).days + 1}
+
+
+@shared_task
+def refresh_user_analytics_task(user_id, days=7):
+    """Recompute one cached user analytics window (see get_user_analytics)."""
+    refreshed = refresh_user_analytics(user_id, days=days)
+    return {"status": "ok" if refreshed else "skipped", "user_id": user_id, "days": days}
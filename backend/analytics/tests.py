@@ -0,0 +1,179 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+import pytz
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from decks.models import Deck, Flashcard, QuizSession
+from decks.signals import quiz_session_finished
+from users.models import CustomUser
+from utils.caching import get_version
+from .models import DeckDailyUsage, PlatformDailyFact, UserDailyStudy
+from .services import _refresh_lock_key, _user_analytics_key, get_user_analytics, refresh_user_analytics
+from .tasks import build_daily_facts_task
+
+ROLLUP_VALUES = ("user_id", "deck_id", "date", "sessions", "answered", "correct", "seconds", "perfect_quizzes")
+
+
+class StudyRollupTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user("learner", "learner@example.com", "pass1234", timezone="Asia/Tokyo")
+        self.other = CustomUser.objects.create_user("peer", "peer@example.com", "pass1234")
+        self.deck = Deck.objects.create(owner=self.user, title="Rollups")
+
+    def finish(self, user, answered, correct, started_ago=timedelta(minutes=10), minutes=5):
+        """A session finished through the live-state write, as the quiz views do."""
+        session = QuizSession.objects.create(user=user, deck=self.deck, mode="random")
+        session.started_at = timezone.now() - started_ago
+        session.total_answered, session.correct_count = answered, correct
+        session.finished_at = session.started_at + timedelta(minutes=minutes)
+        session.save(update_fields=["started_at"])
+        session.save_live_state(flush=True)
+        return session
+
+    def rollups(self):
+        return list(UserDailyStudy.objects.order_by(*ROLLUP_VALUES[:3]).values_list(*ROLLUP_VALUES))
+
+    def test_finished_session_is_counted_once(self):
+        session = self.finish(self.user, answered=4, correct=4)
+        quiz_session_finished.send(sender=QuizSession, session=session)
+        session.save_live_state(flush=True)
+
+        stored = QuizSession.objects.get(pk=session.pk)
+        quiz_session_finished.send(sender=QuizSession, session=stored)
+
+        self.assertTrue(stored.rollup_recorded)
+        row = UserDailyStudy.objects.get(user=self.user, deck=self.deck)
+        self.assertEqual(
+            (row.sessions, row.answered, row.correct, row.seconds, row.perfect_quizzes), (1, 4, 4, 300, 1)
+        )
+
+    def test_rollup_date_is_the_users_local_start_date(self):
+        session = self.finish(self.user, answered=2, correct=1, started_ago=timedelta(days=3))
+        expected = timezone.localtime(session.started_at, pytz.timezone("Asia/Tokyo")).date()
+        self.assertEqual(UserDailyStudy.objects.get(user=self.user).date, expected)
+
+    def test_backfill_matches_incremental_totals(self):
+        for days_ago, (answered, correct) in enumerate([(5, 5), (4, 2), (3, 0), (6, 6)]):
+            self.finish(self.user, answered, correct, started_ago=timedelta(days=days_ago, hours=1))
+            self.finish(self.other, answered, correct, started_ago=timedelta(days=days_ago // 2, hours=3))
+        QuizSession.objects.create(user=self.user, deck=self.deck, mode="random")  # unfinished: never counted
+        incremental = self.rollups()
+        self.assertEqual(sum(row[3] for row in incremental), 8)
+
+        call_command("backfill_study_rollups", "--rebuild", "--chunk-size", "3", stdout=StringIO())
+        self.assertEqual(self.rollups(), incremental)
+
+        # Sessions finished without the signal (bulk writes, pre-rollup history) are added by the backfill
+        QuizSession.objects.filter(finished_at__isnull=False).update(rollup_recorded=False)
+        UserDailyStudy.objects.all().delete()
+        call_command("backfill_study_rollups", stdout=StringIO())
+        self.assertEqual(self.rollups(), incremental)
+        call_command("backfill_study_rollups", stdout=StringIO())
+        self.assertEqual(self.rollups(), incremental)
+
+
+class DailyFactTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = CustomUser.objects.create_user(
+            "facts-admin", "facts-admin@example.com", "pass1234", role="admin", is_staff=True
+        )
+        self.user = CustomUser.objects.create_user("facts", "facts@example.com", "pass1234")
+        self.deck = Deck.objects.create(owner=self.user, title="Facts")
+        Flashcard.bulk_add(self.deck, [Flashcard(question=f"Q{i}", answer=f"A{i}") for i in range(3)])
+
+    def play(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.post(
+            reverse("quiz-start", args=[self.deck.id]),
+            {"mode": "sequential", "adaptive_mode": False, "srs_enabled": False}, format="json",
+        )
+        session_id = response.json()["session"]["id"]
+        for i in range(3):
+            answer = f"A{i}" if i < 2 else "wrong"
+            self.client.post(reverse("quiz-answer", args=[session_id]), {"answer": answer}, format="json")
+        self.client.force_authenticate(self.admin)
+
+    def test_starts_and_finishes_are_counted_live(self):
+        self.play()
+
+        stats = self.client.get(reverse("admin-dashboard-stats")).json()["quiz"]
+        self.assertEqual((stats["total_sessions"], stats["completed_sessions"]), (1, 1))
+        self.assertAlmostEqual(stats["avg_accuracy"], 66.67)
+        usage = DeckDailyUsage.objects.get(deck=self.deck)
+        self.assertEqual((usage.sessions_started, usage.sessions_completed), (1, 1))
+
+        today = timezone.localdate()
+        data = self.client.get(reverse("admin-analytics"), {"start": today - timedelta(days=30), "end": today}).json()
+        self.assertEqual(data["quizzes"]["sessions_in_range"], 1)
+        self.assertEqual(data["quizzes"]["total_sessions"], 1)
+        self.assertEqual((data["users"]["new_this_week"], data["users"]["new_in_range"]), (2, 2))
+
+    def test_new_this_week_stays_week_scoped(self):
+        old_day = timezone.localdate() - timedelta(days=60)
+        self.client.force_authenticate(self.admin)
+        data = self.client.get(reverse("admin-analytics"), {"start": old_day, "end": old_day}).json()
+        self.assertEqual((data["users"]["new_this_week"], data["users"]["new_in_range"]), (2, 0))
+
+    def test_first_task_run_builds_the_whole_history(self):
+        self.play()
+        QuizSession.objects.update(started_at=timezone.now() - timedelta(days=40))
+        PlatformDailyFact.objects.all().delete()
+
+        build_daily_facts_task()
+        started = timezone.localdate(QuizSession.objects.get().started_at)
+        self.assertEqual(PlatformDailyFact.objects.get(date=started).sessions_started, 1)
+        self.assertEqual(PlatformDailyFact.objects.filter(sessions_completed=1).count(), 1)
+
+        # Later runs only rebuild the recent days
+        PlatformDailyFact.objects.filter(date=started).update(sessions_started=0)
+        build_daily_facts_task(days=1)
+        self.assertEqual(PlatformDailyFact.objects.get(date=started).sessions_started, 0)
+
+
+class UserAnalyticsCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user("cached", "cached@example.com", "pass1234")
+        self.deck = Deck.objects.create(owner=self.user, title="Cached")
+
+    def finish(self):
+        session = QuizSession.objects.create(user=self.user, deck=self.deck, mode="random")
+        session.total_answered, session.correct_count = 2, 2
+        session.finished_at = timezone.now()
+        session.save_live_state(flush=True)
+
+    def test_finished_quiz_bumps_the_user_version(self):
+        self.assertEqual(get_user_analytics(self.user)["quizzes"]["total_sessions"], 0)
+        version = get_version("analytics", self.user.id, scope="user")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.finish()
+
+        self.assertNotEqual(get_version("analytics", self.user.id, scope="user"), version)
+        self.assertEqual(get_user_analytics(self.user)["quizzes"]["total_sessions"], 1)
+
+    def test_stale_entry_is_served_while_one_refresh_runs(self):
+        get_user_analytics(self.user)
+        key = _user_analytics_key(self.user.id, 7)
+        cache.set(key, {"data": {"stale": True}, "fresh_until": 0})
+
+        with mock.patch("analytics.tasks.refresh_user_analytics_task.delay") as delay:
+            self.assertEqual(get_user_analytics(self.user), {"stale": True})
+            self.assertEqual(get_user_analytics(self.user), {"stale": True})
+        delay.assert_called_once_with(self.user.id, 7)
+
+        self.assertTrue(refresh_user_analytics(self.user.id))
+        self.assertIsNone(cache.get(_refresh_lock_key(self.user.id, 7)))
+        fresh = get_user_analytics(self.user)
+        self.assertNotIn("stale", fresh)
+        self.assertEqual(fresh["decks"]["total"], 1)
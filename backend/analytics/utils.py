@@ -1,3 +1,7 @@
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+
 def build_chart(queryset, label_field='date', value_field='count'):
     return [
         {
@@ -7,3 +11,17 @@ def build_chart(queryset, label_field='date', value_field='count'):
         for entry in queryset
         if entry.get(label_field) is not None
     ]
+
+
+def increment_row(model, lookup, deltas):
+    """Add deltas to the counters of the row matching lookup, creating it if needed."""
+    increments = {field: F(field) + value for field, value in deltas.items() if value}
+    row = model.objects.filter(**lookup)
+    if row.update(**increments):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, **deltas)
+    except IntegrityError:
+        # Another transaction created the row first
+        row.update(**increments)
@@ -2,6 +2,8 @@ from django.shortcuts import render
 
 from datetime import timedelta
 from django.utils import timezone
+from django.utils.dateparse import parse_date
+from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
@@ -29,12 +31,32 @@ class UserAnalyticsView(APIView):
 class AdminAnalyticsView(APIView):
     """
     Returns site-wide analytics for admins.
-    Loads cached snapshots if available (auto-generated daily).
+    Loads cached snapshots if available (auto-generated daily); any other
+    range (?start=&end= as YYYY-MM-DD, or ?days=) is served from the daily
+    fact tables.
     """
     permission_classes = [IsAdminUser]
 
     def get(self, request):
-        data = get_admin_analytics(use_snapshot=True)
+        params = request.query_params
+        try:
+            days = int(params.get("days", 7))
+            start = parse_date(params["start"]) if params.get("start") else None
+            end = parse_date(params["end"]) if params.get("end") else None
+        except ValueError:
+            days, start, end = -1, None, None
+        if days < 0 or (params.get("start") and start is None) or (params.get("end") and end is None):
+            return Response(
+                {"error": "start and end must be dates (YYYY-MM-DD) and days a non-negative integer."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if start and end and start > end:
+            return Response({"error": "start must not be after end."}, status=status.HTTP_400_BAD_REQUEST)
+
+        if "days" in params:
+            end = end or timezone.localdate()
+            start = start or end - timedelta(days=days)
+        data = get_admin_analytics(start=start, end=end, use_snapshot=True)
         return Response(data)
     
 class AdminAnalyticsHistoryView(APIView):
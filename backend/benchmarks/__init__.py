@@ -0,0 +1,11 @@
+"""
+Endpoint benchmarks against synthetic large-tenant data.
+
+    python manage.py benchmark --settings=benchmarks.settings --scale medium
+
+builds a throwaway test database (SQLite in memory, or the configured MySQL
+server with BENCHMARK_DATABASE=mysql), fills it with fixtures.build_dataset
+and drives the real DRF views through the test client, reporting p50/p95
+latency, queries per request and peak Python memory for each endpoint. Results
+are diffed against a baseline JSON in benchmarks/baselines/.
+"""
@@ -0,0 +1,255 @@
+"""
+Synthetic tenant data for the benchmarks.
+
+build_dataset() creates users with decks, flashcards, finished quiz sessions
+and their answers, SRS performance rows, notifications and achievements, all
+with bulk_create one user at a time so memory stays flat however large the
+scale. Content is drawn from a small vocabulary so search terms and tags hit a
+realistic fraction of rows. The same seed always builds the same data.
+"""
+import random
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from achievements.models import Achievements
+from analytics.facts import build_daily_facts
+from analytics.rollups import backfill_chunk
+from decks.models import (
+    Deck,
+    DeckShare,
+    DeckTag,
+    Flashcard,
+    FlashcardPerformance,
+    QuizSession,
+    QuizSessionFlashcard,
+    Tag,
+)
+from notifications.models import Notification
+from users.models import CustomUser
+
+SCALES = {
+    "small": {
+        "users": 50, "decks_per_user": 4, "cards_per_deck": 40,
+        "sessions_per_user": 10, "answers_per_session": 10, "notifications_per_user": 20,
+    },
+    "medium": {
+        "users": 500, "decks_per_user": 8, "cards_per_deck": 100,
+        "sessions_per_user": 40, "answers_per_session": 15, "notifications_per_user": 50,
+    },
+    "large": {
+        "users": 2000, "decks_per_user": 10, "cards_per_deck": 150,
+        "sessions_per_user": 100, "answers_per_session": 20, "notifications_per_user": 100,
+    },
+}
+
+BULK_BATCH_SIZE = 1000
+HISTORY_DAYS = 60
+PUBLIC_DECK_RATIO = 0.3
+SHARED_DECKS = 20
+
+WORDS = (
+    "photosynthesis", "mitochondria", "enzyme", "protein", "genome", "cell", "neuron", "osmosis",
+    "algebra", "integral", "derivative", "matrix", "vector", "theorem", "prime", "fraction",
+    "revolution", "empire", "treaty", "dynasty", "republic", "parliament", "colony", "war",
+    "verb", "noun", "idiom", "grammar", "syntax", "accent", "vocabulary", "tense",
+    "atom", "molecule", "reaction", "element", "isotope", "catalyst", "acid", "electron",
+)
+SUBJECTS = ("Biology", "Mathematics", "History", "Languages", "Chemistry")
+
+
+@dataclass
+class Dataset:
+    """What the endpoints need to address: the subject user, an admin and a large deck."""
+    user: CustomUser
+    admin: CustomUser
+    deck: Deck
+    search_term: str
+    tag: str
+    counts: dict = field(default_factory=dict)
+
+
+def _sentence(rng, words=6):
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def _subject(owner_index, deck_index):
+    """(subject, its 8 words): a deck's title and tags come from one subject."""
+    i = (owner_index + deck_index) % len(SUBJECTS)
+    return SUBJECTS[i], WORDS[i * 8:(i + 1) * 8]
+
+
+def build_dataset(scale="small", seed=0, **overrides):
+    """Create the data for a named scale (overridable per key); returns a Dataset."""
+    params = {**SCALES[scale], **{k: v for k, v in overrides.items() if v is not None}}
+    rng = random.Random(seed)
+    now = timezone.now()
+    password = make_password(None)
+    counts = dict.fromkeys(
+        ("users", "decks", "flashcards", "sessions", "answers", "performance", "notifications"), 0
+    )
+
+    with transaction.atomic():
+        Tag.objects.bulk_create([Tag(name=word) for word in WORDS], ignore_conflicts=True)
+        tag_ids = dict(Tag.objects.filter(name__in=WORDS).values_list("name", "id"))
+
+        admin = CustomUser.objects.create_user(
+            "bench-admin", "bench-admin@example.com", None, role="admin", is_staff=True
+        )
+        CustomUser.objects.bulk_create(
+            [
+                CustomUser(username=f"bench-{i}", email=f"bench-{i}@example.com", password=password)
+                for i in range(params["users"])
+            ],
+            batch_size=BULK_BATCH_SIZE,
+        )
+        users = list(CustomUser.objects.filter(username__startswith="bench-").exclude(pk=admin.pk).order_by("id"))
+        counts["users"] = len(users)
+
+        for index, user in enumerate(users):
+            _build_user(rng, now, user, index, users, params, tag_ids, counts)
+
+        # Sessions are bulk-inserted, so roll them up the way the backfill does
+        last_pk = 0
+        while last_pk is not None:
+            _, last_pk = backfill_chunk(last_pk, BULK_BATCH_SIZE)
+        # ...and build the platform facts the way backfill_daily_facts does
+        today = timezone.localdate()
+        for days_ago in range(HISTORY_DAYS + 1):
+            build_daily_facts(today - timedelta(days=days_ago))
+
+        user = users[0]
+        others = Deck.objects.filter(is_public=False).exclude(owner=user).order_by("id")[:SHARED_DECKS]
+        DeckShare.objects.bulk_create([DeckShare(deck=deck, user=user) for deck in others])
+
+    deck = Deck.objects.filter(owner=user).order_by("id").first()
+    return Dataset(user=user, admin=admin, deck=deck, search_term=WORDS[0], tag=WORDS[0], counts=counts)
+
+
+def _build_user(rng, now, user, index, users, params, tag_ids, counts):
+    decks = []
+    for d in range(params["decks_per_user"]):
+        subject, words = _subject(index, d)
+        tags = rng.sample(words, 3)
+        decks.append(Deck(
+            owner=user,
+            title=f"{subject} {rng.choice(words)} {d + 1}",
+            description=_sentence(rng, 12),
+            tags=", ".join(tags),
+            is_public=rng.random() < PUBLIC_DECK_RATIO,
+        ))
+    Deck.objects.bulk_create(decks)
+    deck_rows = list(Deck.objects.filter(owner=user).order_by("id").values_list("id", "tags"))
+    DeckTag.objects.bulk_create([
+        DeckTag(deck_id=deck_id, tag_id=tag_ids[name])
+        for deck_id, tags in deck_rows for name in tags.split(", ")
+    ])
+    counts["decks"] += len(deck_rows)
+
+    cards = [
+        Flashcard(
+            deck_id=deck_id,
+            question=f"What does {_sentence(rng, 4)} mean?",
+            answer=_sentence(rng, rng.randint(2, 8)),
+            difficulty=rng.choice(("easy", "medium", "hard")),
+        )
+        for deck_id, _ in deck_rows
+        for _ in range(params["cards_per_deck"])
+    ]
+    Flashcard.objects.bulk_create(cards, batch_size=BULK_BATCH_SIZE)
+    cards_by_deck = {}
+    for deck_id, card_id in Flashcard.objects.filter(deck__owner=user).values_list("deck_id", "id"):
+        cards_by_deck.setdefault(deck_id, []).append(card_id)
+    counts["flashcards"] += len(cards)
+
+    # SRS rows for every owned card: a slice overdue, the rest scheduled ahead
+    performance = []
+    for card_ids in cards_by_deck.values():
+        for card_id in card_ids:
+            reviewed = now - timedelta(days=rng.randint(1, HISTORY_DAYS))
+            interval = rng.choice((1, 1, 6, 6, 15, 40))
+            performance.append(FlashcardPerformance(
+                user=user,
+                flashcard_id=card_id,
+                correct_count=rng.randint(0, 10),
+                incorrect_count=rng.randint(0, 4),
+                avg_response_time=rng.uniform(1.5, 12),
+                interval=interval,
+                repetitions=rng.randint(0, 6),
+                last_reviewed=reviewed,
+                next_review_due=reviewed + timedelta(days=interval),
+            ))
+    FlashcardPerformance.objects.bulk_create(performance, batch_size=BULK_BATCH_SIZE)
+    counts["performance"] += len(performance)
+
+    _build_sessions(rng, now, user, cards_by_deck, params, counts)
+
+    notifications = []
+    for _ in range(params["notifications_per_user"]):
+        actor = rng.choice(users)
+        notifications.append(Notification(
+            recipient=user,
+            actor=actor,
+            notif_type=rng.choice(("deck_shared", "deck_rated", "achievement")),
+            verb=f"{actor.username} {_sentence(rng, 3)}",
+            is_read=rng.random() < 0.7,
+            created_at=now - timedelta(minutes=rng.randint(0, HISTORY_DAYS * 24 * 60)),
+        ))
+    Notification.objects.bulk_create(notifications, batch_size=BULK_BATCH_SIZE)
+    counts["notifications"] += len(notifications)
+
+    streak = rng.randint(0, 30)
+    Achievements.objects.bulk_create([Achievements(
+        user=user,
+        current_streak=streak,
+        best_streak=streak + rng.randint(0, 20),
+        total_study_days=streak + rng.randint(0, HISTORY_DAYS),
+        last_active=now.date(),
+    )], ignore_conflicts=True)
+
+
+def _build_sessions(rng, now, user, cards_by_deck, params, counts):
+    deck_ids = list(cards_by_deck)
+    plans = []
+    for _ in range(params["sessions_per_user"]):
+        deck_id = rng.choice(deck_ids)
+        answered = rng.sample(cards_by_deck[deck_id], min(params["answers_per_session"], len(cards_by_deck[deck_id])))
+        results = [rng.random() < 0.75 for _ in answered]
+        plans.append((deck_id, answered, results))
+
+    QuizSession.objects.bulk_create([
+        QuizSession(
+            user=user,
+            deck_id=deck_id,
+            mode=rng.choice(("random", "sequential", "timed")),
+            order=answered,
+            current_index=len(answered),
+            total_answered=len(answered),
+            correct_count=sum(results),
+        )
+        for deck_id, answered, results in plans
+    ])
+
+    # started_at is auto_now_add, so history is backdated afterwards
+    sessions = list(QuizSession.objects.filter(user=user).order_by("id"))
+    attempts = []
+    for session, (_, answered, results) in zip(sessions, plans):
+        session.started_at = now - timedelta(minutes=rng.randint(60, HISTORY_DAYS * 24 * 60))
+        session.finished_at = session.started_at + timedelta(seconds=rng.randint(60, 1800))
+        step = (session.finished_at - session.started_at) / max(len(answered), 1)
+        for i, (card_id, correct) in enumerate(zip(answered, results)):
+            attempts.append(QuizSessionFlashcard(
+                session=session,
+                flashcard_id=card_id,
+                answered=True,
+                correct=correct,
+                answer_given="benchmark",
+                answered_at=session.started_at + step * (i + 1),
+            ))
+    QuizSession.objects.bulk_update(sessions, ["started_at", "finished_at"], batch_size=BULK_BATCH_SIZE)
+    QuizSessionFlashcard.objects.bulk_create(attempts, batch_size=BULK_BATCH_SIZE)
+    counts["sessions"] += len(sessions)
+    counts["answers"] += len(attempts)
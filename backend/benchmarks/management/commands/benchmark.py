@@ -0,0 +1,129 @@
+"""
+Benchmark the main API endpoints on a synthetic dataset and diff the results
+against a stored baseline.
+
+    python manage.py benchmark --settings=benchmarks.settings --scale medium
+    python manage.py benchmark --settings=benchmarks.settings --save-baseline
+
+The dataset lives in a test database that is created for the run and dropped
+afterwards. The baseline defaults to baselines/<database>-<scale>.json.
+"""
+import json
+import time
+from importlib import import_module
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from benchmarks.fixtures import SCALES, build_dataset
+from benchmarks.runner import DEFAULT_TOLERANCE, ENDPOINTS, compare, run
+
+search_indexes = import_module("decks.migrations.0003_search_fulltext_indexes")
+
+BASELINE_DIR = Path(__file__).resolve().parents[2] / "baselines"
+
+
+class Command(BaseCommand):
+    help = "Benchmark API endpoints (latency, queries, memory) on synthetic data and compare to a baseline."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scale", choices=sorted(SCALES), default="small", help="Dataset size preset.")
+        for key in SCALES["small"]:
+            parser.add_argument(f"--{key.replace('_', '-')}", type=int, dest=key, help=f"Override {key}.")
+        parser.add_argument("--seed", type=int, default=0, help="Seed for the synthetic data.")
+        parser.add_argument("--iterations", type=int, default=20, help="Timed requests per endpoint.")
+        parser.add_argument("--warmup", type=int, default=3, help="Untimed requests per endpoint.")
+        parser.add_argument("--endpoint", action="append", dest="endpoints",
+                            help="Only run this endpoint (repeatable).")
+        parser.add_argument("--warm-cache", action="store_true", help="Keep the cache between requests.")
+        parser.add_argument("--baseline", help="Baseline JSON to compare against (or write).")
+        parser.add_argument("--save-baseline", action="store_true", help="Write the results as the baseline.")
+        parser.add_argument("--output", help="Also write the results to this JSON file.")
+        parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                            help="Allowed growth of p95 latency and peak memory, as a fraction.")
+        parser.add_argument("--noinput", "--no-input", action="store_false", dest="interactive",
+                            help="Drop a leftover test database without asking.")
+        parser.add_argument("--fail-on-regression", action="store_true",
+                            help="Exit with an error when any endpoint regressed.")
+
+    def handle(self, *args, **options):
+        endpoints = ENDPOINTS
+        if options["endpoints"]:
+            known = {endpoint.name for endpoint in ENDPOINTS}
+            unknown = set(options["endpoints"]) - known
+            if unknown:
+                raise CommandError(f"Unknown endpoint(s): {', '.join(sorted(unknown))}. Known: {', '.join(sorted(known))}.")
+            endpoints = [endpoint for endpoint in ENDPOINTS if endpoint.name in options["endpoints"]]
+        if options["iterations"] < 1:
+            raise CommandError("--iterations must be positive.")
+
+        scale = options["scale"]
+        overrides = {key: options[key] for key in SCALES[scale]}
+        old_name = connection.settings_dict["NAME"]
+        setup_test_environment(debug=False)
+        connection.creation.create_test_db(verbosity=0, autoclobber=not options["interactive"])
+        with connection.schema_editor() as editor:
+            search_indexes.add_fulltext_indexes(None, editor)
+        try:
+            started = time.perf_counter()
+            dataset = build_dataset(scale, seed=options["seed"], **overrides)
+            self.stdout.write(
+                f"Built {scale} dataset on {connection.vendor} in {time.perf_counter() - started:.1f}s: "
+                + ", ".join(f"{count} {name}" for name, count in dataset.counts.items())
+            )
+            report = run(
+                dataset,
+                endpoints,
+                iterations=options["iterations"],
+                warmup=options["warmup"],
+                warm_cache=options["warm_cache"],
+                meta={"scale": scale, "seed": options["seed"]},
+            )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        baseline_path = Path(options["baseline"] or BASELINE_DIR / f"{report['meta']['database']}-{scale}.json")
+        regressions = self.report(report, baseline_path, options["tolerance"], options["save_baseline"])
+
+        for path in filter(None, [options["output"], options["save_baseline"] and baseline_path]):
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            Path(path).write_text(json.dumps(report, indent=2) + "\n")
+            self.stdout.write(f"Wrote {path}")
+
+        if regressions and options["fail_on_regression"]:
+            raise CommandError(f"{regressions} endpoint(s) regressed against {baseline_path}.")
+
+    def report(self, report, baseline_path, tolerance, saving):
+        """Print the results table; returns the number of regressed endpoints."""
+        baseline = {}
+        if baseline_path.exists() and not saving:
+            baseline = json.loads(baseline_path.read_text())
+            if baseline.get("meta", {}).get("dataset") != report["meta"]["dataset"]:
+                self.stdout.write(self.style.WARNING(f"{baseline_path} was recorded on a different dataset."))
+        elif not saving:
+            self.stdout.write(self.style.WARNING(f"No baseline at {baseline_path}; showing results only."))
+
+        def cell(pair):
+            before, current = pair
+            if before is None:
+                return f"{current}"
+            return f"{current} ({current - before:+.1f})" if isinstance(current, float) else f"{current} ({current - before:+d})"
+
+        header = f"{'endpoint':<20} {'p50 ms':>16} {'p95 ms':>16} {'queries':>12} {'peak KB':>18}  status"
+        self.stdout.write(header)
+        self.stdout.write("-" * len(header))
+        regressed = 0
+        for row in compare(report, baseline, tolerance):
+            status = ", ".join(row["regressions"]) if row["regressions"] else ("new" if row["new"] else "ok")
+            line = (
+                f"{row['name']:<20} {cell(row['p50_ms']):>16} {cell(row['p95_ms']):>16} "
+                f"{cell(row['queries']):>12} {cell(row['peak_kb']):>18}  {status}"
+            )
+            if row["regressions"]:
+                regressed += 1
+                line = self.style.ERROR(line)
+            self.stdout.write(line)
+        return regressed
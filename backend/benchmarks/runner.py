@@ -0,0 +1,171 @@
+"""
+Drive endpoints through the DRF test client and measure them.
+
+Each endpoint is requested `warmup + iterations` times; the timed iterations
+give p50/p95 latency and the query count (from the same QueryRecorder the
+QueryStatsMiddleware uses). Peak Python memory comes from one extra request
+under tracemalloc, kept out of the timings because tracing slows every
+allocation. Unless warm_cache is set the cache is cleared before every
+request, so the numbers are the database cost rather than a cache hit.
+
+Latency is only comparable between runs on the same machine and database;
+query counts are deterministic and compared exactly.
+"""
+import math
+import platform
+import statistics
+import time
+import tracemalloc
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+import django
+from django.core.cache import cache
+from django.db import connection
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from utils.querystats import QueryRecorder
+
+DEFAULT_TOLERANCE = 0.25
+
+
+@dataclass
+class Endpoint:
+    """
+    One benchmarked request. `prepare(client, dataset)` runs untimed before
+    every request and returns (path, data) for requests that need fresh state,
+    such as answering a just-started quiz.
+    """
+    name: str
+    method: str = "get"
+    path: Optional[Callable] = None
+    data: Optional[Callable] = None
+    prepare: Optional[Callable] = None
+    as_admin: bool = False
+
+    def build(self, client, dataset):
+        if self.prepare:
+            return self.prepare(client, dataset)
+        return self.path(dataset), self.data(dataset) if self.data else None
+
+
+def _start_quiz(client, dataset):
+    response = client.post(reverse("quiz-start", args=[dataset.deck.id]), {"mode": "random"}, format="json")
+    assert response.status_code == 201, response.content
+    return reverse("quiz-answer", args=[response.data["session"]["id"]]), {"answer": "benchmark", "response_time": 4.2}
+
+
+ENDPOINTS = [
+    Endpoint("deck-list", path=lambda ds: reverse("deck-list")),
+    Endpoint("deck-list-page", path=lambda ds: reverse("deck-list"), data=lambda ds: {"limit": 50}),
+    Endpoint("deck-detail", path=lambda ds: reverse("deck-detail", args=[ds.deck.id])),
+    Endpoint("flashcard-list", path=lambda ds: reverse("flashcard-list", args=[ds.deck.id])),
+    Endpoint("search", path=lambda ds: reverse("search"), data=lambda ds: {"q": ds.search_term, "limit": 50}),
+    Endpoint("tag-facets", path=lambda ds: reverse("tag-facets"), data=lambda ds: {"tag": ds.tag}),
+    Endpoint("review-due", path=lambda ds: reverse("review-due")),
+    Endpoint("quiz-start", method="post", path=lambda ds: reverse("quiz-start", args=[ds.deck.id]),
+             data=lambda ds: {"mode": "random"}),
+    Endpoint("quiz-answer", method="post", prepare=_start_quiz),
+    Endpoint("user-analytics", path=lambda ds: reverse("user-analytics")),
+    Endpoint("admin-analytics", path=lambda ds: reverse("admin-analytics"), as_admin=True),
+    Endpoint("admin-analytics-range", path=lambda ds: reverse("admin-analytics"), data=lambda ds: {"days": 90},
+             as_admin=True),
+    Endpoint("admin-dashboard-stats", path=lambda ds: reverse("admin-dashboard-stats"), data=lambda ds: {"range": "30"},
+             as_admin=True),
+    Endpoint("notification-list", path=lambda ds: reverse("notification-list")),
+]
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def _send(client, endpoint, path, data):
+    if endpoint.method == "get":
+        return client.get(path, data)
+    return getattr(client, endpoint.method)(path, data, format="json")
+
+
+def measure(endpoint, dataset, iterations=20, warmup=3, warm_cache=False):
+    """{"p50_ms", "p95_ms", "mean_ms", "queries", "peak_kb", "status"} for one endpoint."""
+    client = APIClient()
+    client.force_authenticate(dataset.admin if endpoint.as_admin else dataset.user)
+
+    timings, queries, statuses = [], [], set()
+    for i in range(warmup + iterations):
+        path, data = endpoint.build(client, dataset)
+        if not warm_cache:
+            cache.clear()
+        recorder = QueryRecorder(keep=0)
+        with recorder.record():
+            started = time.perf_counter()
+            response = _send(client, endpoint, path, data)
+            elapsed = time.perf_counter() - started
+        if i >= warmup:
+            timings.append(elapsed * 1000)
+            queries.append(recorder.count)
+            statuses.add(response.status_code)
+
+    path, data = endpoint.build(client, dataset)
+    if not warm_cache:
+        cache.clear()
+    tracemalloc.start()
+    try:
+        _send(client, endpoint, path, data)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "p50_ms": round(percentile(timings, 50), 2),
+        "p95_ms": round(percentile(timings, 95), 2),
+        "mean_ms": round(statistics.fmean(timings), 2),
+        # Max, not mean: a request that sometimes runs extra queries is what matters
+        "queries": max(queries),
+        "peak_kb": round(peak / 1024, 1),
+        "status": sorted(statuses),
+    }
+
+
+def run(dataset, endpoints=ENDPOINTS, iterations=20, warmup=3, warm_cache=False, meta=None):
+    """Measure every endpoint; returns the report that is saved as a baseline."""
+    return {
+        "meta": {
+            "database": connection.vendor,
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "iterations": iterations,
+            "warm_cache": warm_cache,
+            "dataset": dataset.counts,
+            **(meta or {}),
+        },
+        "endpoints": {
+            endpoint.name: measure(endpoint, dataset, iterations, warmup, warm_cache)
+            for endpoint in endpoints
+        },
+    }
+
+
+def compare(report, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Per endpoint in report: {"name", metric: (baseline, current)..., "regressions": [...]}.
+    More queries than the baseline is always a regression; p95 latency and
+    peak memory regress when they grow by more than `tolerance` (a fraction).
+    """
+    rows = []
+    for name, current in report["endpoints"].items():
+        before = baseline.get("endpoints", {}).get(name)
+        row = {"name": name, "new": before is None, "regressions": []}
+        for metric in ("p50_ms", "p95_ms", "queries", "peak_kb"):
+            row[metric] = (before[metric] if before else None, current[metric])
+        if before:
+            if current["queries"] > before["queries"]:
+                row["regressions"].append("queries")
+            for metric in ("p95_ms", "peak_kb"):
+                if current[metric] > before[metric] * (1 + tolerance):
+                    row["regressions"].append(metric)
+        rows.append(row)
+    return rows
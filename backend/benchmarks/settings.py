@@ -0,0 +1,42 @@
+"""
+Settings for running the benchmark command. The real database is never
+touched: the command creates and drops a test database on whichever server
+is configured here.
+"""
+import os
+import tempfile
+
+from brainq.settings import *  # noqa: F401,F403
+from brainq.settings import DATABASES, INSTALLED_APPS, LOGGING
+
+INSTALLED_APPS = [*INSTALLED_APPS, "benchmarks"]
+
+# BENCHMARK_DATABASE=mysql keeps the DB_* server from brainq.settings (test_<DB_NAME>)
+if os.environ.get("BENCHMARK_DATABASE", "sqlite") == "sqlite":
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": ":memory:",
+        }
+    }
+
+# The schema is built from the models (the migration history assumes an
+# existing production database); the command adds the FULLTEXT indexes itself.
+DATABASES["default"]["TEST"] = {"MIGRATE": False}
+
+# Private per-process cache so runs never read or evict a shared Redis
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "benchmarks",
+    }
+}
+
+CELERY_TASK_ALWAYS_EAGER = True
+
+# The report already lists queries per endpoint; don't also log every request
+# that goes over its query budget on the synthetic data
+LOGGING["loggers"]["brainq.queries"]["level"] = "ERROR"
+LOGGING["handlers"]["file"]["filename"] = os.path.join(
+    os.environ.get("DJANGO_LOG_DIR") or tempfile.gettempdir(), "admin_activity.log"
+)
@@ -8,6 +8,8 @@ Generated by 'django-admin startproject' using Django 5.2.7.
 
 from pathlib import Path
 import os
+import sys
+import tempfile
 from dotenv import load_dotenv
 from celery.schedules import crontab
 from logging.handlers import RotatingFileHandler
@@ -96,6 +98,8 @@ REST_FRAMEWORK = {
 # =====================
 
 MIDDLEWARE = [
+    # Outermost, so queries made by the other middleware are counted too
+    'utils.querystats.QueryStatsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -109,6 +113,10 @@ MIDDLEWARE = [
 ]
 
 
+# Per-request SQL stats (utils/querystats.py); budgets per URL route name
+QUERY_STATS_HEADERS = os.environ.get("QUERY_STATS_HEADERS", str(DEBUG)) == "True"
+QUERY_BUDGET_FILE = BASE_DIR / "query_budgets.json"
+
 ROOT_URLCONF = 'brainq.urls'
 WSGI_APPLICATION = 'brainq.wsgi.application'
 
@@ -209,6 +217,15 @@ CELERY_BEAT_SCHEDULE = {
         "task": "analytics.tasks.capture_daily_admin_metrics_task",
         "schedule": crontab(hour=0, minute=0),
     },
+    "refresh-today-facts": {
+        "task": "analytics.tasks.build_daily_facts_task",
+        "schedule": crontab(minute="*/15"),
+    },
+    "finalize-daily-facts": {
+        "task": "analytics.tasks.build_daily_facts_task",
+        "schedule": crontab(hour=0, minute=10),
+        "kwargs": {"days": 1},
+    },
     "check-and-send-reminders": {
         "task": "reminders.tasks.check_and_send_reminders",
         "schedule": crontab(minute="*"),
@@ -217,6 +234,14 @@ CELERY_BEAT_SCHEDULE = {
         "task": "notifications.tasks.retry_pending_notifications",
         "schedule": crontab(minute="*/5"),  # every 5 minutes
     },
+    "flush-quiz-session-state": {
+        "task": "decks.tasks.flush_quiz_session_state",
+        "schedule": crontab(minute="*/5"),
+    },
+    "materialize-review-queues": {
+        "task": "decks.tasks.materialize_review_queues",
+        "schedule": crontab(hour=0, minute=5),
+    },
 }
 
 
@@ -241,11 +266,19 @@ else:
         }
     }
 
+# Keep live quiz session state in the cache and write it back in batches.
+# Only enable with a shared cache (Redis), never with per-process LocMem.
+QUIZ_SESSION_STATE_CACHE = os.getenv("QUIZ_SESSION_STATE_CACHE", "False") == "True"
+
 
 
 # ==============================
 # LOGGING CONFIGURATION
 # ==============================
+# Test runs (manage.py test) write their log files outside the source tree
+TESTING = len(sys.argv) > 1 and sys.argv[1] == "test"
+LOG_DIR = os.environ.get("DJANGO_LOG_DIR") or (tempfile.gettempdir() if TESTING else BASE_DIR)
+
 LOGGING = {
     "version": 1,
     "disable_existing_loggers": False,
@@ -263,7 +296,7 @@ LOGGING = {
         "file": {
             "level": "INFO",
             "class": "logging.handlers.RotatingFileHandler",
-            "filename": os.path.join(BASE_DIR, "admin_activity.log"),
+            "filename": os.path.join(LOG_DIR, "admin_activity.log"),
             "maxBytes": 5 * 1024 * 1024,  # 5 MB
             "backupCount": 5,             # keep last 5 logs
             "formatter": "verbose",
@@ -289,6 +322,11 @@ LOGGING = {
             "level": "WARNING",
             "propagate": False,
         },
+        "brainq.queries": {  # per-request SQL stats; DEBUG logs every request
+            "handlers": ["console"],
+            "level": os.environ.get("QUERY_STATS_LOG_LEVEL", "WARNING"),
+            "propagate": False,
+        },
     },
 }
 
@@ -0,0 +1,373 @@
+"""
+Anki (.apkg) import and export.
+
+An .apkg is a zip holding a SQLite collection (collection.anki21, or
+collection.anki2 from older Anki versions) and a media map. Import copies the
+collection to a temporary file and reads every note together with its first
+card's review history in one ordered query, fetchmany() at a time, so memory
+is bounded by ANKI_BATCH_SIZE however large the deck. Export writes a
+one-deck "Basic" collection from keyset-paged chunks of the deck.
+
+Only the first two note fields (front/back) and the first card of each note
+are used. Media is not transferred.
+"""
+import html
+import json
+import re
+import secrets
+import shutil
+import sqlite3
+import string
+import tempfile
+import time
+import zipfile
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+from hashlib import sha1
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Deck, DeckTheme, Flashcard, FlashcardPerformance, SM2_INITIAL_EASINESS, SM2_MIN_EASINESS
+
+ANKI_BATCH_SIZE = getattr(settings, "ANKI_BATCH_SIZE", 1000)
+ANKI_MAX_UPLOAD_BYTES = getattr(settings, "ANKI_MAX_UPLOAD_BYTES", 200 * 1024 * 1024)
+ANKI_MAX_COLLECTION_BYTES = getattr(settings, "ANKI_MAX_COLLECTION_BYTES", 1024 * 1024 * 1024)
+
+# Newest first: exports that contain collection.anki21 keep a stub collection.anki2
+COLLECTION_NAMES = ("collection.anki21", "collection.anki2")
+FIELD_SEPARATOR = "\x1f"
+COPY_BUFFER_SIZE = 1024 * 1024
+DIFFICULTIES = {value for value, _ in Flashcard.DIFFICULTY_CHOICES}
+
+
+class AnkiError(Exception):
+    """The file cannot be imported; the message is meant for the user."""
+
+
+# ---------- Field conversion ----------
+
+_BREAK_RE = re.compile(r"<br\s*/?>|</(?:div|p|li)>", re.IGNORECASE)
+_TAG_RE = re.compile(r"<[^>]*>")
+
+
+def field_to_text(value):
+    """Anki field HTML to plain text, keeping line breaks."""
+    text = html.unescape(_TAG_RE.sub("", _BREAK_RE.sub("\n", value)))
+    return text.replace("\xa0", " ").strip()
+
+
+def text_to_field(value):
+    return html.escape(value).replace("\n", "<br>")
+
+
+# ---------- Import ----------
+
+# One row per note with its first card and that card's graded reviews
+# (revlog types 0-3 are learn/review/relearn/filtered; ease 1 is "Again").
+NOTES_SQL = """
+    SELECT n.id, n.flds, n.tags, c.ivl, c.factor,
+           COUNT(r.id), COALESCE(SUM(r.ease > 1), 0), AVG(r.time), MAX(r.id),
+           COALESCE(SUM(r.ease > 1 AND r.id > COALESCE(
+               (SELECT MAX(f.id) FROM revlog f WHERE f.cid = c.id AND f.ease = 1 AND f.type <= 3), 0
+           )), 0)
+    FROM notes n
+    LEFT JOIN cards c ON c.id = (SELECT id FROM cards WHERE nid = n.id ORDER BY ord, id LIMIT 1)
+    LEFT JOIN revlog r ON r.cid = c.id AND r.ease > 0 AND r.type <= 3
+    GROUP BY n.id
+    ORDER BY n.id
+"""
+
+
+def open_collection(source, workdir):
+    """Copy the upload and its collection into workdir; returns a SQLite connection."""
+    apkg_path = Path(workdir) / "upload.apkg"
+    with open(apkg_path, "wb") as out:
+        shutil.copyfileobj(source, out, COPY_BUFFER_SIZE)
+
+    try:
+        archive = zipfile.ZipFile(apkg_path)
+    except zipfile.BadZipFile:
+        raise AnkiError("Not an Anki package (.apkg) file.")
+
+    with archive:
+        names = set(archive.namelist())
+        name = next((n for n in COLLECTION_NAMES if n in names), None)
+        if name is None:
+            if "collection.anki21b" in names:
+                raise AnkiError('Re-export from Anki with "Support older Anki versions" enabled.')
+            raise AnkiError("No Anki collection found in the file.")
+        if archive.getinfo(name).file_size > ANKI_MAX_COLLECTION_BYTES:
+            raise AnkiError("The Anki collection is too large to import.")
+
+        collection_path = Path(workdir) / "collection.sqlite"
+        with archive.open(name) as member, open(collection_path, "wb") as out:
+            shutil.copyfileobj(member, out, COPY_BUFFER_SIZE)
+
+    conn = sqlite3.connect(collection_path)
+    try:
+        conn.execute("SELECT 1 FROM notes LIMIT 1")
+    except sqlite3.DatabaseError:
+        conn.close()
+        raise AnkiError("The Anki collection could not be read.")
+    return conn
+
+
+def collection_title(conn):
+    """Name of the Anki deck holding most cards, or None."""
+    try:
+        decks = json.loads(conn.execute("SELECT decks FROM col").fetchone()[0] or "{}")
+        row = conn.execute("SELECT did FROM cards GROUP BY did ORDER BY COUNT(*) DESC LIMIT 1").fetchone()
+    except (sqlite3.DatabaseError, TypeError, ValueError):
+        return None
+    name = decks.get(str(row[0]), {}).get("name") if row else None
+    # Subdecks are "Parent::Child"
+    return name.split("::")[-1].strip() if name else None
+
+
+def _unique_title(user, base):
+    base = base[:110]
+    title, counter = base, 1
+    while Deck.objects.filter(owner=user, title=title).exists():
+        counter += 1
+        title = f"{base} ({counter})"
+    return title
+
+
+def _performance(user, flashcard, ivl, factor, reviews, correct, avg_time_ms, last_review_ms, streak):
+    perf = FlashcardPerformance(
+        user=user,
+        flashcard=flashcard,
+        correct_count=correct,
+        incorrect_count=reviews - correct,
+        avg_response_time=(avg_time_ms or 0) / 1000,
+        # Anki stores ease as permille; negative ivl is a learning step in seconds
+        easiness=max(SM2_MIN_EASINESS, factor / 1000) if factor else SM2_INITIAL_EASINESS,
+        interval=max(ivl or 0, 1),
+        repetitions=streak,
+        last_reviewed=datetime.fromtimestamp(last_review_ms / 1000, tz=dt_timezone.utc),
+    )
+    perf.next_review_due = perf.last_reviewed + timedelta(days=perf.interval)
+    perf.update_difficulty()
+    return perf
+
+
+def import_apkg(user, source, title=""):
+    """
+    Create a deck for user from the .apkg file object `source`, with one
+    flashcard per note and, for reviewed cards, a FlashcardPerformance row
+    carrying the Anki history. Returns (deck, counts).
+    """
+    with tempfile.TemporaryDirectory() as workdir:
+        conn = open_collection(source, workdir)
+        try:
+            with transaction.atomic():
+                return _import_collection(user, conn, title)
+        finally:
+            conn.close()
+
+
+def _import_collection(user, conn, title):
+    deck = Deck.objects.create(
+        owner=user,
+        title=_unique_title(user, title or collection_title(conn) or "Anki import"),
+        theme=DeckTheme.objects.filter(owner__isnull=True, is_system_theme=True).first(),
+    )
+
+    counts = {"notes": 0, "flashcards": 0, "reviews": 0, "skipped": 0}
+    cursor = conn.execute(NOTES_SQL)
+    while True:
+        rows = cursor.fetchmany(ANKI_BATCH_SIZE)
+        if not rows:
+            break
+        counts["notes"] += len(rows)
+
+        flashcards, histories = [], []
+        for _, flds, tags, *history in rows:
+            fields = flds.split(FIELD_SEPARATOR)
+            question = field_to_text(fields[0])
+            answer = field_to_text(fields[1]) if len(fields) > 1 else ""
+            if not question or not answer:
+                counts["skipped"] += 1
+                continue
+            difficulty = next((tag for tag in tags.lower().split() if tag in DIFFICULTIES), "medium")
+            flashcards.append(Flashcard(question=question, answer=answer, difficulty=difficulty))
+            histories.append(history)
+
+        Flashcard.bulk_add(deck, flashcards)
+        performances = [
+            _performance(user, flashcard, *history)
+            for flashcard, history in zip(flashcards, histories)
+            if history[2]  # reviewed at least once
+        ]
+        FlashcardPerformance.objects.bulk_create(performances, batch_size=ANKI_BATCH_SIZE)
+        counts["flashcards"] += len(flashcards)
+        counts["reviews"] += sum(perf.correct_count + perf.incorrect_count for perf in performances)
+
+    if counts["reviews"]:
+        from .review_queue import invalidate_review_queue
+        transaction.on_commit(lambda: invalidate_review_queue(user.id))
+    return deck, counts
+
+
+# ---------- Export ----------
+
+SCHEMA_SQL = """
+    CREATE TABLE col (
+        id integer primary key, crt integer not null, mod integer not null, scm integer not null,
+        ver integer not null, dty integer not null, usn integer not null, ls integer not null,
+        conf text not null, models text not null, decks text not null, dconf text not null, tags text not null
+    );
+    CREATE TABLE notes (
+        id integer primary key, guid text not null, mid integer not null, mod integer not null,
+        usn integer not null, tags text not null, flds text not null, sfld integer not null,
+        csum integer not null, flags integer not null, data text not null
+    );
+    CREATE TABLE cards (
+        id integer primary key, nid integer not null, did integer not null, ord integer not null,
+        mod integer not null, usn integer not null, type integer not null, queue integer not null,
+        due integer not null, ivl integer not null, factor integer not null, reps integer not null,
+        lapses integer not null, left integer not null, odue integer not null, odid integer not null,
+        flags integer not null, data text not null
+    );
+    CREATE TABLE revlog (
+        id integer primary key, cid integer not null, usn integer not null, ease integer not null,
+        ivl integer not null, lastIvl integer not null, factor integer not null, time integer not null,
+        type integer not null
+    );
+    CREATE TABLE graves (usn integer not null, oid integer not null, type integer not null);
+    CREATE INDEX ix_notes_usn ON notes (usn);
+    CREATE INDEX ix_cards_usn ON cards (usn);
+    CREATE INDEX ix_revlog_usn ON revlog (usn);
+    CREATE INDEX ix_cards_nid ON cards (nid);
+    CREATE INDEX ix_cards_sched ON cards (did, queue, due);
+    CREATE INDEX ix_revlog_cid ON revlog (cid);
+    CREATE INDEX ix_notes_csum ON notes (csum);
+"""
+
+DEFAULT_DECK_CONFIG = {
+    "id": 1, "name": "Default", "mod": 0, "usn": 0, "maxTaken": 60, "autoplay": True, "timer": 0,
+    "replayq": True, "dyn": False,
+    "new": {"delays": [1, 10], "ints": [1, 4, 7], "initialFactor": 2500, "order": 1, "perDay": 20,
+            "bury": True, "separate": True},
+    "lapse": {"delays": [10], "mult": 0, "minInt": 1, "leechFails": 8, "leechAction": 0},
+    "rev": {"perDay": 200, "ease4": 1.3, "fuzz": 0.05, "ivlFct": 1, "maxIvl": 36500, "bury": True,
+            "minSpace": 1, "hardFactor": 1.2},
+}
+
+GUID_ALPHABET = string.ascii_letters + string.digits
+
+
+def _deck_json(did, name, mod):
+    return {
+        "id": did, "name": name, "mod": mod, "usn": -1, "desc": "", "dyn": 0, "conf": 1,
+        "collapsed": False, "browserCollapsed": False, "extendNew": 10, "extendRev": 50,
+        "newToday": [0, 0], "revToday": [0, 0], "lrnToday": [0, 0], "timeToday": [0, 0],
+    }
+
+
+def _model_json(mid, did, mod):
+    field = {"sticky": False, "rtl": False, "font": "Arial", "size": 20, "media": []}
+    return {
+        "id": mid, "name": "Basic", "type": 0, "mod": mod, "usn": -1, "sortf": 0, "did": did,
+        "tmpls": [{
+            "name": "Card 1", "ord": 0, "qfmt": "{{Front}}",
+            "afmt": "{{FrontSide}}\n\n<hr id=answer>\n\n{{Back}}",
+            "did": None, "bqfmt": "", "bafmt": "",
+        }],
+        "flds": [{"name": "Front", "ord": 0, **field}, {"name": "Back", "ord": 1, **field}],
+        "css": ".card { font-family: arial; font-size: 20px; text-align: center; }",
+        "latexPre": "\\documentclass[12pt]{article}\n\\begin{document}\n",
+        "latexPost": "\\end{document}",
+        "tags": [], "vers": [], "req": [[0, "any", [0]]],
+    }
+
+
+def _card_schedule(perf, crt_day, position):
+    """(type, queue, due, ivl, factor, reps, lapses) for an Anki card."""
+    if perf is None or perf.last_reviewed is None or perf.next_review_due is None:
+        return 0, 0, position, 0, 0, 0, 0
+    due_day = (timezone.localdate(perf.next_review_due) - crt_day).days
+    return (
+        2, 2, due_day, max(perf.interval, 1), int(perf.easiness * 1000),
+        perf.correct_count + perf.incorrect_count, perf.incorrect_count,
+    )
+
+
+def export_apkg(deck, user, destination):
+    """
+    Write deck as an .apkg to the binary file object `destination`. Cards
+    carry `user`'s scheduling where they have reviewed them. Returns counts.
+    """
+    with tempfile.TemporaryDirectory() as workdir:
+        collection_path = Path(workdir) / "collection.anki2"
+        conn = sqlite3.connect(collection_path)
+        try:
+            counts = _write_collection(conn, deck, user)
+            conn.commit()
+        finally:
+            conn.close()
+        with zipfile.ZipFile(destination, "w", zipfile.ZIP_DEFLATED) as archive:
+            archive.write(collection_path, "collection.anki2")
+            archive.writestr("media", "{}")
+    return counts
+
+
+def _write_collection(conn, deck, user):
+    now = int(time.time())
+    # Anki ids are millisecond timestamps; deck, model and note/card ids only need to be unique
+    base_id = now * 1000
+    did, mid = base_id, base_id + 1
+    crt_day = timezone.localdate()
+    crt = int(timezone.make_aware(datetime.combine(crt_day, datetime.min.time())).timestamp())
+
+    conn.executescript(SCHEMA_SQL)
+    conn.execute(
+        "INSERT INTO col VALUES (1, ?, ?, ?, 11, 0, 0, 0, ?, ?, ?, ?, '{}')",
+        (
+            crt, now * 1000, now * 1000,
+            json.dumps({"activeDecks": [did], "curDeck": did, "curModel": str(mid), "nextPos": 1,
+                        "newSpread": 0, "collapseTime": 1200, "timeLim": 0, "estTimes": True,
+                        "dueCounts": True, "sortType": "noteFld", "sortBackwards": False, "addToCur": True}),
+            json.dumps({str(mid): _model_json(mid, did, now)}),
+            json.dumps({"1": _deck_json(1, "Default", now), str(did): _deck_json(did, deck.title, now)}),
+            json.dumps({"1": DEFAULT_DECK_CONFIG}),
+        ),
+    )
+
+    counts = {"flashcards": 0, "scheduled": 0}
+    queryset = Flashcard.objects.filter(deck=deck).order_by("id").values_list("id", "question", "answer", "difficulty")
+    last_id = 0
+    while True:
+        chunk = list(queryset.filter(id__gt=last_id)[:ANKI_BATCH_SIZE])
+        if not chunk:
+            break
+        last_id = chunk[-1][0]
+        performances = {
+            perf.flashcard_id: perf
+            for perf in FlashcardPerformance.objects.filter(user=user, flashcard_id__in=[row[0] for row in chunk])
+        }
+
+        notes, cards = [], []
+        for flashcard_id, question, answer, difficulty in chunk:
+            position = counts["flashcards"]
+            note_id = base_id + 2 + position
+            guid = "".join(secrets.choice(GUID_ALPHABET) for _ in range(10))
+            csum = int(sha1(question.encode()).hexdigest()[:8], 16)
+            notes.append((
+                note_id, guid, mid, now, -1, f" {difficulty} ",
+                text_to_field(question) + FIELD_SEPARATOR + text_to_field(answer), question, csum, 0, "",
+            ))
+            schedule = _card_schedule(performances.get(flashcard_id), crt_day, position)
+            cards.append((note_id, note_id, did, 0, now, -1, *schedule, 0, 0, 0, 0, ""))
+            counts["flashcards"] += 1
+            counts["scheduled"] += schedule[0] == 2
+
+        conn.executemany("INSERT INTO notes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", notes)
+        conn.executemany(
+            "INSERT INTO cards VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", cards
+        )
+
+    return counts
@@ -0,0 +1,162 @@
+import hashlib
+from random import sample, shuffle
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.http import quote_etag
+
+from utils.caching import bump_version, get_version
+
+from .models import Deck, Flashcard
+from .serializers import DeckSerializer
+
+QUIZ_PACK_TTL = getattr(settings, "QUIZ_PACK_TTL", 60 * 60 * 24)
+DECK_PAYLOAD_TTL = getattr(settings, "DECK_PAYLOAD_TTL", 60 * 60)
+SHARE_PAGE_TTL = getattr(settings, "SHARE_PAGE_TTL", 60 * 60)
+
+# DeckSerializer fields that depend on who is asking; never cached
+DECK_ACCESS_FIELDS = ("access_level", "can_edit")
+
+
+# ---------- Quiz pack ----------
+
+class QuizPack:
+    """
+    Compact per-deck quiz data: parallel arrays of card ids, questions,
+    answers and difficulty, ordered by creation time.
+    """
+
+    def __init__(self, ids, questions, answers, difficulty):
+        self.ids = ids
+        self.questions = questions
+        self.answers = answers
+        self.difficulty = difficulty
+        self._positions = {fid: i for i, fid in enumerate(ids)}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, flashcard_id):
+        return flashcard_id in self._positions
+
+    def question(self, flashcard_id):
+        return self.questions[self._positions[flashcard_id]]
+
+    def answer(self, flashcard_id):
+        return self.answers[self._positions[flashcard_id]]
+
+    def options(self, flashcard_id):
+        """Correct answer plus three distractors drawn from the rest of the deck, shuffled."""
+        pos = self._positions[flashcard_id]
+        others = len(self.answers) - 1
+        if others < 3:
+            distractors = ([a for i, a in enumerate(self.answers) if i != pos] * 3)[:3]
+        else:
+            distractors = [self.answers[i + (i >= pos)] for i in sample(range(others), 3)]
+        options = distractors + [self.answers[pos]]
+        shuffle(options)
+        return options
+
+
+def _quiz_pack_key(deck_id):
+    return f"deck:{deck_id}:quiz_pack:{get_version('quiz_pack', deck_id)}"
+
+
+def get_quiz_pack(deck_id):
+    key = _quiz_pack_key(deck_id)
+    data = cache.get(key)
+    if data is None:
+        rows = Flashcard.objects.filter(deck_id=deck_id).order_by('created_at', 'id').values_list(
+            'id', 'question', 'answer', 'difficulty'
+        )
+        columns = [list(col) for col in zip(*rows)] or [[], [], [], []]
+        data = dict(zip(('ids', 'questions', 'answers', 'difficulty'), columns))
+        cache.set(key, data, QUIZ_PACK_TTL)
+    return QuizPack(**data)
+
+
+def invalidate_quiz_pack(deck_id):
+    bump_version('quiz_pack', deck_id)
+
+
+# ---------- Deck payload ----------
+
+def _deck_payload_key(deck):
+    theme_version = get_version("payload", deck.theme_id, scope="theme") if deck.theme_id else 0
+    return f"deck:{deck.pk}:payload:{get_version('payload', deck.pk)}:{deck.theme_id}:{theme_version}"
+
+
+def get_deck_payload(deck, request):
+    """
+    DeckSerializer output for `deck`: the shared part (deck, theme, cards,
+    shares, rating) from the cache, the per-user access fields computed for
+    this request.
+    """
+    serializer = DeckSerializer(deck, context={"request": request})
+    key = _deck_payload_key(deck)
+    payload = cache.get(key)
+    if payload is None:
+        payload = dict(serializer.data)
+        # Keep the keys (and their order) but never store per-user values
+        payload.update(dict.fromkeys(DECK_ACCESS_FIELDS))
+        cache.set(key, payload, DECK_PAYLOAD_TTL)
+    payload.update(
+        access_level=serializer.get_access_level(deck),
+        can_edit=serializer.get_can_edit(deck),
+    )
+    return payload
+
+
+def invalidate_deck_payload(deck_id):
+    bump_version("payload", deck_id)
+
+
+def invalidate_deck_content(deck_id):
+    """
+    What the Flashcard post_save/post_delete receivers do, once per deck, for
+    bulk writes: bulk_create and bulk_update send no signals, and the
+    receivers skip queryset deletes.
+    """
+    invalidate_quiz_pack(deck_id)
+    invalidate_deck_payload(deck_id)
+    Deck.touch_content(deck_id)
+
+
+def invalidate_theme_payloads(theme_id):
+    """Every deck using the theme embeds it; one bump covers them all."""
+    bump_version("payload", theme_id, scope="theme")
+
+
+# ---------- Share page ----------
+# Rendered deck_share.html per (share link, origin), under the deck's payload
+# version so any deck, card, share or feedback change re-renders it. The
+# link -> deck id entry is what makes a page reachable; purging it revokes
+# every cached copy at once.
+
+def _share_deck_key(share_link):
+    return f"share:{share_link}:deck"
+
+
+def _share_page_key(deck_id, share_link, origin):
+    return f"share:{share_link}:page:{get_version('payload', deck_id)}:{origin}"
+
+
+def get_share_page(share_link, origin):
+    """Cached {"html", "etag"} for a share link, or None."""
+    deck_id = cache.get(_share_deck_key(share_link))
+    if deck_id is None:
+        return None
+    return cache.get(_share_page_key(deck_id, share_link, origin))
+
+
+def set_share_page(deck_id, share_link, origin, html):
+    page = {"html": html, "etag": quote_etag(hashlib.md5(html.encode()).hexdigest())}
+    cache.set_many({
+        _share_deck_key(share_link): deck_id,
+        _share_page_key(deck_id, share_link, origin): page,
+    }, SHARE_PAGE_TTL)
+    return page
+
+
+def purge_share_page(share_link):
+    cache.delete(_share_deck_key(share_link))
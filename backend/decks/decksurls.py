@@ -22,6 +22,11 @@ urlpatterns = [
     path('decks/<int:deck_id>/flashcards/', FlashcardListView.as_view(), name='flashcard-list'),
     path('flashcards/create/', CreateFlashcardView.as_view(), name='flashcard-create'),
     path('flashcards/<int:pk>/delete/', DeleteFlashcardView.as_view(), name='flashcard-delete'),
+    path('decks/<int:pk>/import/', DeckImportView.as_view(), name='deck-import'),
+    path('decks/<int:pk>/export/', DeckExportView.as_view(), name='deck-export'),
+    path('decks/import/anki/', AnkiImportView.as_view(), name='deck-import-anki'),
+    path('decks/<int:pk>/export/anki/', AnkiExportView.as_view(), name='deck-export-anki'),
+    path('decks/transfer-jobs/<int:pk>/', DeckTransferJobDetailView.as_view(), name='deck-transfer-job'),
     
     # ----------------------
     # Deck Sharing
@@ -45,6 +50,7 @@ urlpatterns = [
     # Search
     # ----------------------
     path('search/', SearchView.as_view(), name='search'),
+    path('tags/facets/', TagFacetsView.as_view(), name='tag-facets'),
 
 
 
@@ -59,4 +65,6 @@ urlpatterns = [
     path('quiz/change_mode/<int:session_id>/', ChangeQuizModeView.as_view(), name='quiz-change-mode'),
     path('quiz/finish/<int:session_id>/', FinishQuizSessionView.as_view(), name='quiz-finish'),
     path('quiz/results/<int:session_id>/', QuizSessionResultsView.as_view(), name='quiz-results'),
+    path('quiz/sync/', SyncQuizAnswersView.as_view(), name='quiz-sync'),
+    path('review/due/', ReviewQueueView.as_view(), name='review-due'),
 ]
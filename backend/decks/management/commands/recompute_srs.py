@@ -0,0 +1,165 @@
+"""
+Recompute SM-2 scheduling for every FlashcardPerformance row from its answer
+history, vectorised with NumPy.
+
+History is rebuilt from answered QuizSessionFlashcard rows of adaptive/SRS
+sessions (skips are stored with an empty answer and never graded). Rows are
+streamed in primary-key chunks and written back with bulk_update.
+"""
+import math
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from decks.models import (
+    FlashcardPerformance,
+    QuizSessionFlashcard,
+    SM2_GRADE_CORRECT,
+    SM2_GRADE_INCORRECT,
+    SM2_INITIAL_EASINESS,
+    SM2_MIN_EASINESS,
+    SM2_PASSING_GRADE,
+)
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+SRS_FIELDS = ["easiness", "interval", "repetitions", "last_reviewed", "next_review_due"]
+
+
+def sm2_replay(grades, mask):
+    """
+    Replay SM-2 over a padded (rows x steps) grade matrix; mask marks real
+    reviews. Returns final (easiness, interval, repetitions) arrays and
+    matches FlashcardPerformance.update_spaced_repetition step for step.
+    """
+    rows = grades.shape[0]
+    easiness = np.full(rows, SM2_INITIAL_EASINESS)
+    interval = np.zeros(rows, dtype=np.int64)
+    repetitions = np.zeros(rows, dtype=np.int64)
+
+    for step in range(grades.shape[1]):
+        active = mask[:, step]
+        q = 5 - grades[:, step]
+        new_e = np.maximum(SM2_MIN_EASINESS, easiness + (0.1 - q * (0.08 + q * 0.02)))
+        passed = grades[:, step] >= SM2_PASSING_GRADE
+        new_reps = np.where(passed, repetitions + 1, 0)
+        new_interval = np.where(
+            ~passed | (new_reps == 1), 1,
+            np.where(new_reps == 2, 6, np.floor(interval * new_e).astype(np.int64)),
+        )
+        easiness = np.where(active, new_e, easiness)
+        repetitions = np.where(active, new_reps, repetitions)
+        interval = np.where(active, new_interval, interval)
+
+    return easiness, interval, repetitions
+
+
+class Command(BaseCommand):
+    help = "Recompute SM-2 easiness/interval/repetitions and next_review_due from answer history."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=2000, help="Performance rows per batch.")
+        parser.add_argument("--user", type=int, help="Only recompute rows for this user id.")
+        parser.add_argument("--dry-run", action="store_true", help="Report changes without writing them.")
+
+    def handle(self, *args, **options):
+        if np is None:
+            raise CommandError("recompute_srs requires NumPy (pip install numpy).")
+        chunk_size = options["chunk_size"]
+        if chunk_size < 1:
+            raise CommandError("--chunk-size must be positive.")
+        dry_run = options["dry_run"]
+        show_diff = options["verbosity"] >= 2
+
+        queryset = FlashcardPerformance.objects.order_by("pk")
+        if options["user"]:
+            queryset = queryset.filter(user_id=options["user"])
+
+        started = time.perf_counter()
+        scanned = changed = without_history = 0
+        last_pk = 0
+        while True:
+            chunk = list(queryset.filter(pk__gt=last_pk)[:chunk_size])
+            if not chunk:
+                break
+            last_pk = chunk[-1].pk
+            scanned += len(chunk)
+
+            updates, skipped = self.recompute_chunk(chunk)
+            without_history += skipped
+            changed += len(updates)
+
+            if show_diff:
+                for perf, diff in updates:
+                    self.stdout.write(f"  perf {perf.pk}: " + ", ".join(
+                        f"{field} {old} -> {new}" for field, (old, new) in diff.items()
+                    ))
+            if updates and not dry_run:
+                FlashcardPerformance.objects.bulk_update([perf for perf, _ in updates], SRS_FIELDS)
+
+        elapsed = time.perf_counter() - started
+        rate = scanned / elapsed if elapsed else 0
+        verb = "would change" if dry_run else "changed"
+        self.stdout.write(self.style.SUCCESS(
+            f"Scanned {scanned} rows in {elapsed:.2f}s ({rate:,.0f} rows/s); "
+            f"{verb} {changed}, {without_history} without history."
+        ))
+
+    def recompute_chunk(self, chunk):
+        """Returns ([(perf, {field: (old, new)})] for changed rows, rows without history)."""
+        histories = defaultdict(list)
+        attempts = QuizSessionFlashcard.objects.filter(
+            Q(session__adaptive_mode=True) | Q(session__srs_enabled=True),
+            answered=True,
+            answered_at__isnull=False,
+            session__user_id__in={perf.user_id for perf in chunk},
+            flashcard_id__in={perf.flashcard_id for perf in chunk},
+        ).exclude(
+            answer_given="", correct=False
+        ).order_by("answered_at", "id").values_list(
+            "session__user_id", "flashcard_id", "correct", "answered_at"
+        )
+        for user_id, flashcard_id, correct, answered_at in attempts.iterator():
+            histories[(user_id, flashcard_id)].append((correct, answered_at))
+
+        rows = [perf for perf in chunk if histories.get((perf.user_id, perf.flashcard_id))]
+        if not rows:
+            return [], len(chunk)
+
+        steps = max(len(histories[(perf.user_id, perf.flashcard_id)]) for perf in rows)
+        grades = np.zeros((len(rows), steps), dtype=np.int64)
+        mask = np.zeros((len(rows), steps), dtype=bool)
+        for i, perf in enumerate(rows):
+            history = histories[(perf.user_id, perf.flashcard_id)]
+            grades[i, :len(history)] = [SM2_GRADE_CORRECT if c else SM2_GRADE_INCORRECT for c, _ in history]
+            mask[i, :len(history)] = True
+
+        easiness, interval, repetitions = sm2_replay(grades, mask)
+
+        updates = []
+        for i, perf in enumerate(rows):
+            last_reviewed = histories[(perf.user_id, perf.flashcard_id)][-1][1]
+            new = {
+                "easiness": float(easiness[i]),
+                "interval": int(interval[i]),
+                "repetitions": int(repetitions[i]),
+                "last_reviewed": last_reviewed,
+                "next_review_due": last_reviewed + timedelta(days=int(interval[i])),
+            }
+            diff = {}
+            for field, value in new.items():
+                old = getattr(perf, field)
+                same = math.isclose(old, value) if field == "easiness" else old == value
+                if not same:
+                    diff[field] = (old, value)
+                    setattr(perf, field, value)
+            if diff:
+                updates.append((perf, diff))
+
+        return updates, len(chunk) - len(rows)
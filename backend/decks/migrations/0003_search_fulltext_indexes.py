@@ -0,0 +1,30 @@
+from django.db import migrations
+
+DECK_INDEX = "decks_deck_search_ft"
+FLASHCARD_INDEX = "decks_flashcard_search_ft"
+
+
+def add_fulltext_indexes(apps, schema_editor):
+    # FULLTEXT is MySQL-only; other backends use the icontains search fallback
+    if schema_editor.connection.vendor != "mysql":
+        return
+    schema_editor.execute(f"CREATE FULLTEXT INDEX {DECK_INDEX} ON decks_deck (title, description, tags)")
+    schema_editor.execute(f"CREATE FULLTEXT INDEX {FLASHCARD_INDEX} ON decks_flashcard (question, answer)")
+
+
+def drop_fulltext_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "mysql":
+        return
+    schema_editor.execute(f"DROP INDEX {DECK_INDEX} ON decks_deck")
+    schema_editor.execute(f"DROP INDEX {FLASHCARD_INDEX} ON decks_flashcard")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('decks', '0002_flashcard'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_fulltext_indexes, drop_fulltext_indexes),
+    ]
@@ -0,0 +1,76 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+TAG_MAX_LENGTH = 50
+
+
+def parse_tags(value):
+    names = []
+    for part in (value or "").split(","):
+        name = part.strip().lower()[:TAG_MAX_LENGTH]
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def backfill_deck_tags(apps, schema_editor):
+    Tag = apps.get_model("decks", "Tag")
+    DeckTag = apps.get_model("decks", "DeckTag")
+
+    # Deck.tags predates these migrations, so read it with plain SQL, and only
+    # where it exists: on a fresh database the column is added by 0006
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        columns = {column.name for column in connection.introspection.get_table_description(cursor, "decks_deck")}
+        if "tags" not in columns:
+            return
+        cursor.execute("SELECT id, tags FROM decks_deck WHERE tags IS NOT NULL AND tags <> ''")
+        rows = [(deck_id, parse_tags(tags)) for deck_id, tags in cursor.fetchall()]
+
+    names = {name for _, deck_names in rows for name in deck_names}
+    Tag.objects.bulk_create([Tag(name=name) for name in names], ignore_conflicts=True, batch_size=1000)
+    tag_ids = dict(Tag.objects.values_list("name", "id"))
+
+    DeckTag.objects.bulk_create(
+        [DeckTag(deck_id=deck_id, tag_id=tag_ids[name]) for deck_id, deck_names in rows for name in deck_names],
+        ignore_conflicts=True,
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('decks', '0003_search_fulltext_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='DeckTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('deck', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deck_tags', to='decks.deck')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deck_tags', to='decks.tag')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['tag', 'deck'], name='decks_deckt_tag_id_734fc8_idx')],
+                'unique_together': {('deck', 'tag')},
+            },
+        ),
+        migrations.AddField(
+            model_name='deck',
+            name='tag_set',
+            field=models.ManyToManyField(blank=True, related_name='decks', through='decks.DeckTag', to='decks.tag'),
+        ),
+        migrations.RunPython(backfill_deck_tags, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('decks', '0004_tags'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeckTransferJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('anki_import', 'Anki Import'), ('anki_export', 'Anki Export')], max_length=20)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('success', 'Success'), ('error', 'Error')], default='pending', max_length=20)),
+                ('source_file', models.FileField(blank=True, null=True, upload_to='deck_transfers/imports/')),
+                ('result_file', models.FileField(blank=True, null=True, upload_to='deck_transfers/exports/')),
+                ('title', models.CharField(blank=True, max_length=120)),
+                ('result_data', models.JSONField(blank=True, null=True)),
+                ('error_message', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('deck', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='transfer_jobs', to='decks.deck')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deck_transfer_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
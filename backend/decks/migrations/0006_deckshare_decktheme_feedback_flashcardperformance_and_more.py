@@ -0,0 +1,336 @@
+# Generated by Django 5.2.7 on 2026-10-17 02:40
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_share_links(apps, schema_editor):
+    # A callable default is evaluated once for AddField; existing decks each need their own link
+    Deck = apps.get_model("decks", "Deck")
+    for deck in Deck.objects.filter(share_link__isnull=True).only("id").iterator():
+        Deck.objects.filter(pk=deck.pk).update(share_link=uuid.uuid4())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('decks', '0005_decktransferjob'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeckShare',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('permission', models.CharField(choices=[('view', 'View Only'), ('edit', 'Can Edit')], default='view', max_length=10)),
+                ('shared_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DeckTheme',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=120)),
+                ('description', models.TextField(blank=True)),
+                ('background_color', models.CharField(default='#ffffff', max_length=7)),
+                ('text_color', models.CharField(default='#000000', max_length=7)),
+                ('accent_color', models.CharField(default='#4f46e5', max_length=7)),
+                ('font_family', models.CharField(choices=[('system', 'System Default'), ('serif', 'Serif'), ('sans', 'Sans-serif'), ('mono', 'Monospace'), ('dyslexic', 'Dyslexic-friendly')], default='system', max_length=20)),
+                ('font_size', models.PositiveIntegerField(default=14)),
+                ('layout_style', models.CharField(choices=[('classic', 'Classic'), ('modern', 'Modern'), ('minimal', 'Minimal')], default='classic', max_length=20)),
+                ('border_radius', models.PositiveIntegerField(default=8)),
+                ('card_spacing', models.PositiveIntegerField(default=12)),
+                ('is_default', models.BooleanField(default=False)),
+                ('is_system_theme', models.BooleanField(default=False)),
+                ('preview_image', models.ImageField(blank=True, null=True, upload_to='theme_previews/')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Feedback',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rating', models.IntegerField()),
+                ('comment', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='FlashcardPerformance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('correct_count', models.PositiveIntegerField(default=0)),
+                ('incorrect_count', models.PositiveIntegerField(default=0)),
+                ('avg_response_time', models.FloatField(default=0.0)),
+                ('user_difficulty', models.CharField(choices=[('easy', 'Easy'), ('medium', 'Medium'), ('hard', 'Hard')], default='medium', max_length=10)),
+                ('easiness', models.FloatField(default=2.5)),
+                ('interval', models.IntegerField(default=0)),
+                ('repetitions', models.IntegerField(default=0)),
+                ('last_reviewed', models.DateTimeField(blank=True, null=True)),
+                ('next_review_due', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='QuizSession',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mode', models.CharField(choices=[('random', 'Random'), ('sequential', 'Sequential'), ('timed', 'Timed')], max_length=20)),
+                ('adaptive_mode', models.BooleanField(default=True)),
+                ('srs_enabled', models.BooleanField(default=True)),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('is_paused', models.BooleanField(default=False)),
+                ('correct_count', models.PositiveIntegerField(default=0)),
+                ('total_answered', models.PositiveIntegerField(default=0)),
+                ('current_index', models.PositiveIntegerField(default=0)),
+                ('order', models.JSONField(default=list)),
+                ('time_per_card', models.PositiveIntegerField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='QuizSessionFlashcard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('answered', models.BooleanField(default=False)),
+                ('correct', models.BooleanField(default=False)),
+                ('answer_given', models.TextField(blank=True)),
+                ('answered_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='deck',
+            name='admin_hidden',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='deck',
+            name='admin_note',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='deck',
+            name='card_order',
+            field=models.CharField(choices=[('asc', 'Ascending'), ('desc', 'Descending')], default='asc', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='deck',
+            name='cover_image',
+            field=models.ImageField(blank=True, null=True, upload_to='deck_covers/'),
+        ),
+        migrations.AddField(
+            model_name='deck',
+            name='flag_reason',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='deck',
+            name='is_archived',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='deck',
+            name='is_flagged',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='deck',
+            name='is_link_shared',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='deck',
+            name='share_link',
+            field=models.UUIDField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(fill_share_links, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='deck',
+            name='share_link',
+            field=models.UUIDField(blank=True, db_index=True, default=uuid.uuid4, editable=False, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='deck',
+            name='tags',
+            field=models.CharField(blank=True, default='', max_length=200),
+        ),
+        migrations.AddField(
+            model_name='deck',
+            name='was_public',
+            field=models.BooleanField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='flashcard',
+            name='difficulty',
+            field=models.CharField(choices=[('easy', 'Easy'), ('medium', 'Medium'), ('hard', 'Hard')], default='medium', max_length=10),
+        ),
+        migrations.AddIndex(
+            model_name='flashcard',
+            index=models.Index(fields=['deck', 'created_at'], name='decks_flash_deck_id_bdf7ca_idx'),
+        ),
+        migrations.AddField(
+            model_name='deckshare',
+            name='deck',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shared_with', to='decks.deck'),
+        ),
+        migrations.AddField(
+            model_name='deckshare',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shared_decks', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='decktheme',
+            name='owner',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='deck_themes', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='deck',
+            name='theme',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='decks', to='decks.decktheme'),
+        ),
+        migrations.AddIndex(
+            model_name='deck',
+            index=models.Index(fields=['owner'], name='decks_deck_owner_i_99ea38_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deck',
+            index=models.Index(fields=['is_public'], name='decks_deck_is_publ_71586c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deck',
+            index=models.Index(fields=['is_archived'], name='decks_deck_is_arch_2567a9_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deck',
+            index=models.Index(fields=['is_flagged'], name='decks_deck_is_flag_c77493_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deck',
+            index=models.Index(fields=['admin_hidden'], name='decks_deck_admin_h_5dc86a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deck',
+            index=models.Index(fields=['share_link'], name='decks_deck_share_l_0a0b50_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deck',
+            index=models.Index(fields=['created_at'], name='decks_deck_created_8b804d_idx'),
+        ),
+        migrations.AddField(
+            model_name='feedback',
+            name='deck',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feedbacks', to='decks.deck'),
+        ),
+        migrations.AddField(
+            model_name='feedback',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feedbacks', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='flashcardperformance',
+            name='flashcard',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='user_performance', to='decks.flashcard'),
+        ),
+        migrations.AddField(
+            model_name='flashcardperformance',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='flashcard_performance', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='quizsession',
+            name='deck',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='decks.deck'),
+        ),
+        migrations.AddField(
+            model_name='quizsession',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='quizsessionflashcard',
+            name='flashcard',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='decks.flashcard'),
+        ),
+        migrations.AddField(
+            model_name='quizsessionflashcard',
+            name='session',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='flashcard_attempts', to='decks.quizsession'),
+        ),
+        migrations.AddIndex(
+            model_name='deckshare',
+            index=models.Index(fields=['deck', 'user'], name='decks_decks_deck_id_74a5ca_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='deckshare',
+            unique_together={('deck', 'user')},
+        ),
+        migrations.AddIndex(
+            model_name='decktheme',
+            index=models.Index(fields=['owner'], name='decks_deckt_owner_i_b531d1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='decktheme',
+            index=models.Index(fields=['is_default'], name='decks_deckt_is_defa_bbb1b3_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='decktheme',
+            index=models.Index(fields=['is_system_theme'], name='decks_deckt_is_syst_3c8a8d_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='decktheme',
+            unique_together={('owner', 'name')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='feedback',
+            unique_together={('deck', 'user')},
+        ),
+        migrations.AddIndex(
+            model_name='flashcardperformance',
+            index=models.Index(fields=['user'], name='decks_flash_user_id_753028_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='flashcardperformance',
+            index=models.Index(fields=['flashcard'], name='decks_flash_flashca_2bdcea_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='flashcardperformance',
+            index=models.Index(fields=['user_difficulty'], name='decks_flash_user_di_d6a7b7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='flashcardperformance',
+            index=models.Index(fields=['next_review_due'], name='decks_flash_next_re_de8b04_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='flashcardperformance',
+            index=models.Index(fields=['user', 'next_review_due'], name='decks_flash_user_id_d8858c_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='flashcardperformance',
+            unique_together={('user', 'flashcard')},
+        ),
+        migrations.AddIndex(
+            model_name='quizsession',
+            index=models.Index(fields=['user', 'started_at'], name='decks_quizs_user_id_365ca2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quizsession',
+            index=models.Index(fields=['deck', 'started_at'], name='decks_quizs_deck_id_e4f959_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quizsession',
+            index=models.Index(fields=['total_answered'], name='decks_quizs_total_a_2ee154_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quizsessionflashcard',
+            index=models.Index(fields=['session', 'flashcard'], name='decks_quizs_session_3d066d_idx'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('decks', '0006_deckshare_decktheme_feedback_flashcardperformance_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quizsessionflashcard',
+            name='idempotency_key',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='quizsessionflashcard',
+            constraint=models.UniqueConstraint(fields=('session', 'idempotency_key'), name='unique_session_idempotency_key'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F
+
+
+def copy_updated_at(apps, schema_editor):
+    # Start existing decks from their last edit rather than the migration time
+    Deck = apps.get_model("decks", "Deck")
+    Deck.objects.update(content_updated_at=F("updated_at"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('decks', '0007_quizsessionflashcard_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deck',
+            name='content_updated_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(copy_updated_at, migrations.RunPython.noop),
+    ]
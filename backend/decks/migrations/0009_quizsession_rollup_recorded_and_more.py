@@ -0,0 +1,24 @@
+# Generated by Django 5.2.7 on 2026-10-17 02:54
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('decks', '0008_deck_content_updated_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quizsession',
+            name='rollup_recorded',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name='quizsession',
+            index=models.Index(fields=['finished_at', 'started_at'], name='decks_quizs_finishe_f8dba7_idx'),
+        ),
+    ]
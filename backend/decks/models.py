@@ -1,11 +1,154 @@
 
 import uuid
-from django.db import models
+from collections import namedtuple
+from django.db import connection, models, transaction
 from django.conf import settings
+from django.core.cache import cache
 from django.utils import timezone
 import random
 
 
+# Per-session snapshot of a user's FlashcardPerformance rows, used for card selection
+PerformanceSnapshot = namedtuple(
+    "PerformanceSnapshot",
+    ["correct_count", "incorrect_count", "user_difficulty", "next_review_due"]
+)
+PERFORMANCE_INDEX_TTL = getattr(settings, "PERFORMANCE_INDEX_TTL", 60 * 60)
+
+# SM-2 parameters (shared with the recompute_srs command)
+SM2_GRADE_CORRECT = 5
+SM2_GRADE_INCORRECT = 2
+SM2_PASSING_GRADE = 3
+SM2_INITIAL_EASINESS = 2.5
+SM2_MIN_EASINESS = 1.3
+
+FLASHCARD_BULK_BATCH_SIZE = getattr(settings, "FLASHCARD_BULK_BATCH_SIZE", 1000)
+
+
+# -----------------------------
+# WEIGHTED SAMPLER (adaptive selection)
+# -----------------------------
+class WeightedSampler:
+    """
+    Fenwick (binary indexed) tree over float weights keyed by flashcard id.
+    sample / update / remove run in O(log n); building from a dict is O(n).
+    """
+
+    def __init__(self, weights=None):
+        items = [(key, max(float(w), 0.0)) for key, w in (weights or {}).items()]
+        self._keys = [None] + [key for key, _ in items]
+        self._slots = {key: slot for slot, (key, _) in enumerate(items, start=1)}
+        self._weights = [0.0] + [w for _, w in items]
+        self._build()
+
+    def _build(self):
+        tree = list(self._weights)
+        size = len(tree) - 1
+        for slot in range(1, size + 1):
+            parent = slot + (slot & -slot)
+            if parent <= size:
+                tree[parent] += tree[slot]
+        self._tree = tree
+
+    def _add(self, slot, delta):
+        size = len(self._tree) - 1
+        while slot <= size:
+            self._tree[slot] += delta
+            slot += slot & -slot
+
+    def _prefix(self, slot):
+        total = 0.0
+        while slot > 0:
+            total += self._tree[slot]
+            slot -= slot & -slot
+        return total
+
+    def __len__(self):
+        return len(self._slots)
+
+    def __contains__(self, key):
+        return key in self._slots
+
+    @property
+    def total(self):
+        return self._prefix(len(self._tree) - 1)
+
+    def update(self, key, weight):
+        """Insert or re-weight a key."""
+        weight = max(float(weight), 0.0)
+        slot = self._slots.get(key)
+        if slot is None:
+            # Append a new slot; its node covers (slot - lowbit, slot]
+            self._keys.append(key)
+            self._weights.append(0.0)
+            self._tree.append(0.0)
+            slot = len(self._tree) - 1
+            self._tree[slot] = self._prefix(slot - 1) - self._prefix(slot - (slot & -slot))
+            self._slots[key] = slot
+        self._add(slot, weight - self._weights[slot])
+        self._weights[slot] = weight
+
+    def remove(self, key):
+        slot = self._slots.pop(key, None)
+        if slot is None:
+            return
+        self._add(slot, -self._weights[slot])
+        self._weights[slot] = 0.0
+
+    def sample(self, rng=random):
+        """Pick a key with probability proportional to its weight (None if empty)."""
+        if not self._slots:
+            return None
+        for _ in range(2):
+            total = self.total
+            if total > 0:
+                slot = self._find(rng.random() * total)
+                if slot < len(self._weights) and self._weights[slot] > 0:
+                    return self._keys[slot]
+            # Float drift after many updates; rebuild once and retry
+            self._build()
+        return rng.choice(list(self._slots))
+
+    def _find(self, target):
+        """Smallest slot whose prefix sum exceeds target."""
+        size = len(self._tree) - 1
+        pos = 0
+        step = 1 << size.bit_length()
+        while step:
+            nxt = pos + step
+            if nxt <= size and self._tree[nxt] <= target:
+                target -= self._tree[nxt]
+                pos = nxt
+            step >>= 1
+        return pos + 1
+
+
+def due_card_weight(perf):
+    """Selection weight for a due card: weaker accuracy and harder cards come up more often."""
+    weight = 1.0
+    total = perf.correct_count + perf.incorrect_count
+    if total > 0:
+        accuracy = perf.correct_count / total
+        if accuracy < 0.6: weight *= 3
+        elif accuracy < 0.85: weight *= 2
+    if perf.user_difficulty == 'hard': weight *= 2
+    elif perf.user_difficulty == 'easy': weight *= 0.5
+    return weight
+
+
+
+
+TAG_MAX_LENGTH = 50
+
+
+def parse_tags(value):
+    """Normalized, de-duplicated tag names from a comma-separated string."""
+    names = []
+    for part in (value or "").split(","):
+        name = part.strip().lower()[:TAG_MAX_LENGTH]
+        if name and name not in names:
+            names.append(name)
+    return names
 
 
 # -----------------------------
@@ -21,6 +164,8 @@ class Deck(models.Model):
     title = models.CharField(max_length=120)
     description = models.TextField(blank=True)
     tags = models.CharField(max_length=200, blank=True, default='')
+    # Normalized copy of `tags`, kept in sync on save (used for filtering/facets)
+    tag_set = models.ManyToManyField("Tag", through="DeckTag", related_name="decks", blank=True)
 
     is_public = models.BooleanField(default=False)
     is_archived = models.BooleanField(default=False)
@@ -67,6 +212,8 @@ class Deck(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Last change to the deck's flashcards, shares or feedback (see signals)
+    content_updated_at = models.DateTimeField(default=timezone.now)
 
     class Meta:
         unique_together = ("owner", "title")
@@ -78,11 +225,47 @@ class Deck(models.Model):
             models.Index(fields=["is_flagged"]),
             models.Index(fields=["admin_hidden"]),
             models.Index(fields=["share_link"]),
+            models.Index(fields=["created_at"]),
         ]
 
     def __str__(self):
         return f"{self.title} (Owner: {self.owner.username})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._synced_tags = instance.__dict__.get("tags")
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        update_fields = kwargs.get("update_fields")
+        if (update_fields is None or "tags" in update_fields) and self.tags != getattr(self, "_synced_tags", ""):
+            self.sync_tags()
+
+    def sync_tags(self):
+        """Mirror the comma-separated `tags` string into DeckTag rows."""
+        names = set(parse_tags(self.tags))
+        current = dict(self.deck_tags.values_list("tag__name", "id"))
+
+        removed = [link_id for name, link_id in current.items() if name not in names]
+        if removed:
+            DeckTag.objects.filter(id__in=removed).delete()
+
+        added = names - current.keys()
+        if added:
+            Tag.objects.bulk_create([Tag(name=name) for name in added], ignore_conflicts=True)
+            DeckTag.objects.bulk_create(
+                [DeckTag(deck=self, tag=tag) for tag in Tag.objects.filter(name__in=added)],
+                ignore_conflicts=True,
+            )
+        self._synced_tags = self.tags
+
+    @classmethod
+    def touch_content(cls, deck_id):
+        """Bump content_updated_at without touching updated_at or running save()."""
+        cls.objects.filter(pk=deck_id).update(content_updated_at=timezone.now())
+
     def enable_link_sharing(self):
         """Safely enable link sharing"""
         if not self.share_link:
@@ -93,6 +276,8 @@ class Deck(models.Model):
 
     def disable_link_sharing(self):
         """Disable access via link AND invalidate old link"""
+        from .caching import purge_share_page
+        purge_share_page(self.share_link)
         self.is_link_shared = False
         self.share_link = uuid.uuid4()
         self.save(update_fields=["is_link_shared", "share_link"])
@@ -214,10 +399,78 @@ class Flashcard(models.Model):
 
     class Meta:
         ordering = ["-updated_at"]
+        indexes = [
+            models.Index(fields=["deck", "created_at"]),
+        ]
 
     def __str__(self):
         return f"Flashcard for {self.deck.title}: {self.question[:50]}"
 
+    def save(self, *args, **kwargs):
+        if self._state.adding and not connection.features.can_return_rows_from_bulk_insert:
+            # Serialize with bulk_add, which reads its ids back as the deck's newest cards
+            with transaction.atomic():
+                Deck.objects.select_for_update().filter(pk=self.deck_id).exists()
+                return super().save(*args, **kwargs)
+        return super().save(*args, **kwargs)
+
+    @classmethod
+    def bulk_add(cls, deck, flashcards, batch_size=FLASHCARD_BULK_BATCH_SIZE):
+        """
+        Insert unsaved flashcards into deck with bulk_create and return them
+        with primary keys set. bulk_create sends no signals, so the deck's
+        caches and validators are invalidated here instead.
+        """
+        flashcards = list(flashcards)
+        if not flashcards:
+            return flashcards
+        for flashcard in flashcards:
+            flashcard.deck = deck
+
+        with transaction.atomic():
+            if connection.features.can_return_rows_from_bulk_insert:
+                cls.objects.bulk_create(flashcards, batch_size=batch_size)
+            else:
+                # MySQL returns no ids from a multi-row INSERT. Every card insert
+                # (here and in save()) holds the deck row, so the newest
+                # len(flashcards) cards of the deck are exactly these
+                Deck.objects.select_for_update().filter(pk=deck.pk).exists()
+                cls.objects.bulk_create(flashcards, batch_size=batch_size)
+                newest = cls.objects.filter(deck=deck).order_by("-pk").values_list("pk", flat=True)
+                for flashcard, pk in zip(flashcards, list(newest[:len(flashcards)])[::-1]):
+                    flashcard.pk = pk
+
+        from .caching import invalidate_deck_content
+        invalidate_deck_content(deck.pk)
+        return flashcards
+
+
+# -----------------------------
+# TAGS
+# -----------------------------
+class Tag(models.Model):
+    name = models.CharField(max_length=TAG_MAX_LENGTH, unique=True)
+
+    class Meta:
+        ordering = ["name"]
+
+    def __str__(self):
+        return self.name
+
+
+class DeckTag(models.Model):
+    deck = models.ForeignKey(Deck, on_delete=models.CASCADE, related_name="deck_tags")
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name="deck_tags")
+
+    class Meta:
+        unique_together = ("deck", "tag")
+        indexes = [
+            models.Index(fields=["tag", "deck"]),
+        ]
+
+    def __str__(self):
+        return f"{self.deck_id} -> {self.tag_id}"
+
 
 # -----------------------------
 # USER SHARE PERMISSIONS
@@ -312,87 +565,144 @@ class QuizSession(models.Model):
     current_index = models.PositiveIntegerField(default=0)
     order = models.JSONField(default=list)  
     time_per_card = models.PositiveIntegerField(null=True, blank=True)
+    # Set once the finished session is counted in analytics.UserDailyStudy
+    rollup_recorded = models.BooleanField(default=False)
 
     class Meta:
         indexes = [
             models.Index(fields=["user", "started_at"]),
             models.Index(fields=["deck", "started_at"]),
             models.Index(fields=["total_answered"]),
+            models.Index(fields=["finished_at", "started_at"]),
         ]
 
+    # ------------------------
+    # Live State (cache-backed while the quiz runs, see session_state.py)
+    # ------------------------
+    def load_live_state(self):
+        from .session_state import load_state
+        return load_state(self)
+
+    def save_live_state(self, flush=False):
+        from .session_state import save_state
+        save_state(self, flush=flush)
+
     # ------------------------
     # Session Initialization
     # ------------------------
     def initialize_order(self):
         """Prepare flashcards order based on mode."""
-        flashcards_qs = self.deck.flashcards.all()
-        if not flashcards_qs.exists():
+        from .caching import get_quiz_pack
+        pack = get_quiz_pack(self.deck_id)
+        if not pack.ids:
             raise ValueError("Deck is empty") 
 
         if self.adaptive_mode or self.srs_enabled:
             self.order = [] 
         else:
-            # Non-adaptive mode: prepare order immediately
+            # Non-adaptive mode: prepare order immediately (pack ids are in creation order)
+            self.order = list(pack.ids)
             if self.mode in ['random', 'timed']:
-                self.order = list(flashcards_qs.values_list('id', flat=True))
                 random.shuffle(self.order)
-            else:  # sequential
-                self.order = list(flashcards_qs.order_by('created_at').values_list('id', flat=True))
 
         self.current_index = 0
         self.finished_at = None
-        self.save()
+        self.save_live_state()
+        self.clear_selection_cache()
+
+    # ------------------------
+    # Performance Index (one query per session, then cached)
+    # ------------------------
+    def _performance_index_key(self):
+        return f"quiz:session:{self.id}:perf_index"
+
+    def load_performance_index(self):
+        """Map flashcard id -> PerformanceSnapshot for this user's cards in the deck."""
+        key = self._performance_index_key()
+        index = cache.get(key)
+        if index is not None:
+            return index
+
+        rows = FlashcardPerformance.objects.filter(
+            user_id=self.user_id,
+            flashcard__deck_id=self.deck_id
+        ).values_list(
+            'flashcard_id', 'correct_count', 'incorrect_count', 'user_difficulty', 'next_review_due'
+        )
+        index = {fid: PerformanceSnapshot(*rest) for fid, *rest in rows}
+        cache.set(key, index, PERFORMANCE_INDEX_TTL)
+        return index
+
+    def _due_sampler_key(self):
+        return f"quiz:session:{self.id}:due_sampler"
+
+    def load_due_sampler(self, remaining_ids, index, now):
+        """WeightedSampler over the remaining due cards, kept for the life of the session."""
+        key = self._due_sampler_key()
+        sampler = cache.get(key)
+        if sampler is None:
+            sampler = WeightedSampler({
+                fid: due_card_weight(index[fid])
+                for fid in remaining_ids
+                if fid in index and (index[fid].next_review_due is None or index[fid].next_review_due <= now)
+            })
+        return sampler
+
+    def clear_selection_cache(self):
+        cache.delete_many([self._performance_index_key(), self._due_sampler_key()])
 
     # ------------------------
     # Dynamic Flashcard Selection (only used if adaptive/SRS is on)
     # ------------------------
-    def select_next_flashcard(self):
+    def select_next_flashcard(self, commit=True):
         if not (self.adaptive_mode or self.srs_enabled):
             return None  
 
-        from django.utils import timezone
+        from .caching import get_quiz_pack
         now = timezone.now()
-        attempted_ids = self.order
-        remaining = self.deck.flashcards.exclude(id__in=attempted_ids)
-        if not remaining.exists():
+        attempted = set(self.order)
+        remaining_ids = [fid for fid in get_quiz_pack(self.deck_id).ids if fid not in attempted]
+        if not remaining_ids:
             return None
 
-        due_cards = []
-        new_cards = []
-
-        for fc in remaining:
-            perf = fc.user_performance.filter(user=self.user).first()
-            if not perf or not self.srs_enabled:
-                new_cards.append(fc)
-            elif perf.next_review_due is None or perf.next_review_due <= now:
-                due_cards.append((fc, perf))
-
-        # Due cards
-        if due_cards:
-            weighted_pool = []
-            for fc, perf in due_cards:
-                weight = 1
-                total = perf.correct_count + perf.incorrect_count
-                if total > 0:
-                    accuracy = perf.correct_count / total
-                    if accuracy < 0.6: weight *= 3
-                    elif accuracy < 0.85: weight *= 2
-                if perf.user_difficulty == 'hard': weight *= 2
-                elif perf.user_difficulty == 'easy': weight *= 0.5
-                weighted_pool.extend([fc] * max(1, int(weight)))
-            next_fc = random.choice(weighted_pool)
+        next_id = None
+        index = self.load_performance_index()
+
+        # Due cards (weighted by accuracy / difficulty)
+        if self.srs_enabled:
+            remaining = set(remaining_ids)
+            sampler = self.load_due_sampler(remaining_ids, index, now)
+            while next_id is None and len(sampler):
+                fid = sampler.sample()
+                sampler.remove(fid)
+                # Skip ids deleted from the deck or already placed in order
+                if fid in remaining:
+                    next_id = fid
+            cache.set(self._due_sampler_key(), sampler, PERFORMANCE_INDEX_TTL)
 
         # New cards
-        elif new_cards:
-            next_fc = random.choice(new_cards)
-
-        # Fallback
-        else:
-            next_fc = random.choice(list(remaining))
-
-        self.order.append(next_fc.id)
-        self.save()
-        return next_fc.id
+        if next_id is None:
+            new_cards = [fid for fid in remaining_ids if fid not in index or not self.srs_enabled]
+            next_id = random.choice(new_cards or remaining_ids)
+
+        self.order.append(next_id)
+        if commit:
+            self.save_live_state()
+        return next_id
+
+    def reserve_upcoming(self, count):
+        """
+        Ids of the next `count` cards after the current one. Adaptive picks are
+        made now and placed in order, so they are served exactly as prefetched.
+        """
+        start = self.current_index + 1
+        if (self.adaptive_mode or self.srs_enabled) and self.current_index < len(self.order):
+            placed = False
+            while len(self.order) < start + count and self.select_next_flashcard(commit=False) is not None:
+                placed = True
+            if placed:
+                self.save_live_state()
+        return self.order[start:start + count]
 
     # ------------------------
     # Get Current Flashcard
@@ -424,7 +734,7 @@ class QuizSession(models.Model):
             if self.get_current_flashcard_id() is None:
                 self.finished_at = timezone.now()
 
-        self.save()
+        self.save_live_state()
 
     # ------------------------
     # Accuracy Computation
@@ -449,11 +759,16 @@ class QuizSessionFlashcard(models.Model):
     correct = models.BooleanField(default=False)
     answer_given = models.TextField(blank=True)
     answered_at = models.DateTimeField(null=True, blank=True)
+    # Client-supplied key for answers synced from offline devices
+    idempotency_key = models.CharField(max_length=64, null=True, blank=True)
 
     class Meta:
         indexes = [
             models.Index(fields=["session", "flashcard"]),
         ]
+        constraints = [
+            models.UniqueConstraint(fields=["session", "idempotency_key"], name="unique_session_idempotency_key"),
+        ]
 
     # -----------------------------
     # Record attempt with optional SRS/Adaptive update
@@ -468,8 +783,8 @@ class QuizSessionFlashcard(models.Model):
 
         # Only update FlashcardPerformance (adaptive/SRS)
         if self.session.adaptive_mode or self.session.srs_enabled:
-            perf, _ = FlashcardPerformance.objects.get_or_create(user=self.session.user, flashcard=self.flashcard)
-            perf.record_answer(correct=correct, response_time=response_time)
+            perf, _ = FlashcardPerformance.objects.get_or_create(user_id=self.session.user_id, flashcard_id=self.flashcard_id)
+            perf.record_answer(correct=correct, response_time=response_time, reviewed_at=self.answered_at)
 
 
 
@@ -488,7 +803,7 @@ class FlashcardPerformance(models.Model):
     user_difficulty = models.CharField(max_length=10, choices=DIFFICULTY_CHOICES, default='medium')
 
     # Spaced repetition
-    easiness = models.FloatField(default=2.5)
+    easiness = models.FloatField(default=SM2_INITIAL_EASINESS)
     interval = models.IntegerField(default=0)
     repetitions = models.IntegerField(default=0)
     last_reviewed = models.DateTimeField(null=True, blank=True)
@@ -501,6 +816,7 @@ class FlashcardPerformance(models.Model):
             models.Index(fields=["flashcard"]),
             models.Index(fields=["user_difficulty"]),
             models.Index(fields=["next_review_due"]),
+            models.Index(fields=["user", "next_review_due"]),
         ]
 
     # Adaptive difficulty
@@ -516,11 +832,11 @@ class FlashcardPerformance(models.Model):
             self.user_difficulty = "medium"
 
     # Spaced repetition logic
-    def update_spaced_repetition(self, correct: bool):
-        grade = 5 if correct else 2
+    def update_spaced_repetition(self, correct: bool, reviewed_at=None):
+        grade = SM2_GRADE_CORRECT if correct else SM2_GRADE_INCORRECT
         new_e = self.easiness + (0.1 - (5 - grade) * (0.08 + (5 - grade) * 0.02))
-        self.easiness = max(1.3, new_e)
-        if grade < 3:
+        self.easiness = max(SM2_MIN_EASINESS, new_e)
+        if grade < SM2_PASSING_GRADE:
             self.repetitions = 0
             self.interval = 1
         else:
@@ -532,10 +848,11 @@ class FlashcardPerformance(models.Model):
             else:
                 self.interval = int(self.interval * self.easiness)
         from django.utils import timezone
-        self.last_reviewed = timezone.now()
-        self.next_review_due = timezone.now() + timezone.timedelta(days=self.interval)
+        reviewed_at = reviewed_at or timezone.now()
+        self.last_reviewed = reviewed_at
+        self.next_review_due = reviewed_at + timezone.timedelta(days=self.interval)
 
-    def record_answer(self, correct: bool, response_time: float = None):
+    def record_answer(self, correct: bool, response_time: float = None, reviewed_at=None, commit: bool = True):
         if correct: self.correct_count += 1
         else: self.incorrect_count += 1
 
@@ -547,8 +864,66 @@ class FlashcardPerformance(models.Model):
                 self.avg_response_time = ((self.avg_response_time * prev) + response_time) / (prev + 1)
 
         self.update_difficulty()
-        self.update_spaced_repetition(correct)
-        self.save()
+        self.update_spaced_repetition(correct, reviewed_at=reviewed_at)
+        if commit:
+            self.save()
+            from .review_queue import invalidate_review_queue
+            invalidate_review_queue(self.user_id)
 
     def __str__(self):
         return f"{self.user.username} - {self.flashcard.id} performance"
+
+
+# -----------------------------
+# DECK IMPORT / EXPORT JOBS
+# -----------------------------
+class DeckTransferJob(models.Model):
+    """A background Anki (.apkg) import or export, polled by the client."""
+    KIND_CHOICES = [
+        ("anki_import", "Anki Import"),
+        ("anki_export", "Anki Export"),
+    ]
+
+    STATUS_CHOICES = [
+        ("pending", "Pending"),
+        ("processing", "Processing"),
+        ("success", "Success"),
+        ("error", "Error"),
+    ]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="deck_transfer_jobs")
+    deck = models.ForeignKey(Deck, on_delete=models.SET_NULL, null=True, blank=True, related_name="transfer_jobs")
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending")
+
+    source_file = models.FileField(upload_to="deck_transfers/imports/", null=True, blank=True)
+    result_file = models.FileField(upload_to="deck_transfers/exports/", null=True, blank=True)
+    # Requested title for imports; counts (notes, flashcards, reviews, skipped) once done
+    title = models.CharField(max_length=120, blank=True)
+    result_data = models.JSONField(blank=True, null=True)
+    error_message = models.TextField(blank=True, null=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    def mark_processing(self):
+        self.status = "processing"
+        self.save(update_fields=["status"])
+
+    def mark_success(self, result_data):
+        self.status = "success"
+        self.result_data = result_data
+        self.finished_at = timezone.now()
+        self.save()
+
+    def mark_error(self, message):
+        self.status = "error"
+        self.error_message = message
+        self.finished_at = timezone.now()
+        self.save()
+
+    def __str__(self):
+        return f"DeckTransferJob({self.id}) - {self.kind} - {self.status}"
@@ -0,0 +1,112 @@
+"""
+Keyset (cursor) pagination.
+
+Listings are ordered on an immutable (timestamp, id) pair and each page
+starts strictly after the last row of the previous one, so edits made while
+a client is paging never shift rows between pages, and a deep page costs
+the same index range scan as the first. Pagination is opt-in: responses
+stay plain lists unless the client sends ?limit or a cursor.
+"""
+import base64
+import binascii
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+
+
+def _pack_cursor(key, pk):
+    return base64.urlsafe_b64encode(f"{key}|{pk}".encode()).decode()
+
+
+def _unpack_cursor(cursor):
+    try:
+        key, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return key, int(pk)
+    except (TypeError, UnicodeDecodeError, binascii.Error) as exc:
+        raise ValueError("Invalid cursor.") from exc
+
+
+def encode_cursor(timestamp, pk):
+    return _pack_cursor(timestamp.isoformat(), pk)
+
+
+def decode_cursor(cursor):
+    """(timestamp, pk) from an opaque cursor; ValueError if malformed."""
+    timestamp, pk = _unpack_cursor(cursor)
+    return datetime.fromisoformat(timestamp), pk
+
+
+class KeysetPagination(BasePagination):
+    """Newest-first pagination on (created_at, id)."""
+    key_field = "created_at"
+    page_size = 50
+    max_page_size = 200
+    limit_query_param = "limit"
+    cursor_query_param = "cursor"
+
+    def __init__(self, cursor_query_param=None):
+        if cursor_query_param:
+            self.cursor_query_param = cursor_query_param
+        self.next_cursor = None
+
+    def encode_key(self, value):
+        return value.isoformat()
+
+    def decode_key(self, raw):
+        return datetime.fromisoformat(raw)
+
+    def is_requested(self, request):
+        params = request.query_params
+        return self.limit_query_param in params or self.cursor_query_param in params
+
+    def get_limit(self, request):
+        raw = request.query_params.get(self.limit_query_param)
+        if raw is None:
+            return self.page_size
+        try:
+            return max(1, min(int(raw), self.max_page_size))
+        except ValueError:
+            raise ValidationError({self.limit_query_param: "Must be an integer."})
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """One page as a list, or None when the client did not ask for pagination."""
+        if not self.is_requested(request):
+            return None
+
+        field = self.key_field
+        queryset = queryset.order_by(f"-{field}", "-id")
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            try:
+                raw, pk = _unpack_cursor(cursor)
+                key = self.decode_key(raw)
+            except ValueError:
+                raise ValidationError({self.cursor_query_param: "Invalid cursor."})
+            queryset = queryset.filter(Q(**{f"{field}__lt": key}) | Q(**{field: key, "id__lt": pk}))
+
+        limit = self.get_limit(request)
+        page = list(queryset[:limit + 1])
+        self.next_cursor = None
+        if len(page) > limit:
+            page = page[:limit]
+            last = page[-1]
+            self.next_cursor = _pack_cursor(self.encode_key(getattr(last, field)), last.pk)
+        return page
+
+    def get_paginated_response(self, data):
+        return Response({"results": data, "next_cursor": self.next_cursor})
+
+
+class RankedPagination(KeysetPagination):
+    """Best-first pagination on a search queryset's (relevance, id) annotation."""
+    key_field = "relevance"
+
+    def encode_key(self, value):
+        # repr() round-trips floats exactly, so ties compare equal in SQL
+        return repr(value)
+
+    def decode_key(self, raw):
+        return float(raw)
@@ -0,0 +1,147 @@
+"""
+Cross-deck "due today" review queue.
+
+A user's queue is every FlashcardPerformance row due before the end of the
+day, in (next_review_due, id) order, restricted to decks the user can still
+access. It is materialised into the cache (nightly by a Celery task, or on
+first request) together with per-deck counts, and invalidated whenever one
+of the user's cards is reviewed.
+"""
+from bisect import bisect_right
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Exists, OuterRef, Q
+from django.utils import timezone
+
+from utils.caching import bump_version, get_version
+
+from .models import DeckShare, Flashcard, FlashcardPerformance
+from .pagination import decode_cursor, encode_cursor
+
+REVIEW_QUEUE_MAX_ENTRIES = getattr(settings, "REVIEW_QUEUE_MAX_ENTRIES", 5000)
+REVIEW_QUEUE_PAGE_SIZE = 50
+REVIEW_QUEUE_MAX_PAGE_SIZE = 200
+
+
+def end_of_day(now=None):
+    """Start of the next local day; cards due before it are due today."""
+    today = timezone.localdate(now or timezone.now())
+    return timezone.make_aware(datetime.combine(today + timedelta(days=1), time.min))
+
+
+def accessible_deck_q(user, prefix=""):
+    """Q for decks the user owns, or can see as public/shared and not hidden; never archived."""
+    shared = DeckShare.objects.filter(deck=OuterRef(f"{prefix}pk"), user=user)
+    return Q(**{f"{prefix}is_archived": False}) & (
+        Q(**{f"{prefix}owner": user})
+        | ((Q(**{f"{prefix}is_public": True}) | Q(Exists(shared))) & Q(**{f"{prefix}admin_hidden": False}))
+    )
+
+
+# ---------- Materialised queue ----------
+
+def _queue_key(user_id):
+    return f"review:user:{user_id}:queue:{get_version('review_queue', user_id, scope='user')}"
+
+
+def invalidate_review_queue(user_id):
+    bump_version("review_queue", user_id, scope="user")
+
+
+def _due_queryset(user, horizon):
+    return FlashcardPerformance.objects.filter(
+        accessible_deck_q(user, prefix="flashcard__deck__"),
+        user=user,
+        next_review_due__lt=horizon,
+    )
+
+
+def build_review_queue(user, now=None):
+    """Materialise and cache the user's due-today queue (two queries)."""
+    horizon = end_of_day(now)
+    due = _due_queryset(user, horizon)
+    entries = list(
+        due.order_by("next_review_due", "id").values_list("next_review_due", "id")[:REVIEW_QUEUE_MAX_ENTRIES + 1]
+    )
+    deck_counts = list(
+        due.order_by().values("flashcard__deck_id", "flashcard__deck__title").annotate(due=Count("id"))
+    )
+    queue = {
+        "horizon": horizon,
+        "entries": entries[:REVIEW_QUEUE_MAX_ENTRIES],
+        "truncated": len(entries) > REVIEW_QUEUE_MAX_ENTRIES,
+        "decks": sorted(
+            (
+                {"deck_id": row["flashcard__deck_id"], "title": row["flashcard__deck__title"], "due": row["due"]}
+                for row in deck_counts
+            ),
+            key=lambda d: (-d["due"], d["deck_id"]),
+        ),
+    }
+    cache.set(_queue_key(user.id), queue, int((horizon - timezone.now()).total_seconds()) or 1)
+    return queue
+
+
+def get_review_queue(user):
+    queue = cache.get(_queue_key(user.id))
+    if queue is None or queue["horizon"] <= timezone.now():
+        queue = build_review_queue(user)
+    return queue
+
+
+def get_review_page(user, cursor=None, limit=REVIEW_QUEUE_PAGE_SIZE):
+    """
+    One page of the user's due-today queue:
+    {"results": [...], "next_cursor": str|None, "total_due": int, "decks": [...]}.
+    """
+    queue = get_review_queue(user)
+    entries = queue["entries"]
+    start = bisect_right(entries, decode_cursor(cursor)) if cursor else 0
+    page = entries[start:start + limit + 1]
+
+    if len(page) <= limit and queue["truncated"]:
+        # Past the materialised window: continue from the database
+        after = page[-1] if page else decode_cursor(cursor)
+        page += list(
+            _due_queryset(user, queue["horizon"]).filter(
+                Q(next_review_due__gt=after[0]) | Q(next_review_due=after[0], id__gt=after[1])
+            ).order_by("next_review_due", "id").values_list("next_review_due", "id")[:limit + 1 - len(page)]
+        )
+
+    has_more = len(page) > limit
+    page = page[:limit]
+
+    perf_ids = [perf_id for _, perf_id in page]
+    cards = {
+        row["user_performance__id"]: row
+        for row in Flashcard.objects.filter(
+            accessible_deck_q(user, prefix="deck__"),
+            user_performance__id__in=perf_ids,
+        ).values(
+            "user_performance__id", "id", "question", "difficulty", "deck_id", "deck__title"
+        )
+    } if perf_ids else {}
+
+    results = [
+        {
+            "performance_id": perf_id,
+            "flashcard_id": cards[perf_id]["id"],
+            "question": cards[perf_id]["question"],
+            "difficulty": cards[perf_id]["difficulty"],
+            "deck_id": cards[perf_id]["deck_id"],
+            "deck_title": cards[perf_id]["deck__title"],
+            "next_review_due": due,
+        }
+        for due, perf_id in page
+        # Cards removed, or decks no longer accessible, since the queue was built
+        if perf_id in cards
+    ]
+
+    return {
+        "results": results,
+        "next_cursor": encode_cursor(*page[-1]) if has_more else None,
+        "total_due": sum(d["due"] for d in queue["decks"]),
+        "decks": queue["decks"],
+    }
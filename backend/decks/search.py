@@ -0,0 +1,79 @@
+"""
+Ranked deck/flashcard search behind a small backend abstraction.
+
+Backends take querysets that already carry the caller's visibility rules and
+return them filtered to matches, annotated with a `relevance` score. MySQL
+uses the FULLTEXT indexes from migration 0003; other databases (SQLite in
+development) fall back to weighted icontains matching.
+"""
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, Exists, FloatField, OuterRef, Q, Value, When
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+from .models import Deck, DeckTag, Flashcard
+
+# InnoDB skips words shorter than innodb_ft_min_token_size (default 3)
+FULLTEXT_MIN_TOKEN = getattr(settings, "SEARCH_FULLTEXT_MIN_TOKEN", 3)
+
+
+class LikeSearchBackend:
+    """Substring matching (exact for tags), ranked by which fields matched."""
+
+    def deck_conditions(self, query):
+        tagged = DeckTag.objects.filter(deck=OuterRef("pk"), tag__name=query.lower())
+        return ((Q(title__icontains=query), 3), (Exists(tagged), 2), (Q(description__icontains=query), 1))
+
+    def flashcard_conditions(self, query):
+        return ((Q(question__icontains=query), 2), (Q(answer__icontains=query), 1))
+
+    def _rank(self, queryset, conditions):
+        relevance = sum(
+            (Case(When(condition, then=Value(weight)), default=Value(0)) for condition, weight in conditions),
+            Value(0),
+        )
+        return queryset.annotate(relevance=relevance).filter(
+            relevance__gt=0
+        ).order_by("-relevance", "-id")
+
+    def search_decks(self, queryset, query):
+        return self._rank(queryset, self.deck_conditions(query))
+
+    def search_flashcards(self, queryset, query):
+        return self._rank(queryset, self.flashcard_conditions(query))
+
+
+class MySQLFullTextBackend(LikeSearchBackend):
+    """MATCH ... AGAINST over the FULLTEXT indexes, natural-language relevance."""
+
+    def _match(self, queryset, query, model, columns):
+        table = connection.ops.quote_name(model._meta.db_table)
+        cols = ", ".join(f"{table}.{connection.ops.quote_name(c)}" for c in columns)
+        relevance = RawSQL(
+            f"MATCH ({cols}) AGAINST (%s IN NATURAL LANGUAGE MODE)", (query,), output_field=FloatField()
+        )
+        return queryset.annotate(relevance=relevance).filter(relevance__gt=0).order_by("-relevance", "-id")
+
+    def _indexable(self, query):
+        return any(len(word) >= FULLTEXT_MIN_TOKEN for word in query.split())
+
+    def search_decks(self, queryset, query):
+        if not self._indexable(query):
+            return super().search_decks(queryset, query)
+        return self._match(queryset, query, Deck, ("title", "description", "tags"))
+
+    def search_flashcards(self, queryset, query):
+        if not self._indexable(query):
+            return super().search_flashcards(queryset, query)
+        return self._match(queryset, query, Flashcard, ("question", "answer"))
+
+
+def get_search_backend():
+    """SEARCH_BACKEND (dotted path) if set, else FULLTEXT on MySQL and LIKE elsewhere."""
+    path = getattr(settings, "SEARCH_BACKEND", None)
+    if path:
+        return import_string(path)()
+    if connection.vendor == "mysql":
+        return MySQLFullTextBackend()
+    return LikeSearchBackend()
@@ -1,3 +1,6 @@
+from django.db import transaction
+from django.db.models import Avg, OuterRef, Subquery
+from django.utils import timezone
 from rest_framework import serializers
 from .models import *
 
@@ -88,7 +91,7 @@ class DeckThemeNestedSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'is_system_default']
 
     def get_is_system_default(self, obj):
-        return obj.owner is None and getattr(obj, 'is_system_theme', False)
+        return obj.owner_id is None and getattr(obj, 'is_system_theme', False)
 
     def update(self, instance, validated_data):
 
@@ -126,6 +129,8 @@ class DeckSerializer(serializers.ModelSerializer):
     can_edit = serializers.SerializerMethodField()
     access_level = serializers.SerializerMethodField()
     average_rating = serializers.SerializerMethodField()
+    # On update: also delete the deck's cards missing from `flashcards`
+    delete_missing = serializers.BooleanField(write_only=True, required=False)
 
     class Meta:
         model = Deck
@@ -137,7 +142,7 @@ class DeckSerializer(serializers.ModelSerializer):
             'admin_hidden', 'admin_note', 'is_flagged', 'flag_reason',
             'average_rating',
             'created_at', 'updated_at',
-            'flashcards'
+            'flashcards', 'delete_missing'
         ]
         read_only_fields = [
             'id', 'owner', 'owner_id',
@@ -148,6 +153,39 @@ class DeckSerializer(serializers.ModelSerializer):
             'theme'
         ]
 
+    # ------------------------
+    # Eager loading (list endpoints)
+    # ------------------------
+    @classmethod
+    def annotate_access(cls, queryset, user=None):
+        """Deck row plus owner/theme and the user's share permission, in one query."""
+        queryset = queryset.select_related('owner', 'theme')
+        if user:
+            permission = DeckShare.objects.filter(deck=OuterRef('pk'), user=user).values('permission')[:1]
+            queryset = queryset.annotate(share_permission=Subquery(permission))
+        return queryset
+
+    @classmethod
+    def setup_eager_loading(cls, queryset, user=None):
+        """
+        Annotate the average rating and the user's share permission, and
+        prefetch nested relations, so serializing a list of decks takes a
+        fixed number of queries.
+        """
+        ratings = Feedback.objects.filter(deck=OuterRef('pk')).order_by().values('deck').annotate(
+            avg=Avg('rating')
+        ).values('avg')
+        return cls.annotate_access(queryset, user).prefetch_related(
+            'flashcards', 'shared_with__user'
+        ).annotate(avg_rating=Subquery(ratings))
+
+    def _share_permission(self, obj, user):
+        """The user's DeckShare permission for obj, or None if not shared."""
+        if hasattr(obj, 'share_permission'):
+            return obj.share_permission
+        share_entry = obj.shared_with.filter(user=user).first()
+        return share_entry.permission if share_entry else None
+
     # ------------------------
     # Access logic
     # ------------------------
@@ -155,13 +193,13 @@ class DeckSerializer(serializers.ModelSerializer):
         request = self.context.get('request')
         user = request.user if request and request.user.is_authenticated else None
 
-        if user and obj.owner == user:
+        if user and obj.owner_id == user.id:
             return 'owner'
 
         if user:
-            share_entry = obj.shared_with.filter(user=user).first()
-            if share_entry:
-                return 'edit' if share_entry.permission == 'edit' else 'view'
+            permission = self._share_permission(obj, user)
+            if permission:
+                return 'edit' if permission == 'edit' else 'view'
 
         share_link = request.query_params.get("share_link") if request else None
         if share_link and obj.is_link_shared and str(obj.share_link) == share_link:
@@ -177,14 +215,16 @@ class DeckSerializer(serializers.ModelSerializer):
         user = request.user if request and request.user.is_authenticated else None
         if not user:
             return False
-        if obj.owner == user:
+        if obj.owner_id == user.id:
             return True
-        return DeckShare.objects.filter(deck=obj, user=user, permission='edit').exists()
+        return self._share_permission(obj, user) == 'edit'
 
     # ------------------------
     # Computed fields
     # ------------------------
     def get_average_rating(self, obj):
+        if hasattr(obj, 'avg_rating'):
+            return obj.avg_rating
         ratings = obj.feedbacks.all().values_list('rating', flat=True)
         if not ratings:
             return None
@@ -212,6 +252,8 @@ class DeckSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         flashcards_data = validated_data.pop('flashcards', [])
         theme = validated_data.pop('theme', None) 
+        # A new deck has no cards to delete
+        validated_data.pop('delete_missing', None)
 
 
         # Create the deck first
@@ -233,17 +275,19 @@ class DeckSerializer(serializers.ModelSerializer):
         # -----------------------------
         # Create flashcards
         # -----------------------------
-        for fc_data in flashcards_data:
-            Flashcard.objects.create(
-                deck=deck,
+        Flashcard.bulk_add(deck, [
+            Flashcard(
                 question=fc_data['question'],
                 answer=fc_data['answer'],
                 difficulty=fc_data.get('difficulty', 'medium')
             )
+            for fc_data in flashcards_data
+        ])
 
         return deck
     def update(self, instance, validated_data):
-        flashcards_data = validated_data.pop('flashcards', [])
+        flashcards_data = validated_data.pop('flashcards', None)
+        delete_missing = validated_data.pop('delete_missing', False)
         theme = validated_data.pop('theme', None)
         if 'tags' in validated_data:
             instance.tags = validated_data['tags']
@@ -262,33 +306,65 @@ class DeckSerializer(serializers.ModelSerializer):
         # Update other fields
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
-        instance.save()
 
-        # -----------------------------
-        # Update flashcards
-        # -----------------------------
-        for fc_data in flashcards_data:
-            fc_id = fc_data.get('id')
-            if fc_id:
-                try:
-                    fc = Flashcard.objects.get(id=fc_id, deck=instance)
-                    fc.question = fc_data.get('question', fc.question)
-                    fc.answer = fc_data.get('answer', fc.answer)
-                    if 'difficulty' in fc_data:
-                        fc.difficulty = fc_data['difficulty']
-                    fc.save()
-                except Flashcard.DoesNotExist:
-                    continue
-            else:
-                Flashcard.objects.create(deck=instance, **fc_data)
+        with transaction.atomic():
+            instance.save()
+            if flashcards_data is not None:
+                self.apply_flashcards(instance, flashcards_data, delete_missing=delete_missing)
 
         return instance
 
-
-
-
-
-
+    @staticmethod
+    def apply_flashcards(deck, flashcards_data, delete_missing=False):
+        """
+        Diff-apply validated flashcard rows in one pass: rows whose id is one of
+        the deck's cards update it (partially), rows without an id create new
+        cards, and with delete_missing the deck's remaining cards are deleted.
+        An id that is not one of the deck's cards is rejected. One query loads
+        the affected rows; writes are bulk_update/bulk_create.
+        """
+        submitted_ids = {fc_data['id'] for fc_data in flashcards_data if fc_data.get('id')}
+        existing = {fc.id: fc for fc in deck.flashcards.filter(id__in=submitted_ids)}
+
+        now = timezone.now()
+        changed, new_flashcards, errors = {}, [], []
+        for fc_data in flashcards_data:
+            fc = existing.get(fc_data.get('id'))
+            if fc is None and fc_data.get('id'):
+                errors.append({'id': [f"Flashcard {fc_data['id']} is not in this deck."]})
+                continue
+            if fc is None:
+                missing = [field for field in ('question', 'answer') if field not in fc_data]
+                errors.append({field: ["This field is required."] for field in missing})
+                new_flashcards.append(Flashcard(
+                    question=fc_data.get('question'),
+                    answer=fc_data.get('answer'),
+                    difficulty=fc_data.get('difficulty', 'medium')
+                ))
+                continue
+            errors.append({})
+            for field in ('question', 'answer', 'difficulty'):
+                if field in fc_data and getattr(fc, field) != fc_data[field]:
+                    setattr(fc, field, fc_data[field])
+                    fc.updated_at = now
+                    changed[fc.id] = fc
+        if any(errors):
+            raise serializers.ValidationError({'flashcards': errors})
+
+        with transaction.atomic():
+            deleted = 0
+            if delete_missing:
+                deleted, _ = deck.flashcards.exclude(id__in=existing).delete()
+            if changed:
+                Flashcard.objects.bulk_update(
+                    changed.values(), ['question', 'answer', 'difficulty', 'updated_at'],
+                    batch_size=FLASHCARD_BULK_BATCH_SIZE
+                )
+            if deleted or changed:
+                # bulk_update sends no post_save, and the receivers skip queryset deletes
+                from .caching import invalidate_deck_content
+                invalidate_deck_content(deck.pk)
+            Flashcard.bulk_add(deck, new_flashcards)
 
 
 class QuizSessionFlashcardSerializer(serializers.ModelSerializer):
@@ -318,6 +394,25 @@ class QuizSessionFlashcardSerializer(serializers.ModelSerializer):
         return updated
 
 
+class OfflineAnswerSerializer(serializers.Serializer):
+    session = serializers.IntegerField()
+    flashcard = serializers.IntegerField()
+    idempotency_key = serializers.CharField(max_length=64)
+    answer = serializers.CharField(allow_blank=True, trim_whitespace=False)
+    answered_at = serializers.DateTimeField()
+    response_time = serializers.FloatField(required=False, allow_null=True)
+
+
+class QuizSyncSerializer(serializers.Serializer):
+    answers = OfflineAnswerSerializer(many=True, allow_empty=False)
+
+    def validate_answers(self, value):
+        from .sync import MAX_SYNC_ANSWERS
+        if len(value) > MAX_SYNC_ANSWERS:
+            raise serializers.ValidationError(f"At most {MAX_SYNC_ANSWERS} answers per request.")
+        return value
+
+
 class QuizSessionSerializer(serializers.ModelSerializer):
     flashcard_attempts = QuizSessionFlashcardSerializer(many=True, read_only=True)
     accuracy = serializers.SerializerMethodField()
@@ -400,3 +495,21 @@ class FeedbackSerializer(serializers.ModelSerializer):
         if not (1 <= value <= 5):
             raise serializers.ValidationError("Rating must be between 1 and 5.")
         return value
+
+
+class DeckTransferJobSerializer(serializers.ModelSerializer):
+    result_file_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = DeckTransferJob
+        fields = [
+            'id', 'kind', 'status', 'deck', 'title', 'result_data', 'error_message',
+            'result_file_url', 'created_at', 'finished_at',
+        ]
+        read_only_fields = fields
+
+    def get_result_file_url(self, obj):
+        request = self.context.get('request')
+        if obj.result_file:
+            return request.build_absolute_uri(obj.result_file.url) if request else obj.result_file.url
+        return None
@@ -0,0 +1,126 @@
+"""
+Live quiz session state kept in the cache (write-behind).
+
+While a quiz is running, the hot QuizSession fields are written to the cache
+on every change and flushed to the database every QUIZ_SESSION_FLUSH_EVERY
+writes, on pause/finish, and by the periodic flush task. Disabled unless
+QUIZ_SESSION_STATE_CACHE is set (the cache must be shared, e.g. Redis).
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .signals import quiz_session_finished
+
+logger = logging.getLogger(__name__)
+
+HOT_FIELDS = ["order", "current_index", "correct_count", "total_answered", "is_paused", "finished_at"]
+
+
+def is_enabled():
+    return getattr(settings, "QUIZ_SESSION_STATE_CACHE", False)
+
+
+def _ttl():
+    return getattr(settings, "QUIZ_SESSION_STATE_TTL", 60 * 60 * 6)
+
+
+def _flush_every():
+    return getattr(settings, "QUIZ_SESSION_FLUSH_EVERY", 10)
+
+
+def live_window():
+    """How far back the flush task looks for unfinished sessions."""
+    return timedelta(seconds=getattr(settings, "QUIZ_SESSION_LIVE_WINDOW", 60 * 60 * 48))
+
+
+def _state_key(session_id):
+    return f"quiz:session:{session_id}:state"
+
+
+def _flushed_key(session_id):
+    return f"quiz:session:{session_id}:flushed_seq"
+
+
+def load_state(session):
+    """Overlay the cached live state (if any) onto a session loaded from the DB."""
+    if not is_enabled():
+        return session
+    state = cache.get(_state_key(session.id))
+    if state:
+        for field in HOT_FIELDS:
+            setattr(session, field, state[field])
+        session._state_seq = state["seq"]
+        session._flushed_seq = state["flushed_seq"]
+    return session
+
+
+def _write(session):
+    if not session.finished_at:
+        session.save(update_fields=HOT_FIELDS)
+        return
+    # A finish is announced in the same transaction that persists it
+    with transaction.atomic():
+        session.save(update_fields=HOT_FIELDS)
+        quiz_session_finished.send(sender=type(session), session=session)
+
+
+def save_state(session, flush=False):
+    """Persist hot fields: to the cache, and to the DB when a flush is due."""
+    if not is_enabled():
+        _write(session)
+        return
+
+    seq = getattr(session, "_state_seq", 0) + 1
+    flushed_seq = getattr(session, "_flushed_seq", 0)
+    if flush or session.finished_at or session.is_paused or seq - flushed_seq >= _flush_every():
+        _write(session)
+        flushed_seq = seq
+        cache.set(_flushed_key(session.id), seq, _ttl())
+
+    if session.finished_at:
+        # Finished sessions are no longer live
+        discard_state(session.id)
+    else:
+        state = {field: getattr(session, field) for field in HOT_FIELDS}
+        state.update(seq=seq, flushed_seq=flushed_seq)
+        cache.set(_state_key(session.id), state, _ttl())
+    session._state_seq = seq
+    session._flushed_seq = flushed_seq
+
+
+def discard_state(session_id):
+    cache.delete_many([_state_key(session_id), _flushed_key(session_id)])
+
+
+def flush_states(session_ids):
+    """Write unflushed cached state for a batch of sessions; returns how many were written."""
+    from .models import QuizSession
+
+    if not is_enabled() or not session_ids:
+        return 0
+
+    keys = [_state_key(sid) for sid in session_ids] + [_flushed_key(sid) for sid in session_ids]
+    cached = cache.get_many(keys)
+    flushed = {}
+    for sid in session_ids:
+        state = cached.get(_state_key(sid))
+        if not state:
+            continue
+        if state["seq"] <= max(state["flushed_seq"], cached.get(_flushed_key(sid), 0)):
+            continue
+        # Never resurrect a finished session or roll counters back over a newer write
+        QuizSession.objects.filter(
+            pk=sid,
+            finished_at__isnull=True,
+            total_answered__lte=state["total_answered"],
+        ).update(**{field: state[field] for field in HOT_FIELDS})
+        flushed[_flushed_key(sid)] = state["seq"]
+
+    if flushed:
+        cache.set_many(flushed, _ttl())
+        logger.info("Flushed live state for %d quiz sessions", len(flushed))
+    return len(flushed)
@@ -0,0 +1,66 @@
+from django.db.models import QuerySet
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import Signal, receiver
+
+from .models import Deck, DeckShare, DeckTheme, Feedback, Flashcard
+from .caching import invalidate_deck_payload, invalidate_quiz_pack, invalidate_theme_payloads
+
+# Sent with session= inside the transaction that writes a finished session.
+# May be sent more than once for the same session; receivers must be idempotent.
+quiz_session_finished = Signal()
+
+
+@receiver(pre_delete, sender=Deck)
+def note_deleted_deck(sender, instance, origin=None, **kwargs):
+    # Every pre_delete of a cascade runs before its first post_delete
+    if origin is not None:
+        if not hasattr(origin, "_deleted_deck_ids"):
+            origin._deleted_deck_ids = set()
+        origin._deleted_deck_ids.add(instance.pk)
+
+
+def skip_deck_refresh(instance, origin=None):
+    """
+    Deletes the per-row receivers below leave alone: rows removed together
+    with their deck, and queryset deletes, whose callers refresh each deck
+    once (invalidate_deck_content) instead of once per row.
+    """
+    if origin is None or origin is instance:
+        return False
+    if isinstance(origin, QuerySet) and origin.model is type(instance):
+        return True
+    return instance.deck_id in getattr(origin, "_deleted_deck_ids", ())
+
+
+@receiver([post_save, post_delete], sender=Flashcard)
+def invalidate_deck_quiz_pack(sender, instance, origin=None, **kwargs):
+    """Any flashcard change makes the deck's cached quiz pack stale."""
+    if not skip_deck_refresh(instance, origin):
+        invalidate_quiz_pack(instance.deck_id)
+
+
+@receiver([post_save, post_delete], sender=Flashcard)
+@receiver([post_save, post_delete], sender=DeckShare)
+@receiver([post_save, post_delete], sender=Feedback)
+def touch_deck_content(sender, instance, origin=None, **kwargs):
+    """Cards, shares and ratings are part of the deck payload; move its validators on."""
+    if not skip_deck_refresh(instance, origin):
+        Deck.touch_content(instance.deck_id)
+
+
+@receiver([post_save, post_delete], sender=Deck)
+def invalidate_own_payload(sender, instance, **kwargs):
+    invalidate_deck_payload(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Flashcard)
+@receiver([post_save, post_delete], sender=DeckShare)
+@receiver([post_save, post_delete], sender=Feedback)
+def invalidate_parent_payload(sender, instance, origin=None, **kwargs):
+    if not skip_deck_refresh(instance, origin):
+        invalidate_deck_payload(instance.deck_id)
+
+
+@receiver([post_save, post_delete], sender=DeckTheme)
+def invalidate_themed_payloads(sender, instance, **kwargs):
+    invalidate_theme_payloads(instance.pk)
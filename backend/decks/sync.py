@@ -0,0 +1,188 @@
+"""
+Bulk ingest of quiz answers recorded offline by the mobile app.
+
+Answers are applied in answered_at order inside one transaction, with the
+same per-answer effects as QuizSessionAnswerView, and written back with
+bulk updates. Each answer carries an idempotency key so a retried upload
+is a no-op.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .caching import get_quiz_pack
+from .models import FlashcardPerformance, QuizSession, QuizSessionFlashcard
+from .review_queue import invalidate_review_queue
+from .session_state import HOT_FIELDS, discard_state
+from .signals import quiz_session_finished
+
+MAX_SYNC_ANSWERS = getattr(settings, "QUIZ_SYNC_MAX_ANSWERS", 500)
+
+ATTEMPT_FIELDS = ["answered", "correct", "answer_given", "answered_at", "idempotency_key"]
+PERFORMANCE_FIELDS = [
+    "correct_count", "incorrect_count", "avg_response_time", "user_difficulty",
+    "easiness", "interval", "repetitions", "last_reviewed", "next_review_due",
+]
+
+# Per-answer statuses
+APPLIED = "applied"
+DUPLICATE = "duplicate"
+SESSION_NOT_FOUND = "session_not_found"
+SESSION_FINISHED = "session_finished"
+FLASHCARD_NOT_FOUND = "flashcard_not_found"
+ALREADY_ANSWERED = "already_answered"
+
+
+def _place_current(session, flashcard_id):
+    """
+    Make flashcard_id the session's current card, moving it forward in the
+    order if the device reached it differently. Returns False if the card was
+    already passed (answered or skipped).
+    """
+    order = session.order
+    if flashcard_id in order:
+        pos = order.index(flashcard_id)
+        if pos < session.current_index:
+            return False
+        if pos != session.current_index:
+            order.insert(session.current_index, order.pop(pos))
+    else:
+        # Adaptive sessions only place cards in the order as they are served
+        order.insert(session.current_index, flashcard_id)
+    return True
+
+
+def _is_exhausted(session, pack):
+    if session.current_index < len(session.order):
+        return False
+    if session.adaptive_mode or session.srs_enabled:
+        return set(pack.ids) <= set(session.order)
+    return True
+
+
+def apply_offline_answers(user, answers):
+    """
+    Apply validated answer dicts (session, flashcard, idempotency_key, answer,
+    answered_at, response_time) for the user's sessions.
+
+    Returns (results, sessions): one {idempotency_key, status[, correct]} per
+    answer in input order, and the touched sessions.
+    """
+    session_ids = {a["session"] for a in answers}
+    flashcard_ids = {a["flashcard"] for a in answers}
+    results = [{"idempotency_key": a["idempotency_key"]} for a in answers]
+
+    with transaction.atomic():
+        sessions = {
+            s.id: s.load_live_state()
+            for s in QuizSession.objects.select_for_update().filter(pk__in=session_ids, user=user)
+        }
+        seen_keys = set(
+            QuizSessionFlashcard.objects.filter(
+                session_id__in=sessions,
+                idempotency_key__in={a["idempotency_key"] for a in answers},
+            ).values_list("session_id", "idempotency_key")
+        )
+        attempts = {}
+        for attempt in QuizSessionFlashcard.objects.filter(
+            session_id__in=sessions, flashcard_id__in=flashcard_ids
+        ).order_by("answered", "id"):
+            # Prefer the unanswered row if a card was provisioned twice
+            attempts.setdefault((attempt.session_id, attempt.flashcard_id), attempt)
+
+        packs = {s.deck_id: get_quiz_pack(s.deck_id) for s in sessions.values()}
+        tracked_ids = set()
+        for a in answers:
+            session = sessions.get(a["session"])
+            if session and (session.adaptive_mode or session.srs_enabled) and a["flashcard"] in packs[session.deck_id]:
+                tracked_ids.add(a["flashcard"])
+        FlashcardPerformance.objects.bulk_create(
+            [FlashcardPerformance(user=user, flashcard_id=fid) for fid in tracked_ids],
+            ignore_conflicts=True,
+        )
+        performances = {
+            p.flashcard_id: p
+            for p in FlashcardPerformance.objects.filter(user=user, flashcard_id__in=tracked_ids)
+        }
+
+        updated_attempts, new_attempts, updated_perfs = {}, [], {}
+        ordered = sorted(range(len(answers)), key=lambda i: answers[i]["answered_at"])
+        for i in ordered:
+            entry = answers[i]
+            session = sessions.get(entry["session"])
+            flashcard_id = entry["flashcard"]
+            key = (entry["session"], entry["idempotency_key"])
+
+            if session is None:
+                results[i]["status"] = SESSION_NOT_FOUND
+                continue
+            if key in seen_keys:
+                results[i]["status"] = DUPLICATE
+                continue
+            if session.finished_at:
+                results[i]["status"] = SESSION_FINISHED
+                continue
+            pack = packs[session.deck_id]
+            if flashcard_id not in pack:
+                results[i]["status"] = FLASHCARD_NOT_FOUND
+                continue
+            attempt = attempts.get((session.id, flashcard_id))
+            if (attempt and attempt.answered) or not _place_current(session, flashcard_id):
+                results[i]["status"] = ALREADY_ANSWERED
+                continue
+
+            selected_answer = entry["answer"].strip()
+            correct = selected_answer == str(pack.answer(flashcard_id))
+
+            if attempt is None:
+                attempt = QuizSessionFlashcard(session=session, flashcard_id=flashcard_id)
+                attempts[(session.id, flashcard_id)] = attempt
+                new_attempts.append(attempt)
+            else:
+                updated_attempts[attempt.pk] = attempt
+            attempt.answered = True
+            attempt.correct = correct
+            attempt.answer_given = selected_answer
+            attempt.answered_at = entry["answered_at"]
+            attempt.idempotency_key = entry["idempotency_key"]
+            seen_keys.add(key)
+
+            if session.adaptive_mode or session.srs_enabled:
+                perf = performances[flashcard_id]
+                perf.record_answer(
+                    correct=correct,
+                    response_time=entry.get("response_time"),
+                    reviewed_at=entry["answered_at"],
+                    commit=False,
+                )
+                updated_perfs[perf.pk] = perf
+
+            session.total_answered += 1
+            if correct:
+                session.correct_count += 1
+            session.current_index += 1
+            results[i].update(status=APPLIED, correct=correct)
+
+        finished = []
+        for session in sessions.values():
+            if not session.finished_at and _is_exhausted(session, packs[session.deck_id]):
+                session.finished_at = timezone.now()
+                finished.append(session)
+
+        QuizSessionFlashcard.objects.bulk_update(updated_attempts.values(), ATTEMPT_FIELDS)
+        QuizSessionFlashcard.objects.bulk_create(new_attempts)
+        FlashcardPerformance.objects.bulk_update(updated_perfs.values(), PERFORMANCE_FIELDS)
+        QuizSession.objects.bulk_update(sessions.values(), HOT_FIELDS)
+        for session in finished:
+            quiz_session_finished.send(sender=QuizSession, session=session)
+
+        def clear_cached_state():
+            for session in sessions.values():
+                discard_state(session.id)
+                session.clear_selection_cache()
+            if updated_perfs:
+                invalidate_review_queue(user.id)
+
+        transaction.on_commit(clear_cached_state)
+
+    return results, list(sessions.values())
@@ -0,0 +1,110 @@
+from celery import shared_task
+from django.core.files import File
+from django.utils import timezone
+import logging
+import tempfile
+
+from users.models import CustomUser
+from .models import DeckTransferJob, FlashcardPerformance, QuizSession
+from . import anki, session_state
+from .review_queue import build_review_queue, end_of_day
+
+logger = logging.getLogger(__name__)
+
+FLUSH_BATCH_SIZE = 500
+
+
+@shared_task
+def flush_quiz_session_state():
+    """
+    Write-behind flush for live quiz sessions: persists cached state that has
+    not reached the DB yet, so idle or abandoned sessions are not lost when
+    their cache entry expires.
+    """
+    if not session_state.is_enabled():
+        return {"flushed": 0}
+
+    since = timezone.now() - session_state.live_window()
+    session_ids = QuizSession.objects.filter(
+        finished_at__isnull=True,
+        started_at__gte=since
+    ).values_list("id", flat=True)
+
+    flushed = 0
+    batch = []
+    for session_id in session_ids.iterator(chunk_size=FLUSH_BATCH_SIZE):
+        batch.append(session_id)
+        if len(batch) >= FLUSH_BATCH_SIZE:
+            flushed += session_state.flush_states(batch)
+            batch = []
+    flushed += session_state.flush_states(batch)
+
+    logger.info("Quiz session state flush complete: %d sessions written", flushed)
+    return {"flushed": flushed}
+
+
+@shared_task
+def materialize_review_queues():
+    """
+    Nightly: build the due-today review queue for every user with cards due
+    before the end of the day, so the first request of the day is a cache hit.
+    """
+    now = timezone.now()
+    user_ids = FlashcardPerformance.objects.filter(
+        next_review_due__lt=end_of_day(now)
+    ).values_list("user_id", flat=True).distinct().order_by("user_id")
+
+    built = 0
+    for user in CustomUser.objects.filter(pk__in=user_ids).iterator(chunk_size=FLUSH_BATCH_SIZE):
+        build_review_queue(user, now=now)
+        built += 1
+
+    logger.info("Review queues materialised for %d users", built)
+    return {"users": built}
+
+
+@shared_task
+def import_anki_deck(job_id):
+    """Build a deck (and review history) from the job's uploaded .apkg."""
+    job = DeckTransferJob.objects.select_related("user").get(pk=job_id)
+    job.mark_processing()
+    try:
+        with job.source_file.open("rb") as source:
+            deck, counts = anki.import_apkg(job.user, source, title=job.title)
+    except anki.AnkiError as exc:
+        job.mark_error(str(exc))
+        return {"status": "error"}
+    except Exception:
+        logger.exception("Anki import failed for job %s", job_id)
+        job.mark_error("Import failed.")
+        return {"status": "error"}
+
+    job.source_file.delete(save=False)
+    job.deck = deck
+    job.mark_success(counts)
+    logger.info("Anki import %s: %s", job_id, counts)
+    return counts
+
+
+@shared_task
+def export_anki_deck(job_id):
+    """Write the job's deck to an .apkg stored on result_file."""
+    job = DeckTransferJob.objects.select_related("user", "deck").get(pk=job_id)
+    if job.deck is None:
+        job.mark_error("The deck no longer exists.")
+        return {"status": "error"}
+
+    job.mark_processing()
+    try:
+        with tempfile.TemporaryFile() as out:
+            counts = anki.export_apkg(job.deck, job.user, out)
+            out.seek(0)
+            job.result_file.save(f"deck-{job.deck_id}.apkg", File(out), save=False)
+    except Exception:
+        logger.exception("Anki export failed for job %s", job_id)
+        job.mark_error("Export failed.")
+        return {"status": "error"}
+
+    job.mark_success(counts)
+    logger.info("Anki export %s: %s", job_id, counts)
+    return counts
@@ -1,3 +1,1192 @@
+import base64
+import io
+import json
+import random
+import shutil
+import sqlite3
+import tempfile
+import zipfile
+from collections import Counter
+from importlib import import_module
+from datetime import timedelta
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import skipIf
+from unittest.mock import patch
 
-from django.test import TestCase
+from django.apps import apps as django_apps
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import get_resolver, reverse
+from django.utils import timezone
+from django.test import SimpleTestCase, override_settings
+from rest_framework.test import APITestCase
 
+from users.models import CustomUser
+from utils.querystats import QueryBudgetMixin, load_query_budgets
+from .caching import get_quiz_pack
+from .management.commands.recompute_srs import np, sm2_replay
+from .models import (
+    Deck, DeckShare, DeckTag, DeckTheme, DeckTransferJob, Feedback, Flashcard, FlashcardPerformance, QuizSession,
+    QuizSessionFlashcard, Tag, WeightedSampler,
+)
+from .review_queue import end_of_day
+
+
+class WeightedSamplerTests(SimpleTestCase):
+    def draw(self, sampler, n, seed=7):
+        rng = random.Random(seed)
+        return Counter(sampler.sample(rng) for _ in range(n))
+
+    def test_update_and_remove_adjust_total(self):
+        sampler = WeightedSampler({1: 1.0, 2: 2.0, 3: 3.0})
+        self.assertEqual((len(sampler), sampler.total), (3, 6.0))
+
+        sampler.update(2, 5.0)
+        sampler.update(4, 0.5)
+        self.assertIn(4, sampler)
+        self.assertAlmostEqual(sampler.total, 9.5)
+
+        sampler.remove(1)
+        sampler.remove(99)
+        self.assertNotIn(1, sampler)
+        self.assertEqual(len(sampler), 3)
+        self.assertAlmostEqual(sampler.total, 8.5)
+        self.assertNotIn(1, self.draw(sampler, 500))
+
+    def test_zero_weight_items_are_never_drawn(self):
+        sampler = WeightedSampler({1: 0.0, 2: 1.0, 3: -4.0})
+        sampler.update(4, 2.0)
+        sampler.update(2, 0.0)
+        self.assertEqual(set(self.draw(sampler, 1000)), {4})
+
+    def test_draws_are_proportional_to_weight(self):
+        weights = {key: float(key) for key in range(1, 9)}
+        sampler = WeightedSampler(weights)
+        sampler.update(8, 12.0)
+        weights[8] = 12.0
+
+        n = 40000
+        counts = self.draw(sampler, n)
+        total = sum(weights.values())
+        for key, weight in weights.items():
+            with self.subTest(key=key):
+                self.assertAlmostEqual(counts[key] / n, weight / total, delta=0.01)
+
+    def test_empty_sampler_returns_none(self):
+        sampler = WeightedSampler({5: 1.0})
+        sampler.remove(5)
+        self.assertIsNone(sampler.sample())
+
+
+class StartQuizSessionQueryTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user("quizzer", "quizzer@example.com", "pass1234")
+        self.client.force_authenticate(self.user)
+
+    def make_deck(self, size):
+        deck = Deck.objects.create(owner=self.user, title=f"Deck {Deck.objects.count() + 1}")
+        Flashcard.objects.bulk_create(
+            Flashcard(deck=deck, question=f"Q{i}", answer=f"A{i}") for i in range(size)
+        )
+        return deck
+
+    def start_quiz(self, deck, payload):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(reverse("quiz-start", args=[deck.id]), payload, format="json")
+        self.assertEqual(response.status_code, 201)
+        return response, len(ctx)
+
+    def test_start_query_count_does_not_depend_on_deck_size(self):
+        payloads = [
+            {"mode": "random", "adaptive_mode": True, "srs_enabled": True},
+            {"mode": "sequential", "adaptive_mode": False, "srs_enabled": False},
+        ]
+        for payload in payloads:
+            with self.subTest(**payload):
+                _, small = self.start_quiz(self.make_deck(3), payload)
+                _, large = self.start_quiz(self.make_deck(60), payload)
+                self.assertEqual(small, large)
+
+    def test_start_provisions_performance_and_attempt_rows(self):
+        deck = self.make_deck(10)
+        payload = {"mode": "sequential", "adaptive_mode": False, "srs_enabled": False}
+
+        response, _ = self.start_quiz(deck, payload)
+        self.start_quiz(deck, payload)
+
+        session_id = response.json()["session"]["id"]
+        self.assertEqual(FlashcardPerformance.objects.filter(user=self.user).count(), 10)
+        self.assertEqual(QuizSessionFlashcard.objects.filter(session_id=session_id).count(), 10)
+
+
+class QuizPackTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user("packer", "packer@example.com", "pass1234")
+        self.deck = Deck.objects.create(owner=self.user, title="Pack")
+        self.cards = Flashcard.bulk_add(self.deck, [Flashcard(question=f"Q{i}", answer=f"A{i}") for i in range(4)])
+        self.client.force_authenticate(self.user)
+
+    def test_card_edits_and_deletes_replace_the_cached_pack(self):
+        pack = get_quiz_pack(self.deck.id)
+        self.assertEqual(pack.ids, [card.id for card in self.cards])
+
+        self.cards[0].answer = "Saved"
+        self.cards[0].save()
+        self.cards[1].delete()
+        response = self.client.patch(
+            reverse("deck-edit", args=[self.deck.id]),
+            {"flashcards": [{"id": self.cards[2].id, "answer": "Bulk"}]}, format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+
+        pack = get_quiz_pack(self.deck.id)
+        self.assertNotIn(self.cards[1].id, pack)
+        self.assertEqual(
+            [pack.answer(card.id) for card in (self.cards[0], self.cards[2], self.cards[3])], ["Saved", "Bulk", "A3"]
+        )
+
+    def test_running_quiz_grades_against_the_edited_answer(self):
+        response = self.client.post(
+            reverse("quiz-start", args=[self.deck.id]),
+            {"mode": "sequential", "adaptive_mode": False, "srs_enabled": False}, format="json",
+        )
+        session_id = response.json()["session"]["id"]
+        self.assertEqual(response.json()["question"], "Q0")
+
+        self.client.patch(
+            reverse("deck-edit", args=[self.deck.id]),
+            {"flashcards": [{"id": self.cards[0].id, "answer": "Renamed"}]}, format="json",
+        )
+        response = self.client.post(reverse("quiz-answer", args=[session_id]), {"answer": "Renamed"}, format="json")
+        self.assertTrue(response.json()["correct"])
+
+
+class QuizPrefetchTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user("prefetcher", "prefetcher@example.com", "pass1234")
+        self.deck = Deck.objects.create(owner=self.user, title="Prefetch")
+        self.cards = Flashcard.bulk_add(self.deck, [Flashcard(question=f"Q{i}", answer=f"A{i}") for i in range(6)])
+        self.answers = {card.id: card.answer for card in self.cards}
+        self.client.force_authenticate(self.user)
+
+    def start(self, prefetch, adaptive):
+        response = self.client.post(
+            reverse("quiz-start", args=[self.deck.id]),
+            {"mode": "random" if adaptive else "sequential", "adaptive_mode": adaptive, "srs_enabled": adaptive,
+             "prefetch": prefetch},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201)
+        return response.json()
+
+    def assertPrefetched(self, prefetched, questions):
+        self.assertEqual([card["question"] for card in prefetched], questions)
+        for card in prefetched:
+            self.assertIn(self.answers[card["flashcard_id"]], card["options"])
+
+    def test_sequential_prefetch_is_the_next_cards_in_order(self):
+        data = self.start(2, adaptive=False)
+        self.assertEqual(data["question"], "Q0")
+        self.assertPrefetched(data["prefetch"], ["Q1", "Q2"])
+
+        session_id = data["session"]["id"]
+        url = reverse("quiz-answer", args=[session_id])
+        data = self.client.post(url, {"answer": "A0", "prefetch": 2}, format="json").json()
+        self.assertEqual(data["next_question"], "Q1")
+        self.assertPrefetched(data["prefetch"], ["Q2", "Q3"])
+
+        data = self.client.post(reverse("quiz-skip", args=[session_id]) + "?prefetch=3").json()
+        self.assertEqual(data["next_question"], "Q2")
+        self.assertPrefetched(data["prefetch"], ["Q3", "Q4", "Q5"])
+
+        for answer in ("A2", "A3", "A4"):
+            data = self.client.post(url, {"answer": answer, "prefetch": 2}, format="json").json()
+        self.assertEqual(data["next_question"], "Q5")
+        self.assertEqual(data["prefetch"], [])
+
+    def test_adaptive_prefetch_is_served_in_the_prefetched_order(self):
+        data = self.start(3, adaptive=True)
+        prefetched = [card["question"] for card in data["prefetch"]]
+        self.assertEqual(len(set([data["question"], *prefetched])), 4)
+
+        url = reverse("quiz-answer", args=[data["session"]["id"]])
+        served = []
+        for _ in prefetched:
+            data = self.client.post(url, {"answer": "wrong"}, format="json").json()
+            served.append(data["next_question"])
+        self.assertEqual(served, prefetched)
+
+    def test_prefetch_count_is_capped(self):
+        self.assertEqual(len(self.start(50, adaptive=False)["prefetch"]), 5)
+        self.assertNotIn("prefetch", self.start(0, adaptive=False))
+
+
+@override_settings(QUIZ_SESSION_STATE_CACHE=True, QUIZ_SESSION_FLUSH_EVERY=3)
+class LiveSessionStateTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user("live", "live@example.com", "pass1234")
+        self.deck = Deck.objects.create(owner=self.user, title="Live")
+        Flashcard.bulk_add(self.deck, [Flashcard(question=f"Q{i}", answer=f"A{i}") for i in range(5)])
+        self.client.force_authenticate(self.user)
+        response = self.client.post(
+            reverse("quiz-start", args=[self.deck.id]),
+            {"mode": "sequential", "adaptive_mode": False, "srs_enabled": False}, format="json",
+        )
+        self.session_id = response.json()["session"]["id"]
+
+    def answer(self, *answers):
+        for answer in answers:
+            response = self.client.post(reverse("quiz-answer", args=[self.session_id]), {"answer": answer}, format="json")
+            self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def stored(self):
+        return QuizSession.objects.get(pk=self.session_id)
+
+    def live(self):
+        return self.client.get(reverse("quiz-results", args=[self.session_id])).json()
+
+    def test_finish_flushes_the_final_state(self):
+        self.answer("A0", "wrong", "A2", "wrong")
+        self.assertEqual(self.live()["total_answered"], 4)
+        self.assertEqual(self.stored().total_answered, 2)  # last flush, every third write
+
+        self.assertIsNone(self.answer("A4")["next_question"])
+        stored = self.stored()
+        self.assertIsNotNone(stored.finished_at)
+        self.assertEqual((stored.current_index, stored.total_answered, stored.correct_count), (5, 5, 3))
+        self.assertIsNone(cache.get(f"quiz:session:{self.session_id}:state"))
+        self.assertEqual(self.live()["total_answered"], 5)
+
+    def test_evicted_state_falls_back_to_the_last_flush(self):
+        self.answer("A0", "A1", "A2")
+        cache.clear()
+
+        self.assertEqual((self.live()["total_answered"], self.live()["correct_count"]), (2, 2))
+        response = self.answer("A2")
+        self.assertTrue(response["correct"])
+        self.assertEqual(response["next_question"], "Q3")
+        self.assertEqual(self.live()["total_answered"], 3)
+
+
+class QuizSyncTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user("offline", "offline@example.com", "pass1234")
+        self.deck = Deck.objects.create(owner=self.user, title="Offline")
+        Flashcard.objects.bulk_create(
+            Flashcard(deck=self.deck, question=f"Q{i}", answer=f"A{i}") for i in range(4)
+        )
+        self.cards = list(self.deck.flashcards.order_by("created_at", "id"))
+        self.client.force_authenticate(self.user)
+
+    def start_session(self):
+        response = self.client.post(
+            reverse("quiz-start", args=[self.deck.id]),
+            {"mode": "sequential", "adaptive_mode": False, "srs_enabled": False}, format="json",
+        )
+        self.assertEqual(response.status_code, 201)
+        return response.json()["session"]["id"]
+
+    def answers(self, session_id, cards, prefix="k"):
+        base = timezone.now() - timedelta(hours=1)
+        return [
+            {
+                "session": session_id, "flashcard": card.id, "idempotency_key": f"{prefix}{i}",
+                "answer": card.answer if i % 2 == 0 else "wrong",
+                "answered_at": (base + timedelta(minutes=i)).isoformat(),
+            }
+            for i, card in enumerate(cards)
+        ]
+
+    def sync(self, answers):
+        response = self.client.post(reverse("quiz-sync"), {"answers": answers}, format="json")
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_replayed_keys_are_duplicates_and_counters_do_not_move(self):
+        session_id = self.start_session()
+        answers = self.answers(session_id, self.cards[:3])
+
+        first = self.sync(answers)
+        self.assertEqual([r["status"] for r in first["results"]], ["applied"] * 3)
+        replay = self.sync(answers)
+        self.assertEqual([r["status"] for r in replay["results"]], ["duplicate"] * 3)
+
+        self.assertEqual(replay["sessions"], first["sessions"])
+        session = QuizSession.objects.get(pk=session_id)
+        self.assertEqual((session.total_answered, session.correct_count, session.current_index), (3, 2, 3))
+        self.assertEqual(
+            QuizSessionFlashcard.objects.filter(session_id=session_id, answered=True).count(), 3
+        )
+
+    def test_answers_for_a_finished_session_are_rejected(self):
+        session_id = self.start_session()
+        finished = self.sync(self.answers(session_id, self.cards))
+        self.assertTrue(finished["sessions"][0]["finished"])
+
+        late = self.sync(self.answers(session_id, self.cards[:1], prefix="late"))
+        self.assertEqual(late["results"][0]["status"], "session_finished")
+        self.assertEqual(QuizSession.objects.get(pk=session_id).total_answered, 4)
+
+    def test_answers_for_another_users_session_are_rejected(self):
+        session_id = self.start_session()
+        intruder = CustomUser.objects.create_user("intruder", "intruder@example.com", "pass1234")
+        self.client.force_authenticate(intruder)
+
+        result = self.sync(self.answers(session_id, self.cards[:2]))
+        self.assertEqual([r["status"] for r in result["results"]], ["session_not_found"] * 2)
+        self.assertEqual(result["sessions"], [])
+        self.assertEqual(QuizSession.objects.get(pk=session_id).total_answered, 0)
+
+
+@skipIf(np is None, "recompute_srs requires NumPy")
+class RecomputeSrsTests(APITestCase):
+    # Long enough to reach repetitions > 2 (interval * easiness), reset, and climb again
+    HISTORIES = [
+        [True, True, True, True, False, True, True, True, True],
+        [False, False, True, True, True, True, True, True],
+        [True, False, True, True, True, False, False, True, True, True, True],
+        [True],
+        [],
+    ]
+
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user("srs", "srs@example.com", "pass1234")
+        self.deck = Deck.objects.create(owner=self.user, title="SRS")
+        self.cards = Flashcard.bulk_add(
+            self.deck, [Flashcard(question=f"Q{i}", answer=f"A{i}") for i in range(len(self.HISTORIES))]
+        )
+
+    def replay_one_by_one(self, history, start=None):
+        perf = FlashcardPerformance()
+        start = start or timezone.now()
+        for i, correct in enumerate(history):
+            perf.update_spaced_repetition(correct, reviewed_at=start + timedelta(days=i))
+        return perf
+
+    def test_replay_matches_update_spaced_repetition(self):
+        rng = random.Random(8)
+        histories = self.HISTORIES + [[rng.random() < 0.7 for _ in range(rng.randint(1, 15))] for _ in range(40)]
+        steps = max(len(history) for history in histories)
+        grades = np.zeros((len(histories), steps), dtype=np.int64)
+        mask = np.zeros((len(histories), steps), dtype=bool)
+        for i, history in enumerate(histories):
+            grades[i, :len(history)] = [5 if correct else 2 for correct in history]
+            mask[i, :len(history)] = True
+
+        easiness, interval, repetitions = sm2_replay(grades, mask)
+        for i, history in enumerate(histories):
+            with self.subTest(history=history):
+                expected = self.replay_one_by_one(history)
+                self.assertAlmostEqual(easiness[i], expected.easiness)
+                self.assertEqual((interval[i], repetitions[i]), (expected.interval, expected.repetitions))
+        self.assertGreater(interval.max(), 6)
+
+    def record_histories(self):
+        session = QuizSession.objects.create(user=self.user, deck=self.deck, mode="random")
+        start = timezone.now() - timedelta(days=30)
+        attempts = []
+        for card, history in zip(self.cards, self.HISTORIES):
+            FlashcardPerformance.objects.create(user=self.user, flashcard=card)
+            for i, correct in enumerate(history):
+                attempts.append(QuizSessionFlashcard(
+                    session=session, flashcard=card, answered=True, correct=correct,
+                    answer_given=card.answer if correct else "wrong", answered_at=start + timedelta(days=i),
+                ))
+        QuizSessionFlashcard.objects.bulk_create(attempts)
+        return start
+
+    def stored(self):
+        return list(FlashcardPerformance.objects.order_by("flashcard_id").values_list(
+            "easiness", "interval", "repetitions", "last_reviewed", "next_review_due"
+        ))
+
+    def test_dry_run_writes_nothing(self):
+        self.record_histories()
+        before = self.stored()
+
+        out = io.StringIO()
+        call_command("recompute_srs", "--dry-run", stdout=out)
+        self.assertIn("would change 4, 1 without history", out.getvalue())
+        self.assertEqual(self.stored(), before)
+
+    def test_recompute_writes_the_replayed_schedule(self):
+        start = self.record_histories()
+        call_command("recompute_srs", "--chunk-size", "2", stdout=io.StringIO())
+
+        for row, history in zip(self.stored(), self.HISTORIES):
+            expected = self.replay_one_by_one(history, start) if history else FlashcardPerformance()
+            self.assertAlmostEqual(row[0], expected.easiness)
+            self.assertEqual(row[1:], (expected.interval, expected.repetitions, expected.last_reviewed,
+                                       expected.next_review_due))
+
+
+class ReviewQueueTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user("reviewer", "reviewer@example.com", "pass1234")
+        self.other = CustomUser.objects.create_user("author", "author@example.com", "pass1234")
+        self.now = timezone.now()
+        self.due = []
+
+        own = self.deck(self.user, "Own")
+        public = self.deck(self.other, "Public", is_public=True)
+        shared = self.deck(self.other, "Shared")
+        DeckShare.objects.create(deck=shared, user=self.user)
+        # Due, but not reachable: private, archived, hidden by an admin
+        for title, flags in [("Private", {}), ("Archived", {"is_public": True, "is_archived": True}),
+                             ("Hidden", {"is_public": True, "admin_hidden": True})]:
+            self.perfs(self.deck(self.other, title, **flags), [self.hours_ago(3)])
+
+        later_today, tomorrow = end_of_day(self.now) - timedelta(minutes=1), end_of_day(self.now)
+        self.due += self.perfs(own, [self.hours_ago(5), self.hours_ago(1), None, later_today])
+        self.due += self.perfs(public, [self.hours_ago(4), self.hours_ago(2)])
+        self.due += self.perfs(shared, [self.hours_ago(6)])
+        self.perfs(own, [tomorrow])
+        self.due.sort(key=lambda perf: (perf.next_review_due, perf.id))
+        self.client.force_authenticate(self.user)
+
+    def deck(self, owner, title, **flags):
+        return Deck.objects.create(owner=owner, title=title, **flags)
+
+    def hours_ago(self, hours):
+        return self.now - timedelta(hours=hours)
+
+    def perfs(self, deck, due_dates):
+        """A card and performance row per due date; rows never scheduled (None) are not returned."""
+        cards = Flashcard.bulk_add(deck, [Flashcard(question=f"{deck.title} {i}", answer="A")
+                                          for i in range(len(due_dates))])
+        perfs = [
+            FlashcardPerformance.objects.create(user=self.user, flashcard=card, next_review_due=due)
+            for card, due in zip(cards, due_dates)
+        ]
+        return [perf for perf in perfs if perf.next_review_due is not None]
+
+    def pages(self, limit):
+        results, cursor = [], None
+        while True:
+            params = {"limit": limit, **({"cursor": cursor} if cursor else {})}
+            data = self.client.get(reverse("review-due"), params).json()
+            results += data["results"]
+            cursor = data["next_cursor"]
+            if cursor is None:
+                return results, data
+
+    def test_queue_is_every_accessible_card_due_today_in_due_order(self):
+        results, data = self.pages(limit=50)
+        self.assertEqual([r["performance_id"] for r in results], [perf.id for perf in self.due])
+        self.assertEqual(results[0]["question"], "Shared 0")
+        self.assertEqual(data["total_due"], 6)
+        self.assertEqual(
+            [(d["title"], d["due"]) for d in data["decks"]], [("Own", 3), ("Public", 2), ("Shared", 1)]
+        )
+
+    def test_cursor_pages_cover_the_queue_once(self):
+        paged, _ = self.pages(limit=2)
+        self.assertEqual([r["performance_id"] for r in paged], [perf.id for perf in self.due])
+
+    def test_reviewed_card_leaves_the_queue(self):
+        self.pages(limit=50)
+        first = FlashcardPerformance.objects.get(pk=self.due[0].pk)
+        first.record_answer(True)
+
+        results, data = self.pages(limit=50)
+        self.assertNotIn(first.pk, [r["performance_id"] for r in results])
+        self.assertEqual(data["total_due"], 5)
+
+
+class KeysetPaginationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user("pager", "pager@example.com", "pass1234")
+        self.deck = Deck.objects.create(owner=self.user, title="Pages")
+        cards = Flashcard.bulk_add(self.deck, [Flashcard(question=f"Q{i}", answer="A") for i in range(8)])
+        # Pairs share a timestamp, so pages have to break ties on id
+        base = timezone.now() - timedelta(days=1)
+        for i, card in enumerate(cards):
+            Flashcard.objects.filter(pk=card.pk).update(created_at=base + timedelta(minutes=i // 2))
+        self.expected = list(Flashcard.objects.order_by("-created_at", "-id").values_list("id", flat=True))
+        self.url = reverse("flashcard-list", args=[self.deck.id])
+        self.client.force_authenticate(self.user)
+
+    def page(self, url=None, **params):
+        response = self.client.get(url or self.url, params)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        return [row["id"] for row in data["results"]], data["next_cursor"]
+
+    def test_cursor_pages_cover_every_row_once(self):
+        for limit in (1, 3, 8):
+            with self.subTest(limit=limit):
+                ids, cursor = self.page(limit=limit)
+                while cursor:
+                    more, cursor = self.page(limit=limit, cursor=cursor)
+                    ids += more
+                self.assertEqual(ids, self.expected)
+
+    def test_rows_added_while_paging_do_not_shift_later_pages(self):
+        first, cursor = self.page(limit=3)
+        Flashcard.bulk_add(self.deck, [Flashcard(question="New", answer="A")])
+
+        rest = []
+        while cursor:
+            more, cursor = self.page(limit=3, cursor=cursor)
+            rest += more
+        self.assertEqual(first + rest, self.expected)
+
+    def test_malformed_cursor_is_a_bad_request(self):
+        cursors = ["garbage", "!!!", b64("no-separator"), b64("2024-01-01T00:00:00|x"), b64("not a date|3"),
+                   b64("a|b|c")]
+        for cursor in cursors:
+            with self.subTest(cursor=cursor):
+                self.assertEqual(self.client.get(self.url, {"cursor": cursor}).status_code, 400)
+                self.assertEqual(self.client.get(reverse("deck-list"), {"cursor": cursor}).status_code, 400)
+                search = self.client.get(reverse("search"), {"q": "Q", "decks_cursor": cursor})
+                self.assertEqual(search.status_code, 400)
+
+    def test_limit_is_clamped(self):
+        Flashcard.bulk_add(self.deck, [Flashcard(question=f"More {i}", answer="A") for i in range(200)])
+        self.assertEqual(len(self.page(limit=0)[0]), 1)
+        self.assertEqual(len(self.page(limit=-5)[0]), 1)
+        self.assertEqual(len(self.page(limit=10_000)[0]), 200)
+        self.assertEqual(self.client.get(self.url, {"limit": "many"}).status_code, 400)
+
+
+def b64(text):
+    return base64.urlsafe_b64encode(text.encode()).decode()
+
+
+class SearchTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user("finder", "finder@example.com", "pass1234")
+
+    def deck(self, title, description="", tags="", **extra):
+        return Deck.objects.create(
+            owner=self.user, title=title, description=description, tags=tags, is_public=True, **extra
+        )
+
+    def search(self, **params):
+        response = self.client.get(reverse("search"), {"q": "biology", **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_results_are_ranked_by_matched_fields(self):
+        described = self.deck("Cells", description="Intro biology")
+        tagged = self.deck("Plants", tags="biology, botany")
+        titled = self.deck("Biology 101")
+        both = self.deck("Marine biology", description="Ocean biology")
+        newer_title = self.deck("Biology basics")
+        self.deck("Chemistry", description="Reactions")
+        self.deck("Hidden biology", admin_hidden=True)
+        question = Flashcard.bulk_add(described, [Flashcard(question="What is biology?", answer="A science")])[0]
+        answer = Flashcard.bulk_add(tagged, [Flashcard(question="Study of life?", answer="Biology")])[0]
+
+        data = self.search()
+        self.assertEqual(
+            [d["id"] for d in data["decks_found"]], [both.id, newer_title.id, titled.id, tagged.id, described.id]
+        )
+        self.assertEqual([f["id"] for f in data["flashcards_found"]], [question.id, answer.id])
+
+    def test_capped_results_say_they_were_truncated(self):
+        for i in range(3):
+            self.deck(f"Biology {i}")
+
+        with patch("decks.views.SEARCH_MAX_RESULTS", 2):
+            capped = self.search()
+            self.assertEqual(len(capped["decks_found"]), 2)
+            self.assertIs(capped["decks_truncated"], True)
+            self.assertIs(capped["flashcards_truncated"], False)
+
+            paged = self.search(limit=2)
+            self.assertNotIn("decks_truncated", paged)
+            rest = self.search(limit=2, decks_cursor=paged["decks_next_cursor"])
+            self.assertEqual(len(paged["decks_found"] + rest["decks_found"]), 3)
+            self.assertIsNone(rest["decks_next_cursor"])
+
+
+class DeckTagTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user("tagger", "tagger@example.com", "pass1234")
+
+    def deck(self, title, tags, **flags):
+        return Deck.objects.create(owner=self.user, title=title, tags=tags, **{"is_public": True, **flags})
+
+    def deck_tags(self):
+        return sorted(DeckTag.objects.values_list("deck__title", "tag__name"))
+
+    def test_facets_count_visible_decks_and_narrow_by_selection(self):
+        self.deck("Web", " Python , web, PYTHON")
+        self.deck("Data", "python,data")
+        self.deck("Stats", "data")
+        self.deck("Private", "python", is_public=False)
+        self.deck("Old", "python", is_archived=True)
+
+        data = self.client.get(reverse("tag-facets")).json()
+        self.assertEqual(data["total_decks"], 3)
+        self.assertEqual(data["tags"], [
+            {"name": "data", "count": 2}, {"name": "python", "count": 2}, {"name": "web", "count": 1},
+        ])
+
+        data = self.client.get(reverse("tag-facets"), {"tag": "Python"}).json()
+        self.assertEqual((data["selected"], data["total_decks"]), (["python"], 2))
+        self.assertEqual(data["tags"], [{"name": "data", "count": 1}, {"name": "web", "count": 1}])
+
+        decks = self.client.get(reverse("deck-list"), {"tag": ["python", "data"]}).json()
+        self.assertEqual([d["title"] for d in decks], ["Data"])
+
+    def test_editing_tags_replaces_the_links(self):
+        deck = self.deck("Web", "python, web")
+        deck.tags = "web, html"
+        deck.save()
+        self.assertEqual(self.deck_tags(), [("Web", "html"), ("Web", "web")])
+
+    def test_migration_backfills_links_from_the_tags_column(self):
+        self.deck("Web", " Python , web, PYTHON")
+        self.deck("Empty", "")
+        DeckTag.objects.all().delete()
+        Tag.objects.filter(name="web").delete()
+        migration = import_module("decks.migrations.0004_tags")
+        schema_editor = SimpleNamespace(connection=connection)
+
+        for _ in range(2):
+            migration.backfill_deck_tags(django_apps, schema_editor)
+            self.assertEqual(self.deck_tags(), [("Web", "python"), ("Web", "web")])
+
+        DeckTag.objects.all().delete()
+        columns = [col for col in connection.introspection.get_table_description(connection.cursor(), "decks_deck")
+                   if col.name != "tags"]
+        with patch.object(connection.introspection, "get_table_description", return_value=columns):
+            migration.backfill_deck_tags(django_apps, schema_editor)
+        self.assertEqual(self.deck_tags(), [])
+
+
+class DeckDeleteSignalTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = CustomUser.objects.create_user("cascade", "cascade@example.com", "pass1234")
+        self.peer = CustomUser.objects.create_user("peer", "peer@example.com", "pass1234")
+
+    def deck(self, owner, size):
+        deck = Deck.objects.create(owner=owner, title=f"Deck {size}", is_public=True)
+        Flashcard.bulk_add(deck, [Flashcard(question=f"Q{i}", answer="A") for i in range(size)])
+        DeckShare.objects.create(deck=deck, user=self.peer if owner == self.owner else self.owner)
+        return deck
+
+    def test_deleting_a_deck_does_not_refresh_it_per_card(self):
+        counts = []
+        for size in (3, 40):
+            deck = self.deck(self.owner, size)
+            with patch.object(Deck, "touch_content") as touch, patch("decks.signals.invalidate_quiz_pack") as pack:
+                with CaptureQueriesContext(connection) as ctx:
+                    deck.delete()
+            touch.assert_not_called()
+            pack.assert_not_called()
+            counts.append(len(ctx))
+        self.assertEqual(counts[0], counts[1])
+        self.assertFalse(Flashcard.objects.exists())
+
+    def test_deleting_a_user_still_refreshes_decks_they_rated(self):
+        self.deck(self.owner, 5)
+        theirs = self.deck(self.peer, 2)
+        Feedback.objects.create(deck=theirs, user=self.owner, rating=5)
+
+        with patch.object(Deck, "touch_content") as touch:
+            self.owner.delete()
+        self.assertEqual({c.args for c in touch.call_args_list}, {(theirs.pk,)})
+
+    def test_delete_missing_refreshes_the_deck_once(self):
+        deck = self.deck(self.owner, 30)
+        keep = deck.flashcards.order_by("id").first()
+        self.client.force_authenticate(self.owner)
+
+        with patch.object(Deck, "touch_content") as touch, patch("decks.caching.bump_version") as bump:
+            response = self.client.patch(
+                reverse("deck-edit", args=[deck.id]), {"flashcards": [{"id": keep.id}], "delete_missing": True},
+                format="json",
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(deck.flashcards.values_list("id", flat=True)), [keep.id])
+        touch.assert_called_once_with(deck.pk)
+        self.assertEqual(Counter(c.args[0] for c in bump.call_args_list), {"quiz_pack": 1, "payload": 2})
+
+
+class FlashcardTransferTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user("porter", "porter@example.com", "pass1234")
+        self.deck = Deck.objects.create(owner=self.user, title="Imports")
+        self.client.force_authenticate(self.user)
+
+    def upload(self, deck, name, content):
+        upload = SimpleUploadedFile(name, content.encode("utf-8"))
+        return self.client.post(reverse("deck-import", args=[deck.id]), {"file": upload}, format="multipart")
+
+    def test_invalid_rows_are_reported_by_line(self):
+        content = "\n".join([
+            '{"question": "Q1", "answer": "A1"}',
+            '{"question": "  ", "answer": "A2"}',
+            '{"question": "Q3", "answer": "A3", "difficulty": "brutal"}',
+            '{"question": "Q4", "answer": ',
+            '{"question": "Q5", "answer": "A5", "difficulty": "hard"}',
+        ])
+        response = self.upload(self.deck, "cards.jsonl", content)
+
+        self.assertEqual(response.status_code, 201)
+        report = response.json()
+        self.assertEqual((report["created"], report["failed"]), (2, 3))
+        errors = {entry["line"]: entry["errors"] for entry in report["errors"]}
+        self.assertEqual(set(errors), {2, 3, 4})
+        self.assertIn("question", errors[2])
+        self.assertIn("difficulty", errors[3])
+        self.assertEqual(errors[4], {"non_field_errors": ["Invalid JSON."]})
+        self.assertEqual(
+            sorted(self.deck.flashcards.values_list("question", "difficulty")),
+            [("Q1", "medium"), ("Q5", "hard")],
+        )
+
+    def test_csv_export_import_round_trip(self):
+        cards = [("What, exactly?", 'Say "hi"', "easy"), ("Multi\nline", "A2", "medium"), ("Q3", "A3", "hard")]
+        Flashcard.bulk_add(self.deck, [Flashcard(question=q, answer=a, difficulty=d) for q, a, d in cards])
+
+        response = self.client.get(reverse("deck-export", args=[self.deck.id]), {"type": "csv"})
+        self.assertEqual(response.status_code, 200)
+        exported = b"".join(response.streaming_content).decode("utf-8")
+
+        copy = Deck.objects.create(owner=self.user, title="Copy")
+        response = self.upload(copy, "cards.csv", exported)
+        self.assertEqual(response.json(), {"created": 3, "failed": 0, "errors": []})
+        self.assertEqual(
+            sorted(copy.flashcards.values_list("question", "answer", "difficulty")), sorted(cards)
+        )
+
+
+class AnkiTransferTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        self.user = CustomUser.objects.create_user("anki", "anki@example.com", "pass1234")
+        self.deck = Deck.objects.create(owner=self.user, title="Kanji")
+        Flashcard.bulk_add(self.deck, [
+            Flashcard(question=f"Q<{i}>", answer=f"A&{i}", difficulty="hard" if i == 0 else "medium")
+            for i in range(3)
+        ])
+        reviewed = self.deck.flashcards.order_by("id").first()
+        performance = FlashcardPerformance.objects.create(user=self.user, flashcard=reviewed)
+        performance.record_answer(True)
+        performance.record_answer(True)
+        self.client.force_authenticate(self.user)
+
+    def run_job(self, url, data=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, data, format="multipart")
+        self.assertEqual(response.status_code, 202)
+        return DeckTransferJob.objects.get(pk=response.json()["id"])
+
+    def import_file(self, content):
+        upload = SimpleUploadedFile("deck.apkg", content)
+        return self.run_job(reverse("deck-import-anki"), {"file": upload})
+
+    def add_reviews(self, apkg, eases):
+        """The exported package with one review per ease on its first card, as Anki would log them."""
+        workdir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, workdir, ignore_errors=True)
+        collection = workdir / "collection.anki2"
+        with zipfile.ZipFile(io.BytesIO(apkg)) as archive:
+            collection.write_bytes(archive.read("collection.anki2"))
+        conn = sqlite3.connect(collection)
+        card_id = conn.execute("SELECT id FROM cards ORDER BY id LIMIT 1").fetchone()[0]
+        now_ms = int(timezone.now().timestamp() * 1000)
+        for i, ease in enumerate(eases):
+            conn.execute(
+                "INSERT INTO revlog VALUES (?, ?, -1, ?, 3, 1, 2500, 4000, 1)",
+                (now_ms - (len(eases) - i) * 86400000, card_id, ease),
+            )
+        conn.commit()
+        conn.close()
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w") as archive:
+            archive.write(collection, "collection.anki2")
+            archive.writestr("media", "{}")
+        return buffer.getvalue()
+
+    def test_export_import_round_trip(self):
+        export = self.run_job(reverse("deck-export-anki", args=[self.deck.id]))
+        self.assertEqual(export.status, "success", export.error_message)
+        self.assertEqual(export.result_data, {"flashcards": 3, "scheduled": 1})
+        with export.result_file.open("rb") as f:
+            apkg = f.read()
+
+        imported = self.import_file(apkg)
+        self.assertEqual(imported.status, "success", imported.error_message)
+        self.assertEqual(imported.result_data, {"notes": 3, "flashcards": 3, "reviews": 0, "skipped": 0})
+        self.assertEqual(
+            sorted(imported.deck.flashcards.values_list("question", "answer", "difficulty")),
+            sorted(self.deck.flashcards.values_list("question", "answer", "difficulty")),
+        )
+
+        # Reviews logged in Anki become review history on the imported card
+        reviewed = self.import_file(self.add_reviews(apkg, [3, 1, 3, 4]))
+        self.assertEqual(reviewed.status, "success", reviewed.error_message)
+        self.assertEqual(reviewed.result_data["reviews"], 4)
+        performance = FlashcardPerformance.objects.get(user=self.user, flashcard__deck=reviewed.deck)
+        self.assertEqual((performance.correct_count, performance.incorrect_count), (3, 1))
+        self.assertIsNotNone(performance.next_review_due)
+
+    def test_malformed_archive_fails_the_job(self):
+        job = self.import_file(b"definitely not a zip archive")
+        self.assertEqual(job.status, "error")
+        self.assertEqual(job.error_message, "Not an Anki package (.apkg) file.")
+        self.assertIsNone(job.deck)
+        self.assertIsNotNone(job.finished_at)
+
+
+class ConditionalGetTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = CustomUser.objects.create_user("author304", "author304@example.com", "pass1234")
+        self.reader = CustomUser.objects.create_user("reader304", "reader304@example.com", "pass1234")
+        self.deck = Deck.objects.create(owner=self.owner, title="Validators", is_public=True)
+        self.cards = Flashcard.bulk_add(self.deck, [Flashcard(question=f"Q{i}", answer="A") for i in range(2)])
+        self.client.force_authenticate(self.owner)
+        self.urls = [
+            reverse("deck-detail", args=[self.deck.id]), reverse("flashcard-list", args=[self.deck.id]),
+        ]
+
+    def get(self, url, **headers):
+        return self.client.get(url, headers=headers)
+
+    def assertRevalidates(self, change):
+        """Matching validators give 304 until `change` runs, then a full 200 with a new ETag."""
+        etags = {}
+        for url in self.urls:
+            first = self.get(url)
+            self.assertEqual(first.status_code, 200)
+            etags[url] = first["ETag"]
+            self.assertEqual(self.get(url, if_none_match=etags[url]).status_code, 304)
+        change()
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.get(url, if_none_match=etags[url])
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response["ETag"], etags[url])
+
+    def test_matching_validators_return_not_modified(self):
+        first = self.get(self.urls[0])
+        etag, last_modified = first["ETag"], first["Last-Modified"]
+
+        for headers in ({"if_none_match": etag}, {"if_none_match": f'"other", W/{etag}'}, {"if_none_match": "*"},
+                        {"if_modified_since": last_modified}):
+            with self.subTest(**headers):
+                response = self.get(self.urls[0], **headers)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.content, b"")
+                self.assertEqual(response["ETag"], etag)
+        self.assertEqual(self.get(self.urls[0], if_none_match='"stale"').status_code, 200)
+
+    def test_card_edits_change_the_validators(self):
+        def edit():
+            self.cards[0].question = "Edited"
+            self.cards[0].save()
+        self.assertRevalidates(edit)
+        self.assertRevalidates(lambda: self.cards[1].delete())
+        self.assertRevalidates(lambda: Flashcard.bulk_add(self.deck, [Flashcard(question="New", answer="A")]))
+
+    def test_share_and_rating_changes_change_the_validators(self):
+        self.assertRevalidates(lambda: DeckShare.objects.create(deck=self.deck, user=self.reader))
+        self.assertRevalidates(lambda: self.client.post(
+            reverse("deck-share-revoke", args=[self.deck.id]), {"usernames": [self.reader.username]}, format="json"
+        ))
+        self.assertRevalidates(lambda: Feedback.objects.create(deck=self.deck, user=self.reader, rating=4))
+
+    def test_validators_differ_by_access_level(self):
+        owner_etag = self.get(self.urls[0])["ETag"]
+        self.client.force_authenticate(self.reader)
+        response = self.get(self.urls[0], if_none_match=owner_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], owner_etag)
+
+
+class DeckFlashcardEditTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user("editor", "editor@example.com", "pass1234")
+        self.deck = Deck.objects.create(owner=self.user, title="Edits")
+        self.cards = Flashcard.bulk_add(self.deck, [Flashcard(question=f"Q{i}", answer=f"A{i}") for i in range(3)])
+        self.client.force_authenticate(self.user)
+
+    def edit(self, flashcards, **extra):
+        return self.client.patch(
+            reverse("deck-edit", args=[self.deck.id]), {"flashcards": flashcards, **extra}, format="json"
+        )
+
+    def etag(self):
+        response = self.client.get(reverse("deck-detail", args=[self.deck.id]))
+        self.assertEqual(response.status_code, 200)
+        return response["ETag"]
+
+    def cards_in_deck(self):
+        return sorted(self.deck.flashcards.values_list("question", "answer", "difficulty"))
+
+    def test_edit_by_id_updates_only_given_fields_and_changes_etag(self):
+        before = self.etag()
+        response = self.edit([{"id": self.cards[0].id, "answer": "Changed", "difficulty": "hard"}])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            self.cards_in_deck(), [("Q0", "Changed", "hard"), ("Q1", "A1", "medium"), ("Q2", "A2", "medium")]
+        )
+        self.assertNotEqual(self.etag(), before)
+
+    def test_rows_without_id_create_cards(self):
+        response = self.edit([{"question": "Q3", "answer": "A3"}])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.deck.flashcards.count(), 4)
+        self.assertIn(("Q3", "A3", "medium"), self.cards_in_deck())
+
+    def test_missing_cards_are_deleted_only_with_delete_missing(self):
+        keep = [{"id": self.cards[0].id}]
+        self.assertEqual(self.edit(keep).status_code, 200)
+        self.assertEqual(self.deck.flashcards.count(), 3)
+
+        self.assertEqual(self.edit(keep, delete_missing=True).status_code, 200)
+        self.assertEqual(list(self.deck.flashcards.values_list("id", flat=True)), [self.cards[0].id])
+
+    def test_create_accepts_delete_missing(self):
+        response = self.client.post(reverse("deck-create"), {
+            "title": "Fresh", "delete_missing": True, "flashcards": [{"question": "Q", "answer": "A"}],
+        }, format="json")
+        self.assertEqual(response.status_code, 201)
+        deck = Deck.objects.get(owner=self.user, title="Fresh")
+        self.assertEqual(list(deck.flashcards.values_list("question", "answer")), [("Q", "A")])
+
+    def test_id_from_another_deck_is_rejected(self):
+        other = Deck.objects.create(owner=self.user, title="Other")
+        foreign = Flashcard.bulk_add(other, [Flashcard(question="Theirs", answer="T")])[0]
+
+        response = self.edit([{"id": foreign.id, "question": "Stolen", "answer": "S"}])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("id", response.json()["flashcards"][0])
+        self.assertEqual(self.deck.flashcards.count(), 3)
+        foreign.refresh_from_db()
+        self.assertEqual(foreign.question, "Theirs")
+
+
+class ShareRevocationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = CustomUser.objects.create_user("teacher", "teacher@example.com", "pass1234")
+        self.student = CustomUser.objects.create_user("student", "student@example.com", "pass1234")
+        self.deck = Deck.objects.create(owner=self.owner, title="Private notes")
+        Flashcard.bulk_add(self.deck, [Flashcard(question="Q", answer="A")])
+
+    def test_revoked_user_loses_cached_access(self):
+        DeckShare.objects.create(deck=self.deck, user=self.student, permission="view")
+        self.client.force_authenticate(self.student)
+        url = reverse("deck-detail", args=[self.deck.id])
+        for _ in range(2):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+        self.client.force_authenticate(self.owner)
+        response = self.client.post(
+            reverse("deck-share-revoke", args=[self.deck.id]), {"usernames": ["student"]}, format="json"
+        )
+        self.assertEqual(response.json(), {"revoked": ["student"]})
+
+        self.client.force_authenticate(self.student)
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+    def test_disabling_the_link_invalidates_cached_pages(self):
+        self.deck.enable_link_sharing()
+        old_link = str(self.deck.share_link)
+        page_url = reverse("deck-share-link", args=[old_link])
+        detail_url = reverse("deck-detail", args=[self.deck.id])
+        for _ in range(2):
+            self.assertEqual(self.client.get(page_url).status_code, 200)
+            self.assertEqual(self.client.get(detail_url, {"share_link": old_link}).status_code, 200)
+
+        self.client.force_authenticate(self.owner)
+        response = self.client.post(
+            reverse("deck-share-toggle-link", args=[self.deck.id]), {"action": "disable"}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get(page_url).status_code, 404)
+        self.assertEqual(self.client.get(detail_url, {"share_link": old_link}).status_code, 403)
+
+
+class DeckListQueryTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user("lister", "lister@example.com", "pass1234")
+        self.other = CustomUser.objects.create_user("sharer", "sharer@example.com", "pass1234")
+        self.theme = DeckTheme.objects.create(name="Night", is_system_theme=True)
+        self.client.force_authenticate(self.user)
+
+    def add_decks(self, count, archived=False):
+        for _ in range(count):
+            n = Deck.objects.count() + 1
+            own = Deck.objects.create(
+                owner=self.user, title=f"Biology {n}", theme=self.theme, is_archived=archived
+            )
+            shared = Deck.objects.create(owner=self.other, title=f"Biology shared {n}", theme=self.theme)
+            DeckShare.objects.create(deck=shared, user=self.user, permission="edit")
+            DeckShare.objects.create(deck=own, user=self.other, permission="view")
+            for deck in (own, shared):
+                Flashcard.objects.bulk_create(
+                    Flashcard(deck=deck, question=f"Q{i}", answer=f"A{i}") for i in range(3)
+                )
+                Feedback.objects.create(deck=deck, user=self.other, rating=4)
+
+    def count_queries(self, url, params=None):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response, len(ctx)
+
+    def test_list_endpoints_query_count_does_not_depend_on_deck_count(self):
+        endpoints = [
+            (reverse("deck-list"), None, False),
+            (reverse("deck-archived-list"), None, True),
+            (reverse("search"), {"q": "biology"}, False),
+        ]
+        for url, params, archived in endpoints:
+            with self.subTest(url=url):
+                self.add_decks(2, archived=archived)
+                _, small = self.count_queries(url, params)
+                self.add_decks(6, archived=archived)
+                _, large = self.count_queries(url, params)
+                self.assertEqual(small, large)
+
+    def test_list_fields_match_per_deck_lookups(self):
+        self.add_decks(1)
+        response, _ = self.count_queries(reverse("deck-list"))
+        decks = {d["title"]: d for d in response.json()}
+
+        own, shared = decks["Biology 1"], decks["Biology shared 1"]
+        self.assertEqual((own["access_level"], own["can_edit"]), ("owner", True))
+        self.assertEqual((shared["access_level"], shared["can_edit"]), ("edit", True))
+        self.assertEqual(own["average_rating"], 4.0)
+        self.assertEqual(len(own["flashcards"]), 3)
+        self.assertEqual(own["shared_users"][0]["username"], "sharer")
+
+
+class QueryBudgetTests(QueryBudgetMixin, APITestCase):
+    """Each route stays within its entry in query_budgets.json on a realistic fixture."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user("budget", "budget@example.com", "pass1234")
+        self.other = CustomUser.objects.create_user("peer", "peer@example.com", "pass1234")
+        theme = DeckTheme.objects.create(name="Day", is_system_theme=True)
+        self.client.force_authenticate(self.user)
+
+        self.decks = []
+        for n in range(5):
+            own = Deck.objects.create(owner=self.user, title=f"Chemistry {n}", tags="science, lab", theme=theme)
+            shared = Deck.objects.create(owner=self.other, title=f"Chemistry shared {n}", theme=theme)
+            DeckShare.objects.create(deck=shared, user=self.user, permission="view")
+            DeckShare.objects.create(deck=own, user=self.other, permission="edit")
+            for deck in (own, shared):
+                Flashcard.objects.bulk_create(
+                    Flashcard(deck=deck, question=f"Q{i}", answer=f"A{i}") for i in range(20)
+                )
+                Feedback.objects.create(deck=deck, user=self.other, rating=3, comment="ok")
+            self.decks.append(own)
+        self.deck = self.decks[0]
+
+    def test_every_budgeted_route_exists(self):
+        route_names = get_resolver().reverse_dict
+        for route in load_query_budgets():
+            with self.subTest(route=route):
+                self.assertIn(route, route_names)
+
+    def test_deck_reads(self):
+        requests = [
+            ("deck-list", reverse("deck-list"), None),
+            ("deck-archived-list", reverse("deck-archived-list"), None),
+            ("search", reverse("search"), {"q": "chemistry"}),
+            ("tag-facets", reverse("tag-facets"), None),
+            ("deck-detail", reverse("deck-detail", args=[self.deck.id]), None),
+            ("flashcard-list", reverse("flashcard-list", args=[self.deck.id]), None),
+            ("review-due", reverse("review-due"), None),
+        ]
+        for route, url, params in requests:
+            with self.subTest(route=route), self.assertWithinQueryBudget(route):
+                response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+
+    def test_quiz_flow(self):
+        with self.assertWithinQueryBudget("quiz-start"):
+            response = self.client.post(
+                reverse("quiz-start", args=[self.deck.id]),
+                {"mode": "random", "adaptive_mode": True, "srs_enabled": True}, format="json"
+            )
+        self.assertEqual(response.status_code, 201)
+        session_id = response.json()["session"]["id"]
+
+        for _ in range(3):
+            with self.assertWithinQueryBudget("quiz-answer"):
+                response = self.client.post(reverse("quiz-answer", args=[session_id]), {"answer": "A1"}, format="json")
+            self.assertEqual(response.status_code, 200)
+
+    def test_share_page(self):
+        self.deck.enable_link_sharing()
+        url = reverse("deck-share-link", args=[self.deck.share_link])
+        for _ in range(2):
+            with self.assertWithinQueryBudget("deck-share-link"):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+
+    def test_bulk_share(self):
+        recipients = [
+            CustomUser(username=f"student{i}", email=f"student{i}@example.com") for i in range(30)
+        ]
+        CustomUser.objects.bulk_create(recipients)
+        payload = {"recipients": [{"username": u.username, "permission": "view"} for u in recipients]}
+        with self.assertWithinQueryBudget("deck-share"):
+            response = self.client.post(reverse("deck-share", args=[self.deck.id]), payload, format="json")
+        self.assertEqual(response.status_code, 200)
+
+
+class QueryStatsMiddlewareTests(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user("stats", "stats@example.com", "pass1234")
+        self.client.force_authenticate(self.user)
+
+    def test_reports_queries_in_headers_and_logs(self):
+        with patch("utils.querystats.QUERY_STATS_HEADERS", True), \
+                self.assertLogs("brainq.queries", level="DEBUG") as logs:
+            response = self.client.get(reverse("deck-list"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(int(response["X-Query-Count"]), 0)
+        self.assertIn("X-Query-Time-Ms", response)
+        self.assertEqual(response["X-Query-Budget"], str(load_query_budgets()["deck-list"]))
+        record = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(record["route"], "deck-list")
+        self.assertEqual(record["queries"], int(response["X-Query-Count"]))
+        self.assertFalse(record["over_budget"])
+
+    def test_over_budget_logs_a_warning(self):
+        with patch("utils.querystats.load_query_budgets", return_value={"deck-list": 0}), \
+                self.assertLogs("brainq.queries", level="WARNING") as logs:
+            self.client.get(reverse("deck-list"))
+        self.assertTrue(json.loads(logs.records[-1].getMessage())["over_budget"])
@@ -0,0 +1,164 @@
+"""
+Streaming flashcard import/export in CSV and JSONL.
+
+Uploads are decoded and parsed one line at a time, validated in batches of
+IMPORT_BATCH_SIZE rows and inserted with Flashcard.bulk_add, so memory is
+bounded by the batch size rather than the file. Invalid rows are skipped and
+reported by line number. Exports are streamed in keyset-paged chunks.
+"""
+import codecs
+import csv
+import json
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+
+from .models import Flashcard
+
+IMPORT_BATCH_SIZE = getattr(settings, "FLASHCARD_IMPORT_BATCH_SIZE", 1000)
+IMPORT_MAX_ROWS = getattr(settings, "FLASHCARD_IMPORT_MAX_ROWS", 50000)
+IMPORT_MAX_ERRORS = getattr(settings, "FLASHCARD_IMPORT_MAX_ERRORS", 100)
+EXPORT_CHUNK_SIZE = 2000
+
+FORMATS = ("csv", "jsonl")
+CONTENT_TYPES = {"csv": "text/csv; charset=utf-8", "jsonl": "application/x-ndjson"}
+EXPORT_FIELDS = ("question", "answer", "difficulty")
+DIFFICULTIES = {value for value, _ in Flashcard.DIFFICULTY_CHOICES}
+
+
+def clean_flashcard(row):
+    """(cleaned fields, None) for a valid raw row, else (None, {field: [messages]})."""
+    if not isinstance(row, dict):
+        return None, {"non_field_errors": ["Expected an object."]}
+
+    cleaned, errors = {}, {}
+    for field in ("question", "answer"):
+        value = row.get(field)
+        if value is None:
+            errors[field] = ["This field is required."]
+        elif not isinstance(value, str):
+            errors[field] = ["Not a valid string."]
+        elif not value.strip():
+            errors[field] = [f"{field.capitalize()} must not be empty."]
+        else:
+            cleaned[field] = value
+
+    difficulty = row.get("difficulty") or "medium"
+    if not isinstance(difficulty, str) or difficulty not in DIFFICULTIES:
+        errors["difficulty"] = [f'"{difficulty}" is not a valid choice.']
+    cleaned["difficulty"] = difficulty
+
+    return (None, errors) if errors else (cleaned, None)
+
+
+# ---------- Readers: yield (line number, row, parse error) ----------
+
+def _lines(upload):
+    # UploadedFile iterates line by line (keeping endings) without loading the file
+    return codecs.iterdecode(upload, "utf-8-sig")
+
+
+def read_csv(upload):
+    reader = csv.DictReader(_lines(upload))
+    missing = {"question", "answer"} - set(reader.fieldnames or ())
+    if missing:
+        raise ValidationError({"file": f"CSV header is missing: {', '.join(sorted(missing))}."})
+    for row in reader:
+        if None in row:
+            yield reader.line_num, None, {"non_field_errors": ["Too many columns."]}
+        else:
+            yield reader.line_num, row, None
+
+
+def read_jsonl(upload):
+    for number, line in enumerate(_lines(upload), start=1):
+        if not line.strip():
+            continue
+        try:
+            yield number, json.loads(line), None
+        except ValueError:
+            yield number, None, {"non_field_errors": ["Invalid JSON."]}
+
+
+READERS = {"csv": read_csv, "jsonl": read_jsonl}
+
+
+def import_flashcards(deck, upload, file_format):
+    """
+    Add every valid row of the upload to deck. All-or-nothing on file-level
+    problems (encoding, malformed CSV, too many rows); invalid rows are skipped.
+
+    Returns {"created": int, "failed": int, "errors": [{"line", "errors"}]},
+    with at most IMPORT_MAX_ERRORS errors listed.
+    """
+    rows = READERS[file_format](upload)
+    created = failed = 0
+    errors = []
+
+    try:
+        with transaction.atomic():
+            while True:
+                batch = list(islice(rows, IMPORT_BATCH_SIZE))
+                if not batch:
+                    break
+                if created + failed + len(batch) > IMPORT_MAX_ROWS:
+                    raise ValidationError({"file": f"Imports are limited to {IMPORT_MAX_ROWS} rows."})
+
+                flashcards = []
+                for line, row, error in batch:
+                    cleaned, error = (None, error) if error else clean_flashcard(row)
+                    if error:
+                        failed += 1
+                        if len(errors) < IMPORT_MAX_ERRORS:
+                            errors.append({"line": line, "errors": error})
+                    else:
+                        flashcards.append(Flashcard(**cleaned))
+                created += len(Flashcard.bulk_add(deck, flashcards))
+    except UnicodeDecodeError:
+        raise ValidationError({"file": "File must be UTF-8 encoded."})
+    except csv.Error as exc:
+        raise ValidationError({"file": f"Malformed CSV: {exc}"})
+
+    return {"created": created, "failed": failed, "errors": errors}
+
+
+# ---------- Export ----------
+
+class _Echo:
+    """File-like object whose write() hands the line back to the caller."""
+
+    def write(self, value):
+        return value
+
+
+def export_rows(deck):
+    """
+    The deck's cards in id order, EXPORT_CHUNK_SIZE rows per query. Keyset
+    chunks rather than .iterator(): MySQLdb buffers a whole result set.
+    """
+    queryset = Flashcard.objects.filter(deck=deck).order_by("id").values_list("id", *EXPORT_FIELDS)
+    last_id = 0
+    while True:
+        chunk = list(queryset.filter(id__gt=last_id)[:EXPORT_CHUNK_SIZE])
+        for row in chunk:
+            yield row[1:]
+        if len(chunk) < EXPORT_CHUNK_SIZE:
+            break
+        last_id = chunk[-1][0]
+
+
+def export_csv(deck):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in export_rows(deck):
+        yield writer.writerow(row)
+
+
+def export_jsonl(deck):
+    for row in export_rows(deck):
+        yield json.dumps(dict(zip(EXPORT_FIELDS, row)), ensure_ascii=False) + "\n"
+
+
+EXPORTERS = {"csv": export_csv, "jsonl": export_jsonl}
@@ -1,13 +1,19 @@
 # Django imports
+from django.conf import settings
 from django.shortcuts import render, get_object_or_404
 from django.views import View
 from django.db import IntegrityError, transaction
-from django.db.models import Q, Case, When, Value, IntegerField
+from django.db.models import Q, Case, When, Value, IntegerField, Count, Avg
+from django.core.cache import cache
 from django.utils import timezone
-from django.http import HttpResponseServerError
+from django.http import HttpResponse, HttpResponseNotModified, HttpResponseServerError, StreamingHttpResponse
+from django.template.loader import render_to_string
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date, parse_etags, parse_http_date_safe, quote_etag
 import logging
 
 # Python standard library
+import hashlib
 from random import sample, shuffle
 
 # DRF core
@@ -25,8 +31,26 @@ from users.models import CustomUser
 from .models import *
 from .serializers import *
 from .permissions import IsOwnerOrReadOnly
+from .caching import (
+    get_quiz_pack, get_deck_payload, get_share_page, invalidate_deck_payload, purge_share_page, set_share_page
+)
+from .pagination import KeysetPagination, RankedPagination
+from .search import get_search_backend
+from .sync import apply_offline_answers
+from .review_queue import accessible_deck_q, get_review_page, REVIEW_QUEUE_PAGE_SIZE, REVIEW_QUEUE_MAX_PAGE_SIZE
+from .anki import ANKI_MAX_UPLOAD_BYTES
+from .tasks import export_anki_deck, import_anki_deck
+from .transfer import (
+    CONTENT_TYPES as EXPORT_CONTENT_TYPES,
+    EXPORTERS,
+    FORMATS as TRANSFER_FORMATS,
+    clean_flashcard,
+    import_flashcards,
+)
 from achievements.models import Achievements
-from notifications.signals import deck_shared, access_revoked, deck_rated, deck_commented, achievement_earned
+from notifications.signals import (
+    deck_shared_bulk, access_revoked_bulk, deck_rated, deck_commented, achievement_earned
+)
 
 
 import json
@@ -83,15 +107,17 @@ class CreateDeckView(APIView):
                         theme_serializer.is_valid(raise_exception=True)
                         theme_serializer.save()
 
-                    # Create flashcards if provided
-                    flashcards_data = data.get('flashcards', [])
-                    for fc_data in flashcards_data:
-                        Flashcard.objects.create(
-                            deck=deck,
-                            question=fc_data['question'],
-                            answer=fc_data['answer'],
-                            difficulty=fc_data.get('difficulty', 'medium')
-                        )
+                    # Create flashcards if provided. JSON bodies were already handled by
+                    # DeckSerializer.create; multipart bodies carry them as a JSON string.
+                    if 'flashcards' not in serializer.validated_data:
+                        Flashcard.bulk_add(deck, [
+                            Flashcard(
+                                question=fc_data['question'],
+                                answer=fc_data['answer'],
+                                difficulty=fc_data.get('difficulty', 'medium')
+                            )
+                            for fc_data in data.get('flashcards', [])
+                        ])
 
                     # Achievements logic
                     achievements, _ = Achievements.objects.get_or_create(user=request.user)
@@ -142,38 +168,25 @@ class EditDeckView(APIView):
 
 
         # Restrict non-owner fields
-        allowed_fields_for_shared_users = ['title', 'description', 'tags', 'flashcards', 'cover_image', 'card_order']
+        allowed_fields_for_shared_users = [
+            'title', 'description', 'tags', 'flashcards', 'delete_missing', 'cover_image', 'card_order'
+        ]
         if deck.owner != request.user:
             data = {k: v for k, v in data.items() if k in allowed_fields_for_shared_users}
+        elif hasattr(data, 'dict'):
+            # Plain dict, so flashcards decoded from a multipart JSON string are validated as a list
+            data = data.dict()
 
         # Handle cover_image removal
         if 'cover_image' in data and data['cover_image'] is None:
             deck.cover_image.delete(save=False)
             data.pop('cover_image')
 
-        # Update deck via serializer
+        # Update deck and diff-apply its flashcards in one transaction
         deck_serializer = DeckSerializer(deck, data=data, context={'request': request}, partial=True)
         deck_serializer.is_valid(raise_exception=True)
         deck = deck_serializer.save()
 
-        # Update flashcards if provided
-        flashcards_data = data.get('flashcards', [])
-        existing_ids = [fc.id for fc in deck.flashcards.all()]
-        with transaction.atomic():
-            for fc_data in flashcards_data:
-                fc_id = fc_data.get('id')
-                if fc_id and fc_id in existing_ids:
-                    # Update existing flashcard
-                    fc_instance = Flashcard.objects.get(id=fc_id, deck=deck)
-                    fc_serializer = FlashcardSerializer(fc_instance, data=fc_data, partial=True, context={'request': request})
-                    fc_serializer.is_valid(raise_exception=True)
-                    fc_serializer.save()
-                else:
-                    # Create new flashcard
-                    fc_serializer = FlashcardSerializer(data={**fc_data, "deck": deck.id}, context={'request': request})
-                    fc_serializer.is_valid(raise_exception=True)
-                    fc_serializer.save()
-
         return Response(DeckSerializer(deck, context={'request': request}).data, status=200)
 # -------------------------
 # Customize Deck Theme
@@ -372,30 +385,122 @@ class CreateFlashcardView(APIView):
                 status=status.HTTP_403_FORBIDDEN
             )
 
-        created_flashcards = []
+        # Validate everything first so the insert is all-or-nothing
+        new_flashcards = []
+        for fc_data in flashcards_data:
+            cleaned, errors = clean_flashcard(fc_data)
+            if errors:
+                raise serializers.ValidationError(errors)
+            new_flashcards.append(Flashcard(question=cleaned['question'], answer=cleaned['answer']))
 
-        # Wrap in a transaction so all-or-nothing
-        with transaction.atomic():
-            for fc_data in flashcards_data:
-                serializer = FlashcardSerializer(data={**fc_data, "deck": deck.id})
-                if serializer.is_valid():
-                    flashcard = Flashcard.objects.create(
-                        deck=deck,
-                        question=serializer.validated_data['question'],
-                        answer=serializer.validated_data['answer']
-                    )
-                    created_flashcards.append({
-                        "id": flashcard.id,
-                        "deck": deck.id,
-                        "question": flashcard.question,
-                        "answer": flashcard.answer
-                    })
-                else:
-                    # Raise validation error and rollback all creations
-                    raise serializers.ValidationError(serializer.errors)
+        created_flashcards = [
+            {
+                "id": flashcard.id,
+                "deck": deck.id,
+                "question": flashcard.question,
+                "answer": flashcard.answer
+            }
+            for flashcard in Flashcard.bulk_add(deck, new_flashcards)
+        ]
 
         return Response({"flashcards": created_flashcards}, status=status.HTTP_201_CREATED)
 
+
+# -------------------------
+# Import / Export Flashcards
+# -------------------------
+class DeckImportView(APIView):
+    """
+    POST a multipart `file` (.csv with a question,answer[,difficulty] header,
+    or .jsonl with one object per line). Valid rows are added to the deck;
+    invalid ones are reported by line.
+    """
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+    parser_classes = [MultiPartParser]
+
+    def post(self, request, pk):
+        deck = get_object_or_404(Deck, pk=pk, owner=request.user)
+        if deck.is_archived:
+            return Response({"detail": "Cannot add flashcards to an archived deck."}, status=status.HTTP_403_FORBIDDEN)
+
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({"detail": "'file' is required."}, status=status.HTTP_400_BAD_REQUEST)
+
+        file_format = request.data.get('type') or upload.name.rsplit('.', 1)[-1].lower()
+        if file_format not in TRANSFER_FORMATS:
+            return Response(
+                {"detail": f"Unsupported file type; use one of: {', '.join(TRANSFER_FORMATS)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        report = import_flashcards(deck, upload, file_format)
+        return Response(report, status=status.HTTP_201_CREATED if report["created"] else status.HTTP_200_OK)
+
+
+class DeckExportView(APIView):
+    """GET ?type=csv|jsonl; streamed so large decks export in constant memory."""
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        deck = get_object_or_404(Deck.objects.filter(accessible_deck_q(request.user)), pk=pk)
+        file_format = request.query_params.get('type', 'csv')
+        if file_format not in TRANSFER_FORMATS:
+            return Response(
+                {"detail": f"Unsupported type; use one of: {', '.join(TRANSFER_FORMATS)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        response = StreamingHttpResponse(EXPORTERS[file_format](deck), content_type=EXPORT_CONTENT_TYPES[file_format])
+        response['Content-Disposition'] = f'attachment; filename="deck-{deck.pk}.{file_format}"'
+        return response
+
+class AnkiImportView(APIView):
+    """POST a multipart `file` (.apkg) and optional `title`; the deck is built by a Celery job."""
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+    parser_classes = [MultiPartParser]
+
+    def post(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({"detail": "'file' is required."}, status=status.HTTP_400_BAD_REQUEST)
+        if upload.size > ANKI_MAX_UPLOAD_BYTES:
+            return Response({"detail": "File is too large."}, status=status.HTTP_400_BAD_REQUEST)
+
+        job = DeckTransferJob.objects.create(
+            user=request.user,
+            kind="anki_import",
+            source_file=upload,
+            title=(request.data.get('title') or '').strip()[:120],
+        )
+        transaction.on_commit(lambda: import_anki_deck.delay(job.id))
+        return Response(DeckTransferJobSerializer(job, context={'request': request}).data, status=status.HTTP_202_ACCEPTED)
+
+
+class AnkiExportView(APIView):
+    """POST to queue an .apkg export of a deck the user can access."""
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, pk):
+        deck = get_object_or_404(Deck.objects.filter(accessible_deck_q(request.user)), pk=pk)
+        job = DeckTransferJob.objects.create(user=request.user, deck=deck, kind="anki_export")
+        transaction.on_commit(lambda: export_anki_deck.delay(job.id))
+        return Response(DeckTransferJobSerializer(job, context={'request': request}).data, status=status.HTTP_202_ACCEPTED)
+
+
+class DeckTransferJobDetailView(APIView):
+    """Poll an import/export job; finished exports carry result_file_url."""
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        job = get_object_or_404(DeckTransferJob, pk=pk, user=request.user)
+        return Response(DeckTransferJobSerializer(job, context={'request': request}).data)
+
 # -------------------------
 # Delete a Flashcard
 # -------------------------
@@ -443,6 +548,7 @@ class ToggleArchiveDeckView(APIView):
             )
 
         if not deck.is_archived:  # Archiving
+            purge_share_page(deck.share_link)
             deck.was_public = deck.is_public  # store current public status
             deck.is_public = False  # hide from everyone
             deck.is_archived = True
@@ -473,13 +579,12 @@ class DeckDetailView(APIView):
     permission_classes = [permissions.AllowAny]
 
     def get(self, request, pk):
-        deck = get_object_or_404(Deck, pk=pk)
         user = request.user if request.user.is_authenticated else None
+        deck = get_object_or_404(DeckSerializer.annotate_access(Deck.objects.all(), user), pk=pk)
 
         # Owner or admin always has full access
-        if user and (deck.owner == user or getattr(user, "is_admin", False)):
-            serializer = DeckSerializer(deck, context={'request': request})
-            return Response(serializer.data)
+        if user and (deck.owner_id == user.id or getattr(user, "is_admin", False)):
+            return self.deck_response(request, deck)
 
         # Hide deck if admin_hidden
         if deck.admin_hidden:
@@ -487,24 +592,24 @@ class DeckDetailView(APIView):
 
         # Public decks that are not archived
         if deck.is_public and not deck.is_archived:
-            serializer = DeckSerializer(deck, context={'request': request})
-            return Response(serializer.data)
+            return self.deck_response(request, deck)
 
         # Shared users
-        if user:
-            share_entry = deck.shared_with.filter(user=user).first()
-            if share_entry:
-                serializer = DeckSerializer(deck, context={'request': request})
-                return Response(serializer.data)
+        if user and deck.share_permission:
+            return self.deck_response(request, deck)
 
         # Link access
         share_link = request.query_params.get("share_link")
         if share_link and str(deck.share_link) == share_link:
-            serializer = DeckSerializer(deck, context={'request': request})
-            return Response(serializer.data)
+            return self.deck_response(request, deck)
 
         return Response({"detail": "Not authorized"}, status=403)
 
+    def deck_response(self, request, deck):
+        # Validators are checked before anything is serialized or any flashcard is read
+        serializer = DeckSerializer(deck, context={'request': request})
+        etag, last_modified = deck_validators(deck, serializer.get_access_level(deck), serializer.get_can_edit(deck))
+        return conditional_response(request, etag, last_modified, lambda: Response(get_deck_payload(deck, request)))
 
 
 # -------------------------
@@ -522,13 +627,22 @@ class DeckListView(APIView):
                 Q(owner=user) | 
                 ((Q(is_public=True) | Q(shared_with__user=user)) & Q(admin_hidden=False)),
                 is_archived=False
-            ).select_related('owner').distinct()
+            ).distinct()
         else:
             decks = Deck.objects.filter(
                 is_public=True,
                 is_archived=False,
                 admin_hidden=False
-            ).select_related('owner')
+            )
+        decks = filter_by_tags(decks, request)
+        decks = DeckSerializer.setup_eager_loading(decks, user)
+
+        # Opt-in keyset pagination (?limit / ?cursor)
+        paginator = KeysetPagination()
+        page = paginator.paginate_queryset(decks, request, view=self)
+        if page is not None:
+            serializer = DeckSerializer(page, many=True, context={'request': request})
+            return paginator.get_paginated_response(serializer.data)
 
         serializer = DeckSerializer(decks, many=True, context={'request': request})
         return Response(serializer.data)
@@ -551,56 +665,48 @@ class DeckSharePageView(View):
             logger.error(f"Invalid UUID format for share link: {share_link}")
             return render(request, "deck_share_denied.html", status=404)
 
-        # Fetch deck
-        deck = get_object_or_404(
-            Deck.objects.prefetch_related("flashcards", "feedbacks"),
-            share_link=share_uuid,
-            is_archived=False
-        )
-
-        logger.info(
-            f"Deck {deck.title}: is_public={deck.is_public}, is_link_shared={deck.is_link_shared}"
-        )
+        # Served from the cache until the deck changes or the link is revoked
+        origin = f"{request.scheme}://{request.get_host()}"
+        page = get_share_page(share_uuid, origin)
+        if page is None:
+            deck = get_object_or_404(Deck, share_link=share_uuid, is_archived=False)
 
-        # ONLY allow access if link sharing is enabled
-        if not deck.is_link_shared:
-            logger.warning(
-                f"Blocked disabled share link access attempt: {share_link} from {request.META.get('REMOTE_ADDR')}"
+            logger.info(
+                f"Deck {deck.title}: is_public={deck.is_public}, is_link_shared={deck.is_link_shared}"
             )
-            return render(request, "deck_share_denied.html", status=403)
-
-        # Flashcards
-        flashcards = deck.flashcards.all()
-
-        # Tags
-        tags = [t.strip() for t in deck.tags.split(',')] if deck.tags else []
-
-        # Feedbacks and average rating
-        feedbacks = deck.feedbacks.all()
-        avg_rating = round(
-            sum(f.rating for f in feedbacks) / feedbacks.count(), 2
-        ) if feedbacks.exists() else None
 
-        # Build full share URL
-        share_url = request.build_absolute_uri(
-            f"/decks/share/{deck.share_link}/"
-        )
-
-        context = {
-            "deck": deck,
-            "flashcards": flashcards,
-            "tags": tags,
-            "feedbacks": feedbacks,
-            "avg_rating": avg_rating,
-            "share_url": share_url,
-            "app_download_url": "javascript:void(0);",
-        }
+            # ONLY allow access if link sharing is enabled
+            if not deck.is_link_shared:
+                logger.warning(
+                    f"Blocked disabled share link access attempt: {share_link} from {request.META.get('REMOTE_ADDR')}"
+                )
+                return render(request, "deck_share_denied.html", status=403)
+
+            # Tags
+            tags = [t.strip() for t in deck.tags.split(',')] if deck.tags else []
+
+            # Feedbacks and average rating
+            feedbacks = list(deck.feedbacks.select_related("user"))
+            avg_rating = deck.feedbacks.aggregate(avg=Avg("rating"))["avg"]
+
+            context = {
+                "deck": deck,
+                "flashcards": list(deck.flashcards.all()),
+                "tags": tags,
+                "feedbacks": feedbacks,
+                "avg_rating": round(avg_rating, 2) if avg_rating is not None else None,
+                "share_url": f"{origin}/decks/share/{deck.share_link}/",
+                "app_download_url": "javascript:void(0);",
+            }
+            page = set_share_page(deck.id, share_uuid, origin, render_to_string("deck_share.html", context))
 
-        # Prevent browser cache from keeping disabled pages alive
-        response = render(request, "deck_share.html", context)
-        response["Cache-Control"] = "no-store, no-cache, must-revalidate, max-age=0"
-        response["Pragma"] = "no-cache"
-        response["Expires"] = "0"
+        # no-cache: browsers and proxies must revalidate, so a revoked link stops working at once
+        if validators_match(request, page["etag"]):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(page["html"])
+        response["ETag"] = page["etag"]
+        response["Cache-Control"] = "no-cache"
         return response
 
 
@@ -626,43 +732,58 @@ class ShareDeckView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        created_shares = []
+        # Validate, keeping the last entry per username
+        requested = {}
         errors = []
+        for r in recipients:
+            username = r.get("username") if isinstance(r, dict) else None
+            permission = r.get("permission", "view") if isinstance(r, dict) else None
+            if permission not in ["view", "edit"]:
+                errors.append(f"Invalid permission for {username}.")
+                continue
+            requested[username] = permission
 
-        with transaction.atomic():
-            for r in recipients:
-                username = r.get("username")
-                permission = r.get("permission", "view")
-                if permission not in ["view", "edit"]:
-                    errors.append(f"Invalid permission for {username}.")
-                    continue
+        users = {u.username: u for u in CustomUser.objects.filter(username__in=requested)}
+        errors += [f"User {username} not found." for username in requested if username not in users]
+        permissions_by_user = {users[name].id: permission for name, permission in requested.items() if name in users}
 
-                try:
-                    user = CustomUser.objects.get(username=username)
-                    share, created = DeckShare.objects.update_or_create(
-                        deck=deck,
-                        user=user,
-                        defaults={"permission": permission}
-                    )
+        with transaction.atomic():
+            existing = dict(
+                DeckShare.objects.filter(deck=deck, user_id__in=permissions_by_user).values_list("user_id", "permission")
+            )
+            new_user_ids = [user_id for user_id in permissions_by_user if user_id not in existing]
+            DeckShare.objects.bulk_create(
+                [DeckShare(deck=deck, user_id=user_id, permission=permissions_by_user[user_id]) for user_id in new_user_ids],
+                ignore_conflicts=True
+            )
+            # At most one UPDATE per permission level
+            for permission in ["view", "edit"]:
+                changed = [
+                    user_id for user_id, current in existing.items()
+                    if current != permission and permissions_by_user[user_id] == permission
+                ]
+                if changed:
+                    DeckShare.objects.filter(deck=deck, user_id__in=changed).update(permission=permission)
+
+            if new_user_ids or any(existing[user_id] != permissions_by_user[user_id] for user_id in existing):
+                # Bulk writes send no signals (see decks.signals)
+                Deck.touch_content(deck.id)
+                invalidate_deck_payload(deck.id)
 
-                    # -----------------------------
-                    # Trigger notification only for new shares
-                    # -----------------------------
-                    if created:
-                        deck_shared.send(
-                            sender=self.__class__,
-                            recipient=user,          # who gets access
-                            actor=request.user,      # who shared
-                            deck=deck
-                        )
-
-                    created_shares.append({
-                        "username": user.username,
-                        "permission": share.permission
-                    })
-                except CustomUser.DoesNotExist:
-                    errors.append(f"User {username} not found.")
+            # -----------------------------
+            # Notify only new shares, in one background fan-out
+            # -----------------------------
+            deck_shared_bulk.send(
+                sender=self.__class__,
+                recipients=[user for user in users.values() if user.id in new_user_ids],
+                actor=request.user,
+                deck=deck
+            )
 
+        created_shares = [
+            {"username": username, "permission": permission}
+            for username, permission in requested.items() if username in users
+        ]
         response = {"shared": created_shares}
         if errors:
             response["errors"] = errors
@@ -693,28 +814,26 @@ class RevokeDeckShareView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        revoked = []
+        with transaction.atomic():
+            shares = DeckShare.objects.filter(deck=deck, user__username__in=usernames)
+            recipients = list(CustomUser.objects.filter(pk__in=shares.values("user_id")))
+            shares.delete()
+            # The per-share receivers skip queryset deletes; refresh the deck once
+            invalidate_deck_payload(deck.pk)
+            Deck.touch_content(deck.pk)
 
-        for username in usernames:
-            try:
-                user = CustomUser.objects.get(username=username)
-                share_qs = DeckShare.objects.filter(deck=deck, user=user)
-                if share_qs.exists():
-                    share_qs.delete()
-                    revoked.append(username)
-
-                    # -----------------------------
-                    # Trigger access_revoked notification
-                    # -----------------------------
-                    access_revoked.send(
-                        sender=self.__class__,
-                        recipient=user,       # user who lost access
-                        actor=request.user,   # who revoked access
-                        deck=deck
-                    )
-            except CustomUser.DoesNotExist:
-                continue
+            # -----------------------------
+            # Trigger access_revoked notifications in one background fan-out
+            # -----------------------------
+            access_revoked_bulk.send(
+                sender=self.__class__,
+                recipients=recipients,
+                actor=request.user,
+                deck=deck
+            )
 
+        revoked_names = {user.username for user in recipients}
+        revoked = [username for username in dict.fromkeys(usernames) if username in revoked_names]
         return Response({"revoked": revoked}, status=status.HTTP_200_OK)
 
 
@@ -989,8 +1108,15 @@ class ArchivedDeckListView(APIView):
 
     def get(self, request):
         user = request.user
-        decks = Deck.objects.filter(owner=user, is_archived=True).select_related('owner')
-        serializer = DeckSerializer(decks, many=True)
+        decks = DeckSerializer.setup_eager_loading(Deck.objects.filter(owner=user, is_archived=True), user)
+
+        paginator = KeysetPagination()
+        page = paginator.paginate_queryset(decks, request, view=self)
+        if page is not None:
+            serializer = DeckSerializer(page, many=True, context={'request': request})
+            return paginator.get_paginated_response(serializer.data)
+
+        serializer = DeckSerializer(decks, many=True, context={'request': request})
         return Response(serializer.data)
 
 
@@ -1003,46 +1129,129 @@ class FlashcardListView(APIView):
     permission_classes = [permissions.AllowAny]
 
     def get(self, request, deck_id):
-        deck = get_object_or_404(Deck, pk=deck_id)
+        deck = get_object_or_404(Deck.objects.select_related('theme'), pk=deck_id)
         user = request.user if request.user.is_authenticated else None
+        is_owner = bool(user and deck.owner_id == user.id)
+        is_admin = bool(user and getattr(user, "is_admin", False))
 
         # Admin or owner can see even if hidden
-        if deck.admin_hidden and not (user and (deck.owner == user or getattr(user, "is_admin", False))):
+        if deck.admin_hidden and not (is_owner or is_admin):
             return Response({"detail": "Not authorized"}, status=403)
 
-        if deck.is_public or (user and deck.owner == user) or (user and getattr(user, "is_admin", False)):
-
-            flashcards = list(
-                Flashcard.objects.filter(deck=deck).order_by('-created_at')
-            )
+        if deck.is_public or is_owner or is_admin:
 
-            # Shuffle if requested
+            # Shuffled responses differ on every call, so they get no validators
             shuffle_param = request.query_params.get("shuffle", "false").lower()
             if shuffle_param in ["true", "1", "yes", "on"]:
-                shuffle(flashcards)
+                return self.flashcard_response(request, deck, shuffled=True)
 
-            serializer = FlashcardSerializer(flashcards, many=True)
-            return Response(serializer.data)
+            access_level = 'owner' if is_owner else 'admin' if is_admin else 'public'
+            etag, last_modified = deck_validators(deck, access_level, sorted(request.query_params.lists()))
+            return conditional_response(
+                request, etag, last_modified, lambda: self.flashcard_response(request, deck)
+            )
 
         return Response(
             {"detail": "Not authorized to view flashcards for this deck."},
             status=403
         )
 
+    def flashcard_response(self, request, deck, shuffled=False):
+        paginator = KeysetPagination()
+        queryset = Flashcard.objects.filter(deck=deck)
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        flashcards = page if page is not None else list(queryset.order_by('-created_at'))
+
+        # Shuffle if requested (within the page when paginated)
+        if shuffled:
+            shuffle(flashcards)
+
+        serializer = FlashcardSerializer(flashcards, many=True)
+        if page is not None:
+            return paginator.get_paginated_response(serializer.data)
+        return Response(serializer.data)
+
 
 
 # ---------- Helpers ----------
-def get_flashcard_options(flashcard, deck):
-    all_answers = list(deck.flashcards.exclude(id=flashcard.id).values_list('answer', flat=True))
-    if len(all_answers) < 3:
-        distractors = (all_answers * 3)[:3]
-    else:
-        from random import sample
-        distractors = sample(all_answers, 3)
-    options = distractors + [flashcard.answer]
-    from random import shuffle
-    shuffle(options)
-    return options
+def deck_validators(deck, *variant):
+    """
+    Strong ETag and Last-Modified for a deck payload, computed from the deck
+    row alone: its fields (incl. content_updated_at, bumped on card, share and
+    rating changes), the theme's updated_at and the caller-specific `variant`.
+    """
+    theme_updated_at = deck.theme.updated_at if deck.theme_id else None
+    row = [getattr(deck, field.attname) for field in deck._meta.concrete_fields]
+    digest = hashlib.sha1(repr((row, theme_updated_at, variant)).encode()).hexdigest()
+    last_modified = max(t for t in (deck.updated_at, deck.content_updated_at, theme_updated_at) if t)
+    return quote_etag(digest), last_modified
+
+
+def validators_match(request, etag, last_modified=None):
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match:
+        # Weak comparison, as RFC 9110 requires for If-None-Match
+        tags = [tag.removeprefix("W/") for tag in parse_etags(if_none_match)]
+        return "*" in tags or etag in tags
+    if last_modified is None:
+        return False
+    since = parse_http_date_safe(request.headers.get("If-Modified-Since") or "")
+    return since is not None and int(last_modified.timestamp()) <= since
+
+
+def conditional_response(request, etag, last_modified, build):
+    """304 if the client's validators match, else build(); both carry the validators."""
+    response = Response(status=304) if validators_match(request, etag, last_modified) else build()
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified.timestamp())
+    response["Cache-Control"] = "private, no-cache"
+    patch_vary_headers(response, ["Authorization"])
+    return response
+
+
+def filter_by_tags(decks, request):
+    """Decks carrying every ?tag= given (normalized, indexed DeckTag lookups)."""
+    for name in parse_tags(",".join(request.query_params.getlist("tag"))):
+        decks = decks.filter(deck_tags__tag__name=name)
+    return decks
+
+
+def get_quiz_card(pack, flashcard_id):
+    """Question and multiple-choice options for a card, served from the deck's quiz pack."""
+    if not flashcard_id or flashcard_id not in pack:
+        return None, []
+    return pack.question(flashcard_id), pack.options(flashcard_id)
+
+
+QUIZ_PREFETCH_MAX = getattr(settings, "QUIZ_PREFETCH_MAX", 5)
+
+
+def get_prefetch_count(request):
+    """Optional ?prefetch=N (or body field), capped at QUIZ_PREFETCH_MAX."""
+    raw = request.data.get("prefetch", request.query_params.get("prefetch"))
+    try:
+        count = int(raw) if raw is not None else 0
+    except (ValueError, TypeError):
+        count = 0
+    return max(0, min(count, QUIZ_PREFETCH_MAX))
+
+
+def get_prefetched_cards(session, pack, count):
+    """The next `count` cards after the current one, with their options."""
+    cards = []
+    if not count:
+        return cards
+    for fid in session.reserve_upcoming(count):
+        question, options = get_quiz_card(pack, fid)
+        if question is not None:
+            cards.append({"flashcard_id": fid, "question": question, "options": options})
+    return cards
+
+
+def get_live_session(request, session_id):
+    """The user's quiz session with any cached live state applied."""
+    session = get_object_or_404(QuizSession, pk=session_id, user=request.user)
+    return session.load_live_state()
 
 
 def get_next_flashcard_by_mode(session):
@@ -1082,38 +1291,36 @@ class StartQuizSessionView(APIView):
             time_per_card=time_per_card if mode == "timed" else None,
         )
 
-        # Pre-create performance entries for all flashcards
-        for fc in deck.flashcards.all():
-            FlashcardPerformance.objects.get_or_create(user=request.user, flashcard=fc)
+        # Pre-create missing performance entries for all flashcards (single insert)
+        pack = get_quiz_pack(deck.id)
+        FlashcardPerformance.objects.bulk_create(
+            [FlashcardPerformance(user=request.user, flashcard_id=fid) for fid in pack.ids],
+            ignore_conflicts=True,
+        )
 
         # ---------------- Adaptive first card selection ----------------
         if session.adaptive_mode:
-            first_id = session.select_next_flashcard()
-            if first_id:
-                session.order = [first_id]
-                session.current_index = 0
-                session.save()
-                QuizSessionFlashcard.objects.get_or_create(session=session, flashcard_id=first_id)
+            session.select_next_flashcard()
         else:
             # Non-adaptive → full order
             session.initialize_order()
-            for fid in session.order:
-                QuizSessionFlashcard.objects.get_or_create(session=session, flashcard_id=fid)
+
+        # Attempt rows for every card already placed in order
+        QuizSessionFlashcard.objects.bulk_create(
+            [QuizSessionFlashcard(session=session, flashcard_id=fid) for fid in session.order]
+        )
 
         # Return first flashcard data
         first_id = session.get_current_flashcard_id()
-        if first_id:
-            fc = Flashcard.objects.get(id=first_id)
-            question = fc.question
-            options = get_flashcard_options(fc, deck)
-        else:
-            question, options = None, []
+        question, options = get_quiz_card(pack, first_id)
+
+        data = {"question": question, "options": options}
+        prefetch = get_prefetch_count(request)
+        if prefetch:
+            data["prefetch"] = get_prefetched_cards(session, pack, prefetch)
 
         serializer = QuizSessionSerializer(session)
-        return Response(
-            {"session": serializer.data, "question": question, "options": options},
-            status=201,
-        )
+        return Response({"session": serializer.data, **data}, status=201)
 
 
 # ============================================
@@ -1125,7 +1332,7 @@ class QuizSessionAnswerView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request, session_id):
-        session = get_object_or_404(QuizSession, pk=session_id, user=request.user)
+        session = get_live_session(request, session_id)
 
         # 🔒 NEW: Block answering while paused
         if session.is_paused:
@@ -1138,14 +1345,18 @@ class QuizSessionAnswerView(APIView):
         if current_id is None:
             return Response({"detail": "No more flashcards."}, status=400)
 
+        pack = get_quiz_pack(session.deck_id)
+        if current_id not in pack:
+            return Response({"detail": "Flashcard no longer exists."}, status=400)
+
         attempt, _ = QuizSessionFlashcard.objects.get_or_create(
             session=session,
             flashcard_id=current_id
         )
-        flashcard = attempt.flashcard
+        correct_answer = pack.answer(current_id)
 
         selected_answer = request.data.get("answer", "").strip()
-        correct = bool(selected_answer == str(flashcard.answer))
+        correct = bool(selected_answer == str(correct_answer))
 
         rt_raw = request.data.get("response_time")
         try:
@@ -1160,30 +1371,31 @@ class QuizSessionAnswerView(APIView):
         if correct:
             session.correct_count += 1
         session.increment_index()
-        session.save()
 
         next_id = session.get_current_flashcard_id()
         if next_id:
             QuizSessionFlashcard.objects.get_or_create(session=session, flashcard_id=next_id)
-            fc = Flashcard.objects.get(id=next_id)
-            next_question = fc.question
-            next_options = get_flashcard_options(fc, session.deck)
+            next_question, next_options = get_quiz_card(pack, next_id)
         else:
-            from django.utils import timezone
-            session.finished_at = timezone.now()
-            session.save()
+            if not session.finished_at:
+                session.finished_at = timezone.now()
+                session.save_live_state()
             next_question, next_options = None, []
 
-        feedback = "Correct!" if correct else f"Incorrect. Correct answer: {flashcard.answer}"
+        feedback = "Correct!" if correct else f"Incorrect. Correct answer: {correct_answer}"
 
-        return Response({
+        data = {
             "correct": correct,
             "feedback": feedback,
             "accuracy": session.accuracy(),
             "next_question": next_question,
             "next_options": next_options,
             "time_per_card": session.time_per_card,
-        })
+        }
+        prefetch = get_prefetch_count(request)
+        if prefetch:
+            data["prefetch"] = get_prefetched_cards(session, pack, prefetch) if next_id else []
+        return Response(data)
 
 
 class FinishQuizSessionView(APIView):
@@ -1191,9 +1403,9 @@ class FinishQuizSessionView(APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request, session_id):
-        session = get_object_or_404(QuizSession, pk=session_id, user=request.user)
+        session = get_live_session(request, session_id)
         session.finished_at = timezone.now()
-        session.save()
+        session.save_live_state(flush=True)
 
         # Update achievements
         achievements, _ = Achievements.objects.get_or_create(user=request.user)
@@ -1236,7 +1448,7 @@ class QuizSessionResultsView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request, session_id):
-        session = get_object_or_404(QuizSession, pk=session_id, user=request.user)
+        session = get_live_session(request, session_id)
         serializer = QuizSessionSerializer(session)
         return Response({
             'correct_count': session.correct_count,
@@ -1253,9 +1465,9 @@ class PauseQuizSessionView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request, session_id):
-        session = get_object_or_404(QuizSession, pk=session_id, user=request.user)
+        session = get_live_session(request, session_id)
         session.is_paused = True
-        session.save()
+        session.save_live_state(flush=True)
         return Response({'detail': 'Session paused.'})
 
 
@@ -1264,17 +1476,13 @@ class ResumeQuizSessionView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request, session_id):
-        session = get_object_or_404(QuizSession, pk=session_id, user=request.user)
+        session = get_live_session(request, session_id)
         session.is_paused = False
-        session.save()
+        session.save_live_state()
 
         # Return current flashcard
         flashcard_id = session.get_current_flashcard_id()
-        question, options = None, []
-        if flashcard_id:
-            flashcard = Flashcard.objects.get(id=flashcard_id)
-            question = flashcard.question
-            options = get_flashcard_options(flashcard, session.deck)
+        question, options = get_quiz_card(get_quiz_pack(session.deck_id), flashcard_id)
 
         return Response({'detail': 'Session resumed.', 'question': question, 'options': options})
 
@@ -1287,7 +1495,7 @@ class SkipQuizFlashcardView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request, session_id):
-        session = get_object_or_404(QuizSession, pk=session_id, user=request.user)
+        session = get_live_session(request, session_id)
 
         if session.is_paused:
             return Response({'detail': 'Session is paused. Resume before skipping.'}, status=400)
@@ -1317,23 +1525,27 @@ class SkipQuizFlashcardView(APIView):
 
         next_flashcard_id = session.get_current_flashcard_id()
         if not next_flashcard_id:
-            session.finished_at = timezone.now()
-            session.save()
+            if not session.finished_at:
+                session.finished_at = timezone.now()
+                session.save_live_state()
             return Response({
                 'detail': 'Flashcard skipped.',
                 'next_question': None,
                 'next_options': []
             })
 
-        next_flashcard = Flashcard.objects.get(id=next_flashcard_id)
-        next_question = next_flashcard.question
-        next_options = get_flashcard_options(next_flashcard, session.deck)
+        pack = get_quiz_pack(session.deck_id)
+        next_question, next_options = get_quiz_card(pack, next_flashcard_id)
 
-        return Response({
+        data = {
             'detail': 'Flashcard skipped.',
             'next_question': next_question,
             'next_options': next_options
-        })
+        }
+        prefetch = get_prefetch_count(request)
+        if prefetch:
+            data['prefetch'] = get_prefetched_cards(session, pack, prefetch)
+        return Response(data)
 
 
 
@@ -1346,25 +1558,120 @@ class ChangeQuizModeView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request, session_id):
-        session = get_object_or_404(QuizSession, pk=session_id, user=request.user)
+        session = get_live_session(request, session_id)
         new_mode = request.data.get('mode')
         if new_mode not in ['random', 'sequential', 'timed']:
             return Response({'detail': 'Invalid mode.'}, status=400)
 
         session.mode = new_mode
+        session.save(update_fields=['mode'])
         session.initialize_order()
-        session.save()
 
         # Return current flashcard
         flashcard_id = session.get_current_flashcard_id()
-        question, options = None, []
-        if flashcard_id:
-            flashcard = Flashcard.objects.get(id=flashcard_id)
-            question = flashcard.question
-            options = get_flashcard_options(flashcard, session.deck)
+        question, options = get_quiz_card(get_quiz_pack(session.deck_id), flashcard_id)
 
         return Response({'detail': f'Mode changed to {new_mode}.', 'question': question, 'options': options})
-    
+
+
+# ============================================
+# Sync Offline Answers
+# ============================================
+
+class SyncQuizAnswersView(APIView):
+    """Apply a batch of answers recorded offline, in answered_at order."""
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        serializer = QuizSyncSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        results, sessions = apply_offline_answers(request.user, serializer.validated_data['answers'])
+
+        return Response({
+            'results': results,
+            'sessions': [
+                {
+                    'id': session.id,
+                    'current_index': session.current_index,
+                    'correct_count': session.correct_count,
+                    'total_answered': session.total_answered,
+                    'accuracy': session.accuracy(),
+                    'finished': session.finished_at is not None,
+                }
+                for session in sessions
+            ],
+        })
+
+
+# ============================================
+# Review Queue (due today, across decks)
+# ============================================
+
+class ReviewQueueView(APIView):
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        try:
+            limit = int(request.query_params.get('limit', REVIEW_QUEUE_PAGE_SIZE))
+        except (TypeError, ValueError):
+            return Response({'detail': 'limit must be an integer.'}, status=400)
+        limit = max(1, min(limit, REVIEW_QUEUE_MAX_PAGE_SIZE))
+
+        try:
+            page = get_review_page(request.user, cursor=request.query_params.get('cursor'), limit=limit)
+        except ValueError:
+            return Response({'detail': 'Invalid cursor.'}, status=400)
+        return Response(page)
+
+
+# ============================================
+# Tag Facets (public catalog)
+# ============================================
+
+TAG_FACETS_TTL = getattr(settings, "TAG_FACETS_TTL", 60 * 5)
+
+
+class TagFacetsView(APIView):
+    """Tag counts over public decks, optionally narrowed by ?tag= selections."""
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request):
+        selected = parse_tags(",".join(request.query_params.getlist("tag")))
+        try:
+            limit = max(1, min(int(request.query_params.get("limit", 50)), 200))
+        except ValueError:
+            return Response({"detail": "limit must be an integer."}, status=400)
+
+        digest = hashlib.md5(",".join(sorted(selected)).encode()).hexdigest()
+        key = f"tags:facets:{limit}:{digest}"
+        data = cache.get(key)
+        if data is None:
+            decks = filter_by_tags(
+                Deck.objects.filter(is_public=True, is_archived=False, admin_hidden=False), request
+            )
+            counts = DeckTag.objects.filter(deck__in=decks).exclude(tag__name__in=selected).values(
+                "tag__name"
+            ).annotate(count=Count("deck_id")).order_by("-count", "tag__name")[:limit]
+            data = {
+                "selected": selected,
+                "total_decks": decks.count(),
+                "tags": [{"name": row["tag__name"], "count": row["count"]} for row in counts],
+            }
+            cache.set(key, data, TAG_FACETS_TTL)
+        return Response(data)
+
+
+SEARCH_MAX_RESULTS = getattr(settings, "SEARCH_MAX_RESULTS", 200)
+
+
+def best_matches(queryset):
+    """The first SEARCH_MAX_RESULTS ranked rows, and whether more matched."""
+    rows = list(queryset[:SEARCH_MAX_RESULTS + 1])
+    return rows[:SEARCH_MAX_RESULTS], len(rows) > SEARCH_MAX_RESULTS
+
 
 class SearchView(APIView):
     authentication_classes = [TokenAuthentication]
@@ -1375,15 +1682,9 @@ class SearchView(APIView):
         if not query:
             return Response({"detail": "Please provide a search term using ?q=keyword"}, status=400)
 
-        query_lower = query.lower()
         user = request.user if request.user.is_authenticated else None
 
-        decks = Deck.objects.filter(
-            Q(title__icontains=query) |
-            Q(description__icontains=query) |
-            Q(tags__icontains=query_lower),
-            is_archived=False
-        )
+        decks = Deck.objects.filter(is_archived=False)
 
         if user:
             # Owner sees all their decks, hidden or not
@@ -1395,10 +1696,7 @@ class SearchView(APIView):
             # Non-authenticated users see only public & non-hidden decks
             decks = decks.filter(is_public=True, admin_hidden=False)
 
-        flashcards = Flashcard.objects.filter(
-            Q(question__icontains=query) | Q(answer__icontains=query),
-            deck__is_archived=False
-        )
+        flashcards = Flashcard.objects.filter(deck__is_archived=False)
 
         if user:
             flashcards = flashcards.filter(
@@ -1408,12 +1706,41 @@ class SearchView(APIView):
         else:
             flashcards = flashcards.filter(deck__is_public=True, deck__admin_hidden=False)
 
+        decks = filter_by_tags(decks, request)
+
+        # Ranked matches (FULLTEXT on MySQL, icontains elsewhere)
+        backend = get_search_backend()
+        decks = DeckSerializer.setup_eager_loading(backend.search_decks(decks, query), user)
+        flashcards = backend.search_flashcards(flashcards, query)
+
+        # Opt-in keyset pagination on (relevance, id), with a cursor per result list;
+        # otherwise only the best SEARCH_MAX_RESULTS of each are returned
+        deck_paginator = RankedPagination(cursor_query_param="decks_cursor")
+        flashcard_paginator = RankedPagination(cursor_query_param="flashcards_cursor")
+        deck_page = deck_paginator.paginate_queryset(decks, request, view=self)
+        flashcard_page = flashcard_paginator.paginate_queryset(flashcards, request, view=self)
+        decks_truncated = flashcards_truncated = False
+        if deck_page is None:
+            deck_page, decks_truncated = best_matches(decks)
+        if flashcard_page is None:
+            flashcard_page, flashcards_truncated = best_matches(flashcards)
+
         # Serialize
-        deck_data = DeckSerializer(decks, many=True).data
-        flashcard_data = FlashcardSerializer(flashcards, many=True).data
+        deck_data = DeckSerializer(deck_page, many=True, context={'request': request}).data
+        flashcard_data = FlashcardSerializer(flashcard_page, many=True).data
 
-        return Response({
+        data = {
             "query": query,
             "decks_found": deck_data,
             "flashcards_found": flashcard_data
-        })
+        }
+        # Paginated lists carry a cursor; capped ones say whether anything was cut off
+        if deck_paginator.is_requested(request):
+            data["decks_next_cursor"] = deck_paginator.next_cursor
+        else:
+            data["decks_truncated"] = decks_truncated
+        if flashcard_paginator.is_requested(request):
+            data["flashcards_next_cursor"] = flashcard_paginator.next_cursor
+        else:
+            data["flashcards_truncated"] = flashcards_truncated
+        return Response(data)
@@ -5,12 +5,14 @@ import logging
 from .signals import (
     deck_shared,
     access_revoked,
+    deck_shared_bulk,
+    access_revoked_bulk,
     deck_rated,
     deck_commented,
     ai_deck_ready,
     achievement_earned,
 )
-from .utils import create_notification
+from .utils import create_notification, queue_bulk_notification
 
 logger = logging.getLogger(__name__)
 
@@ -46,6 +48,30 @@ def handle_access_revoked(sender, recipient, actor, deck, **kwargs):
     )
 
 
+@receiver(deck_shared_bulk)
+def handle_deck_shared_bulk(sender, recipients, actor, deck, **kwargs):
+    queue_bulk_notification(
+        recipients=recipients,
+        actor=actor,
+        notif_type="deck_shared",
+        verb=f"{actor.username} shared a deck with you",
+        deck=deck,
+        channels=("in_app", "push")
+    )
+
+
+@receiver(access_revoked_bulk)
+def handle_access_revoked_bulk(sender, recipients, actor, deck, **kwargs):
+    queue_bulk_notification(
+        recipients=recipients,
+        actor=actor,
+        notif_type="access_revoked",
+        verb=f"Your access to '{deck.title}' was revoked",
+        deck=deck,
+        channels=("in_app", "push")
+    )
+
+
 @receiver(deck_rated)
 def handle_deck_rated(sender, recipient, actor, deck, rating, **kwargs):
     safe_create_notification(
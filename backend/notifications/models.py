@@ -23,6 +23,7 @@ class Notification(models.Model):
 
     STATUS_CHOICES = [
         ('pending', 'Pending'),
+        ('processing', 'Processing'),
         ('sent', 'Sent'),
         ('failed', 'Failed'),
     ]
@@ -65,6 +66,8 @@ class Notification(models.Model):
         choices=STATUS_CHOICES,
         default='pending'
     )
+    # When a push send last claimed the row ('processing'); stale claims are reclaimed
+    push_claimed_at = models.DateTimeField(null=True, blank=True)
 
     is_read = models.BooleanField(default=False)
 
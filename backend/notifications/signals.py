@@ -2,6 +2,9 @@ from django.dispatch import Signal
 
 deck_shared = Signal()
 access_revoked = Signal()
+# One send for many recipients (bulk share / revoke)
+deck_shared_bulk = Signal()
+access_revoked_bulk = Signal()
 deck_rated = Signal()
 deck_commented = Signal()
 ai_deck_ready = Signal()
@@ -1,11 +1,19 @@
 from celery import shared_task
+from collections import defaultdict
+from datetime import timedelta
 import logging
 from .models import Notification
+from django.conf import settings
 from django.db import transaction
-from utils.fcm import send_push_to_user
+from django.db.models import Q
+from django.utils import timezone
+from utils.fcm import SEND_EACH_LIMIT, send_push_messages, send_push_to_user
 
 logger = logging.getLogger(__name__)
 
+# A 'processing' claim older than this belongs to a worker that died mid-send
+PUSH_CLAIM_TIMEOUT = getattr(settings, "NOTIFICATION_PUSH_CLAIM_TIMEOUT", 60 * 10)
+
 
 @shared_task(
     bind=True,
@@ -27,7 +35,8 @@ def send_notification_task(self, notification_id):
 
             # Mark as processing
             notif.push_status = "processing"
-            notif.save(update_fields=["push_status"])
+            notif.push_claimed_at = timezone.now()
+            notif.save(update_fields=["push_status", "push_claimed_at"])
 
         payload = {
             "notification_id": str(notif.id),
@@ -62,8 +71,103 @@ def send_notification_task(self, notification_id):
 
 @shared_task
 def retry_pending_notifications():
+    # Give up on claims whose worker crashed before marking them sent or failed
+    cutoff = timezone.now() - timedelta(seconds=PUSH_CLAIM_TIMEOUT)
+    reclaimed = Notification.objects.filter(
+        Q(push_claimed_at__lt=cutoff) | Q(push_claimed_at__isnull=True), push_status='processing'
+    ).update(push_status='pending')
+    if reclaimed:
+        logger.warning(f"Reclaimed {reclaimed} notifications stuck in processing")
+
     pending = Notification.objects.filter(push_status='pending')
     count = pending.count()
     logger.info(f"Retrying {count} pending notifications")
     for notif in pending:
-        send_notification_task.delay(notif.id)
\ No newline at end of file
+        send_notification_task.delay(notif.id)
+
+
+@shared_task(name="notifications.tasks.create_bulk_notifications_task")
+def create_bulk_notifications_task(recipient_ids, notif_type, verb, actor_id=None, deck_id=None,
+                                   channels=("in_app",), extra_data=None):
+    """Create a many-recipient notification, then push it in one batched task."""
+    from .utils import bulk_create_notifications
+
+    notifications = bulk_create_notifications(
+        recipient_ids, notif_type, verb,
+        actor_id=actor_id, deck_id=deck_id, channels=channels, extra_data=extra_data,
+    )
+    logger.info(f"Created {len(notifications)} {notif_type} notifications")
+    if "push" in channels and notifications:
+        send_notification_batch_task.delay([str(notif.id) for notif in notifications])
+
+
+@shared_task(
+    bind=True,
+    name="notifications.tasks.send_notification_batch_task",
+    autoretry_for=(Exception,),
+    retry_kwargs={'max_retries': 5},
+    retry_backoff=True,
+    retry_jitter=True
+)
+def send_notification_batch_task(self, notification_ids):
+    """
+    Push many notifications at once: one query for their device tokens and
+    FCM send_each calls of up to 500 messages. Each chunk's notifications are
+    marked sent as soon as it is delivered, so a retry after a failed chunk
+    only resends the pending or failed rest.
+    """
+    from reminders.models import DeviceToken
+
+    with transaction.atomic():
+        notifs = list(
+            Notification.objects.select_for_update()
+            .filter(id__in=notification_ids, push_status__in=["pending", "failed"])
+        )
+        Notification.objects.filter(id__in=[notif.id for notif in notifs]).update(
+            push_status="processing", push_claimed_at=timezone.now()
+        )
+    if not notifs:
+        return
+
+    tokens = defaultdict(list)
+    for user_id, token in DeviceToken.objects.filter(
+        user_id__in={notif.recipient_id for notif in notifs}
+    ).values_list("user_id", "token"):
+        tokens[user_id].append(token)
+
+    unsent = [notif.id for notif in notifs]
+    for chunk_ids, messages in _push_chunks(notifs, tokens):
+        try:
+            if messages:
+                send_push_messages(messages, title="BrainQ", channel_id="notifications")
+        except Exception as e:
+            Notification.objects.filter(id__in=unsent).update(push_status="failed")
+            logger.error(f"Failed to send {len(unsent)} batched notifications: {e}", exc_info=True)
+            raise self.retry(exc=e)
+        Notification.objects.filter(id__in=chunk_ids).update(push_status="sent")
+        unsent = unsent[len(chunk_ids):]
+
+
+def _push_chunks(notifs, tokens):
+    """
+    (notification ids, messages) in order, up to SEND_EACH_LIMIT messages per
+    chunk without splitting a notification's devices across chunks.
+    """
+    chunk_ids, messages = [], []
+    for notif in notifs:
+        notif_messages = [
+            (
+                token,
+                notif.verb,
+                {"notification_id": str(notif.id), "type": notif.notif_type, "deck_id": str(notif.deck_id or "")},
+                f"notif_{notif.id}",
+            )
+            for token in tokens[notif.recipient_id]
+        ]
+        if chunk_ids and len(messages) + len(notif_messages) > SEND_EACH_LIMIT:
+            yield chunk_ids, messages
+            chunk_ids, messages = [], []
+        chunk_ids.append(notif.id)
+        messages.extend(notif_messages)
+    if chunk_ids:
+        yield chunk_ids, messages
@@ -1,7 +1,20 @@
 
+from django.db import transaction
+
 from .models import Notification
 from .handlers import HANDLER_REGISTRY
 
+NOTIFICATION_BATCH_SIZE = 500
+
+
+def _delivery_channel(channels):
+    if "push" in channels and "in_app" in channels:
+        return "both"
+    elif "push" in channels:
+        return "push"
+    return "in_app"
+
+
 def create_notification(
     recipient,
     notif_type,
@@ -12,12 +25,7 @@ def create_notification(
     extra_data=None
 ):
     # Determine delivery channel
-    if "push" in channels and "in_app" in channels:
-        delivery_channel = "both"
-    elif "push" in channels:
-        delivery_channel = "push"
-    else:
-        delivery_channel = "in_app"
+    delivery_channel = _delivery_channel(channels)
 
     # Create the notification
     notif = Notification.objects.create(
@@ -42,3 +50,53 @@ def create_notification(
                 pass
 
     return notif
+
+
+def bulk_create_notifications(
+    recipient_ids,
+    notif_type,
+    verb,
+    actor_id=None,
+    deck_id=None,
+    channels=("in_app",),
+    extra_data=None
+):
+    """Insert one notification per recipient with bulk_create; no delivery."""
+    push = "push" in channels
+    return Notification.objects.bulk_create(
+        [
+            Notification(
+                recipient_id=recipient_id,
+                actor_id=actor_id,
+                notif_type=notif_type,
+                verb=verb,
+                deck_id=deck_id,
+                delivery_channel=_delivery_channel(channels),
+                extra_data=extra_data or {},
+                push_status="pending" if push else "sent",
+            )
+            for recipient_id in recipient_ids
+        ],
+        batch_size=NOTIFICATION_BATCH_SIZE,
+    )
+
+
+def queue_bulk_notification(recipients, notif_type, verb, actor=None, deck=None, channels=("in_app",), extra_data=None):
+    """
+    Fan a notification out to many recipients in one background task,
+    queued once the surrounding transaction commits.
+    """
+    from .tasks import create_bulk_notifications_task
+
+    recipient_ids = [recipient.id for recipient in recipients]
+    if not recipient_ids:
+        return
+    transaction.on_commit(lambda: create_bulk_notifications_task.delay(
+        recipient_ids,
+        notif_type,
+        verb,
+        actor_id=actor.id if actor else None,
+        deck_id=deck.id if deck else None,
+        channels=list(channels),
+        extra_data=extra_data,
+    ))
@@ -1,6 +1,8 @@
+from django.db.models import Avg, Count, OuterRef, Prefetch, Subquery
+from django.db.models.functions import Coalesce
 from rest_framework import serializers
 from users.models import CustomUser
-from decks.models import Deck
+from decks.models import Deck, Feedback, Flashcard
 
 
 class AdminUserSummarySerializer(serializers.ModelSerializer):
@@ -34,8 +36,23 @@ class AdminDeckSummarySerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'owner_username', 'created_at']
 
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        """Owner, card count and average rating in the list query itself."""
+        cards = Flashcard.objects.filter(deck=OuterRef('pk')).order_by().values('deck').annotate(
+            total=Count('id')
+        ).values('total')
+        ratings = Feedback.objects.filter(deck=OuterRef('pk')).order_by().values('deck').annotate(
+            avg=Avg('rating')
+        ).values('avg')
+        return queryset.select_related('owner').annotate(
+            flashcards_total=Coalesce(Subquery(cards), 0), avg_rating=Subquery(ratings)
+        )
+
     def get_flashcards_count(self, obj):
         if obj.is_public:
+            if hasattr(obj, 'flashcards_total'):
+                return obj.flashcards_total
             return obj.flashcards.count()
         return None
 
@@ -54,6 +71,8 @@ class AdminDeckSummarySerializer(serializers.ModelSerializer):
 
     def get_average_rating(self, obj):
         if obj.is_public:
+            if hasattr(obj, 'avg_rating'):
+                return obj.avg_rating
             ratings = obj.feedbacks.all().values_list('rating', flat=True)
             if not ratings:
                 return None
@@ -79,6 +98,14 @@ class AdminDeckDetailSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'owner_username', 'created_at', 'updated_at']
 
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        """Owner, cards and feedback (with authors, newest first) in three queries."""
+        return queryset.select_related('owner').prefetch_related(
+            'flashcards',
+            Prefetch('feedbacks', queryset=Feedback.objects.select_related('user').order_by('-created_at')),
+        )
+
     def get_flashcards(self, obj):
         if obj.is_public:
             return [{'question': c.question, 'answer': c.answer} for c in obj.flashcards.all()]
@@ -99,7 +126,7 @@ class AdminDeckDetailSerializer(serializers.ModelSerializer):
 
     def get_average_rating(self, obj):
         if obj.is_public:
-            ratings = obj.feedbacks.all().values_list('rating', flat=True)
+            ratings = [f.rating for f in obj.feedbacks.all()]
             if not ratings:
                 return None
             return sum(ratings) / len(ratings)
@@ -114,6 +141,6 @@ class AdminDeckDetailSerializer(serializers.ModelSerializer):
                     "comment": f.comment or "",
                     "rating": f.rating
                 }
-                for f in obj.feedbacks.all().order_by('-created_at')
+                for f in sorted(obj.feedbacks.all(), key=lambda f: f.created_at, reverse=True)
             ]
         return None
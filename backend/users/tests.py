@@ -1,3 +1,71 @@
-from django.test import TestCase
+from django.core.cache import cache
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
 
-# Create your tests here.
+from analytics.models import AnalyticsSnapshot
+from decks.models import Deck, Feedback, Flashcard, QuizSession
+from users.models import CustomUser
+from utils.querystats import QueryBudgetMixin
+
+
+class AdminQueryBudgetTests(QueryBudgetMixin, APITestCase):
+    """Admin and analytics routes stay within query_budgets.json however much data there is."""
+
+    def setUp(self):
+        cache.clear()
+        self.admin = CustomUser.objects.create_user("admin", "admin@example.com", "pass1234", role="admin")
+        self.client.force_authenticate(self.admin)
+
+        self.members = []
+        for n in range(4):
+            member = CustomUser.objects.create_user(f"member{n}", f"member{n}@example.com", "pass1234")
+            self.members.append(member)
+            for d in range(2):
+                deck = Deck.objects.create(owner=member, title=f"Deck {n}.{d}", is_public=True)
+                Flashcard.bulk_add(deck, [Flashcard(question=f"Q{i}", answer=f"A{i}") for i in range(5)])
+                for rater in self.members:
+                    Feedback.objects.create(deck=deck, user=rater, rating=4, comment="good")
+                # Finished through the live-state write, so the analytics rollups count it
+                session = QuizSession.objects.create(user=member, deck=deck, mode="random")
+                session.total_answered, session.correct_count = 5, 4
+                session.finished_at = timezone.now()
+                session.save_live_state(flush=True)
+        self.deck = Deck.objects.order_by("id").last()
+        AnalyticsSnapshot.objects.create(name="daily_admin_metrics", snapshot_date=timezone.localdate(), payload={})
+
+    def test_admin_routes(self):
+        requests = [
+            ("admin-dashboard-stats", reverse("admin-dashboard-stats"), {"range": "30"}),
+            ("admin-user-list", reverse("admin-user-list"), None),
+            ("admin-deck-list", reverse("admin-deck-list"), None),
+            ("admin-deck-detail", reverse("admin-deck-detail", args=[self.deck.id]), None),
+            ("admin-analytics", reverse("admin-analytics"), None),
+            ("admin-analytics", reverse("admin-analytics"), {"days": 30}),
+            ("admin-analytics-history", reverse("admin-analytics-history"), None),
+        ]
+        self.admin.is_staff = True  # the analytics views check IsAdminUser
+        self.admin.save()
+        for route, url, params in requests:
+            with self.subTest(route=route, params=params), self.assertWithinQueryBudget(route):
+                response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+
+    def test_admin_deck_list_fields_match_per_deck_lookups(self):
+        response = self.client.get(reverse("admin-deck-list"))
+        self.assertEqual(len(response.json()), 8)
+        row = next(d for d in response.json() if d["id"] == self.deck.id)
+        self.assertEqual((row["flashcards_count"], row["average_rating"]), (5, 4.0))
+        self.assertEqual(row["owner_username"], self.deck.owner.username)
+
+        detail = self.client.get(reverse("admin-deck-detail", args=[self.deck.id])).json()
+        self.assertEqual(len(detail["flashcards"]), 5)
+        self.assertEqual(detail["average_rating"], 4.0)
+        self.assertEqual(len(detail["comments"]), 4)
+
+    def test_user_analytics(self):
+        self.client.force_authenticate(self.members[0])
+        with self.assertWithinQueryBudget("user-analytics"):
+            response = self.client.get(reverse("user-analytics"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["quizzes"]["total_sessions"], 2)
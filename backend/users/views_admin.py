@@ -1,6 +1,6 @@
 import logging
 from django.utils import timezone
-from django.db.models import Count, Avg, Q, F, ExpressionWrapper, FloatField
+from django.db.models import Count, Q, F, Sum
 from rest_framework import generics, status
 from django.utils.dateparse import parse_date, parse_datetime
 from rest_framework.views import APIView
@@ -11,7 +11,9 @@ from datetime import timedelta
 from rest_framework.authtoken.models import Token
 
 
-from decks.models import Deck, QuizSession
+from analytics.models import DeckDailyUsage, PlatformDailyFact, UserDailyStudy
+from decks.models import Deck
+from decks.caching import invalidate_deck_payload
 from users.models import CustomUser, SecurityLog
 from users.permissions import IsAdmin
 from .serializers_admin import (
@@ -316,34 +318,43 @@ class AdminDashboardStatsView(APIView):
         # Default last 7 days
         return now - timedelta(days=7), now
 
+    def as_local_date(self, value):
+        if timezone.is_aware(value):
+            return timezone.localdate(value)
+        return value.date()
+
     def get(self, request):
         start_date, end_date = self.get_date_range(request)
+        # Session and deck activity comes from the daily fact tables, by day
+        start_day, end_day = self.as_local_date(start_date), self.as_local_date(end_date)
 
         # Users within range
-        total_users = CustomUser.objects.count()
-        active_users = CustomUser.objects.filter(is_active=True).count()
-        suspended_users = CustomUser.objects.filter(is_suspended=True).count()
+        user_agg = CustomUser.objects.aggregate(
+            total=Count("id"),
+            active=Count("id", filter=Q(is_active=True)),
+            suspended=Count("id", filter=Q(is_suspended=True)),
+        )
         recent_users = CustomUser.objects.filter(
             date_joined__range=[start_date, end_date]
         ).order_by('-date_joined')[:5].values('username','email','date_joined')
 
-        # Most active users (sessions in range)
+        # Most active users (completed sessions in range)
         most_active_users = (
-            QuizSession.objects.filter(started_at__range=[start_date, end_date])
+            UserDailyStudy.objects.filter(date__range=[start_day, end_day])
             .values("user__username", "user__email")
-            .annotate(session_count=Count("id"))
+            .annotate(session_count=Sum("sessions"))
             .order_by("-session_count")[:5]
         )
 
         # Decks in range
-        total_decks = Deck.objects.count()
-        public_decks = Deck.objects.filter(is_public=True).count()
-        private_decks = Deck.objects.filter(is_public=False).count()
-        archived_decks = Deck.objects.filter(is_archived=True).count()
-        flagged_decks = Deck.objects.filter(is_flagged=True).count()
-
-        new_decks = Deck.objects.filter(created_at__range=[start_date, end_date]).count()
-        average_decks_per_user = round(total_decks / max(1, CustomUser.objects.filter(is_active=True).count()), 2)
+        deck_agg = Deck.objects.aggregate(
+            total=Count("id"),
+            public=Count("id", filter=Q(is_public=True)),
+            archived=Count("id", filter=Q(is_archived=True)),
+            flagged=Count("id", filter=Q(is_flagged=True)),
+        )
+        total_decks = deck_agg["total"]
+        average_decks_per_user = round(total_decks / max(1, user_agg["active"]), 2)
 
         top_creators = (
             Deck.objects.filter(created_at__range=[start_date, end_date])
@@ -353,23 +364,27 @@ class AdminDashboardStatsView(APIView):
         )
 
         # Quiz analytics within range
-        total_sessions = QuizSession.objects.filter(started_at__range=[start_date, end_date]).count()
-        completed_sessions = QuizSession.objects.filter(finished_at__range=[start_date, end_date]).count()
-        avg_accuracy = QuizSession.objects.filter(started_at__range=[start_date, end_date], total_answered__gt=0).aggregate(
-            avg_accuracy=Avg(ExpressionWrapper(F("correct_count") * 100.0 / F("total_answered"), output_field=FloatField()))
-        ).get("avg_accuracy") or 0.0
+        facts = PlatformDailyFact.objects.filter(date__range=[start_day, end_day]).aggregate(
+            sessions=Sum("sessions_started"),
+            completed=Sum("sessions_completed"),
+            new_decks=Sum("new_decks"),
+            scored=Sum("scored_sessions"),
+            accuracy_sum=Sum("accuracy_sum"),
+        )
+        avg_accuracy = (facts["accuracy_sum"] or 0) * 100 / facts["scored"] if facts["scored"] else 0.0
 
+        deck_usage = (
+            DeckDailyUsage.objects.filter(date__range=[start_day, end_day])
+            .values(deck__id=F("deck_id"), deck__title=F("deck__title"), deck__owner__username=F("deck__owner__username"))
+        )
         popular_decks = (
-            QuizSession.objects.filter(started_at__range=[start_date, end_date])
-            .values("deck__id","deck__title","deck__owner__username")
-            .annotate(usage_count=Count("id"))
+            deck_usage.annotate(usage_count=Sum("sessions_started"))
+            .filter(usage_count__gt=0)
             .order_by("-usage_count")[:5]
         )
-
         most_completed_decks = (
-            QuizSession.objects.filter(finished_at__range=[start_date, end_date])
-            .values("deck__id","deck__title","deck__owner__username")
-            .annotate(completion_count=Count("id"))
+            deck_usage.annotate(completion_count=Sum("sessions_completed"))
+            .filter(completion_count__gt=0)
             .order_by("-completion_count")[:5]
         )
 
@@ -378,9 +393,9 @@ class AdminDashboardStatsView(APIView):
 
         return Response({
             "date_range_used": {"start": start_date, "end": end_date, "query": request.query_params.dict()},
-            "users": {"total": total_users, "active": active_users, "suspended": suspended_users, "recent": list(recent_users), "most_active": list(most_active_users)},
-            "decks": {"total": total_decks, "public": public_decks, "private": private_decks, "archived": archived_decks, "flagged": flagged_decks, "new_in_range": new_decks, "average_per_user": average_decks_per_user, "top_creators": list(top_creators)},
-            "quiz": {"total_sessions": total_sessions, "completed_sessions": completed_sessions, "avg_accuracy": round(avg_accuracy,2), "popular_decks": list(popular_decks), "most_completed_decks": list(most_completed_decks)},
+            "users": {"total": user_agg["total"], "active": user_agg["active"], "suspended": user_agg["suspended"], "recent": list(recent_users), "most_active": list(most_active_users)},
+            "decks": {"total": total_decks, "public": deck_agg["public"], "private": total_decks - deck_agg["public"], "archived": deck_agg["archived"], "flagged": deck_agg["flagged"], "new_in_range": facts["new_decks"] or 0, "average_per_user": average_decks_per_user, "top_creators": list(top_creators)},
+            "quiz": {"total_sessions": facts["sessions"] or 0, "completed_sessions": facts["completed"] or 0, "avg_accuracy": round(avg_accuracy,2), "popular_decks": list(popular_decks), "most_completed_decks": list(most_completed_decks)},
             "server_time": timezone.now(),
         })
     
@@ -393,7 +408,7 @@ class AdminDeckListView(generics.ListAPIView):
     serializer_class = AdminDeckSummarySerializer
 
     def get_queryset(self):
-        queryset = Deck.objects.all().order_by('-created_at')
+        queryset = AdminDeckSummarySerializer.setup_eager_loading(Deck.objects.all()).order_by('-created_at')
         search = self.request.query_params.get('search')
         is_public = self.request.query_params.get('is_public')
         flagged = self.request.query_params.get('flagged')
@@ -424,6 +439,11 @@ class AdminDeckDetailView(generics.RetrieveUpdateDestroyAPIView):
     queryset = Deck.objects.all()
     serializer_class = AdminDeckDetailSerializer
 
+    def get_queryset(self):
+        if self.request.method == 'GET':
+            return AdminDeckDetailSerializer.setup_eager_loading(self.queryset)
+        return self.queryset
+
     def patch(self, request, *args, **kwargs):
         deck = self.get_object()
         # Only moderation fields are editable
@@ -471,7 +491,10 @@ class AdminBulkDeckActionView(APIView):
                 updates['admin_hidden'] = True
             elif action == "unhide":
                 updates['admin_hidden'] = False
-            count = decks.update(**updates)
+            # update() skips auto_now; keep deck validators (ETag / Last-Modified) moving
+            count = decks.update(updated_at=timezone.now(), **updates)
+            for deck_id in decks.values_list("id", flat=True):
+                invalidate_deck_payload(deck_id)
 
         elif action == "delete":
             # Only delete public decks
@@ -0,0 +1,34 @@
+"""
+Versioned cache namespaces.
+
+Cached entries embed the current version of their namespace in the key, so
+bumping the version invalidates all of them at once without knowing the
+keys. A version belongs to one object in a scope ("deck", "user", ...).
+"""
+import time
+
+from django.core.cache import cache
+
+
+def _version_key(namespace, obj_id, scope):
+    return f"{scope}:{obj_id}:{namespace}:version"
+
+
+def get_version(namespace, obj_id, scope="deck"):
+    """Current cache version for a deck (or other scope) namespace."""
+    key = _version_key(namespace, obj_id, scope)
+    version = cache.get(key)
+    if version is None:
+        # Seed from the clock so a lost counter never reuses an old version
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(namespace, obj_id, scope="deck"):
+    """Invalidate every cached entry of a namespace."""
+    key = _version_key(namespace, obj_id, scope)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
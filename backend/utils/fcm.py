@@ -99,3 +99,42 @@ def send_push_to_user(user, title, body, data=None, tag=None, channel_id="defaul
     for i in range(0, len(device_tokens), BATCH_SIZE):
         batch_tokens = device_tokens[i:i + BATCH_SIZE]
         send_batch(batch_tokens, title, body, data=data, tag=tag, channel_id=channel_id)
+
+
+# -------------------------
+# Per-device fan-out (sync)
+# -------------------------
+SEND_EACH_LIMIT = 500  # FCM cap per send_each call
+
+def send_push_messages(messages, title, channel_id="default"):
+    """
+    Send one message per device in as few FCM calls as possible.
+
+    `messages` is a list of (token, body, data, tag). Tokens FCM rejects are
+    deleted. Returns the number of messages delivered.
+    """
+    from reminders.models import DeviceToken
+
+    delivered = 0
+    for i in range(0, len(messages), SEND_EACH_LIMIT):
+        batch = messages[i:i + SEND_EACH_LIMIT]
+        response = messaging.send_each([
+            messaging.Message(
+                token=token,
+                notification=messaging.Notification(title=title, body=body),
+                data=data or {},
+                android=messaging.AndroidConfig(
+                    notification=messaging.AndroidNotification(tag=tag, channel_id=channel_id)
+                ),
+            )
+            for token, body, data, tag in batch
+        ])
+        delivered += response.success_count
+
+        invalid = [batch[idx][0] for idx, resp in enumerate(response.responses) if not resp.success]
+        if invalid:
+            logger.warning(f"Removing {len(invalid)} invalid device tokens")
+            DeviceToken.objects.filter(token__in=invalid).delete()
+
+    logger.info(f"Bulk push: {delivered}/{len(messages)} sent")
+    return delivered
@@ -0,0 +1,141 @@
+"""
+Per-request SQL instrumentation and query budgets.
+
+QueryStatsMiddleware wraps every database connection with an execute_wrapper
+for the duration of a request and records the query count, total SQL time and
+the slowest statements. They are reported as X-Query-* / Server-Timing
+response headers (when QUERY_STATS_HEADERS is on) and as one structured log
+record per request on the "brainq.queries" logger: DEBUG normally, WARNING
+when the request went over its route's budget or QUERY_STATS_WARN_COUNT.
+
+Budgets live in QUERY_BUDGET_FILE, a JSON object mapping URL route names
+(request.resolver_match.view_name) to the maximum queries a request may run.
+QueryBudgetMixin lets tests assert against the same file, so a regression
+fails the suite.
+"""
+import heapq
+import json
+import logging
+import time
+from contextlib import ExitStack, contextmanager
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+
+logger = logging.getLogger("brainq.queries")
+
+QUERY_STATS_ENABLED = getattr(settings, "QUERY_STATS_ENABLED", True)
+QUERY_STATS_HEADERS = getattr(settings, "QUERY_STATS_HEADERS", settings.DEBUG)
+QUERY_STATS_SLOWEST = getattr(settings, "QUERY_STATS_SLOWEST", 3)
+QUERY_STATS_WARN_COUNT = getattr(settings, "QUERY_STATS_WARN_COUNT", 50)
+QUERY_BUDGET_FILE = getattr(settings, "QUERY_BUDGET_FILE", settings.BASE_DIR / "query_budgets.json")
+SQL_PREVIEW_LENGTH = 300
+
+
+@lru_cache(maxsize=None)
+def load_query_budgets(path=None):
+    """{route name: max queries} from the budget file ({} if it is missing)."""
+    try:
+        with open(path or QUERY_BUDGET_FILE) as f:
+            return {name: budget for name, budget in json.load(f).items() if not name.startswith("_")}
+    except FileNotFoundError:
+        return {}
+
+
+class QueryRecorder:
+    """execute_wrapper that counts and times statements, keeping the slowest few."""
+
+    def __init__(self, keep=QUERY_STATS_SLOWEST):
+        self.keep = keep
+        self.count = 0
+        self.total_time = 0.0
+        self._slowest = []  # min-heap of (duration, sequence, sql)
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.count += 1
+            self.total_time += duration
+            # SQL only, never params: they can hold user data
+            entry = (duration, self.count, sql[:SQL_PREVIEW_LENGTH])
+            if len(self._slowest) < self.keep:
+                heapq.heappush(self._slowest, entry)
+            elif self.keep:
+                heapq.heappushpop(self._slowest, entry)
+
+    @property
+    def slowest(self):
+        return [
+            {"ms": round(duration * 1000, 2), "sql": sql}
+            for duration, _, sql in sorted(self._slowest, reverse=True)
+        ]
+
+    @contextmanager
+    def record(self):
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(self))
+            yield self
+
+
+class QueryStatsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not QUERY_STATS_ENABLED:
+            return self.get_response(request)
+
+        # Streaming bodies run their queries after this returns; those are not counted
+        with QueryRecorder().record() as recorder:
+            response = self.get_response(request)
+
+        match = getattr(request, "resolver_match", None)
+        route = match.view_name if match else None
+        budget = load_query_budgets().get(route)
+        total_ms = round(recorder.total_time * 1000, 2)
+
+        if QUERY_STATS_HEADERS:
+            response["X-Query-Count"] = str(recorder.count)
+            response["X-Query-Time-Ms"] = str(total_ms)
+            if budget is not None:
+                response["X-Query-Budget"] = str(budget)
+            response["Server-Timing"] = f'db;dur={total_ms};desc="{recorder.count} queries"'
+
+        over_budget = budget is not None and recorder.count > budget
+        record = {
+            "event": "request_queries",
+            "method": request.method,
+            "path": request.path,
+            "route": route,
+            "status": response.status_code,
+            "queries": recorder.count,
+            "sql_ms": total_ms,
+            "budget": budget,
+            "over_budget": over_budget,
+            "slowest": recorder.slowest,
+        }
+        level = logging.WARNING if over_budget or recorder.count > QUERY_STATS_WARN_COUNT else logging.DEBUG
+        logger.log(level, json.dumps(record), extra={"query_stats": record})
+        return response
+
+
+class QueryBudgetMixin:
+    """TestCase mixin: fail when a block runs more queries than its route's budget."""
+
+    @contextmanager
+    def assertWithinQueryBudget(self, route):
+        budgets = load_query_budgets()
+        self.assertIn(route, budgets, f"No query budget for route {route!r} in {QUERY_BUDGET_FILE}")
+        with CaptureQueriesContext(connections["default"]) as ctx:
+            yield ctx
+        statements = "\n".join(f"  {q['sql'][:SQL_PREVIEW_LENGTH]}" for q in ctx.captured_queries)
+        self.assertLessEqual(
+            len(ctx), budgets[route],
+            f"{route} ran {len(ctx)} queries, budget is {budgets[route]}:\n{statements}",
+        )